@@ -1,11 +1,26 @@
+import base64
+import csv
+import io
+import json
 import os
-import random
-import time
-from datetime import datetime
-from flask import Blueprint, jsonify, request
-from flask import send_from_directory, abort
-from werkzeug.utils import secure_filename
-from . import db
+from datetime import date, datetime, time, timedelta
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
+from flask import abort
+from sqlalchemy import insert, or_, select
+from . import changes, db, rollups
+from .catalog import get_body
+from .database import replica_reads
+from .gallery import gallery_index
+from .hooks import sync
+from .images import IMAGES_DIR, VARIANT_PENDING_MAX_AGE, VARIANTS_DIR, find_variant, save_upload, send_image
+from .intake import new_reference
+from .localtime import local_now
+from .menu_io import MenuImportError, export_csv, export_json, import_menu, parse_csv
+from .order_feed import feed, order_payload
+from .pricing import quote
+from .query_budget import query_budget
+from .reservations import TOTAL_TABLES, allocator, availability
+from .responses import send_encoded
 from .models import MenuItem, Category, Order, OrderItem, Subscriber, Customer, Reservation, Promotion
 
 # Simple admin secret (dev-only). Configure ADMIN_SECRET in your environment or .env
@@ -14,37 +29,16 @@ ADMIN_SECRET = os.getenv('ADMIN_SECRET', 'dev-secret')
 api_bp = Blueprint('api', __name__)
 
 @api_bp.route('/menu', methods=['GET'])
+@replica_reads
+# cold: catalog query, promotion schedule (inside a savepoint)
+@query_budget(5)
 def list_menu():
-    categories = Category.query.order_by(Category.position).all()
-    # fetch all active promotions (keyed by menu_item_id)
-    try:
-        active_promos = {p.menu_item_id: p.percent for p in Promotion.query.filter_by(active=True).all()}
-    except Exception:
-        # promotions table may not exist yet
-        active_promos = {}
-    
-    result = []
-    for c in categories:
-        items = MenuItem.query.filter_by(category_id=c.id).all()
-        result.append({
-            'id': c.id,
-            'name': c.name,
-            'items': [
-                {
-                    'id': i.id,
-                    'name': i.name,
-                    'description': i.description,
-                    'price_cents': i.price_cents,
-                    'available': i.available,
-                    'image_filename': getattr(i, 'image_filename', None),
-                    'discount_percent': active_promos.get(i.id)  # None if no discount, otherwise the percent
-                }
-                for i in items
-            ]
-        })
-    return jsonify({'categories': result, 'promotions': list(active_promos.items())})
+    return send_encoded(get_body('menu'))
 
 @api_bp.route('/cart/checkout', methods=['POST'])
+# shared version check, pricing table and promotions (inside a savepoint) when
+# cold, order insert and order lines; rollups are upserted in the background
+@query_budget(8)
 def checkout():
     data = request.get_json() or {}
     items = data.get('items', [])
@@ -55,53 +49,84 @@ def checkout():
     if not items or not name:
         return jsonify({'error': 'Missing items or customer name'}), 400
 
-    total = 0
-    order = Order(customer_name=name, customer_email=email, customer_phone=phone, status='pending')
+    # we charge what's in the pricing table: don't wait out CACHE_SYNC_INTERVAL
+    # for price or availability changes another worker committed
+    sync(force=True)
+    # price from the in-memory pricing table: no per-line queries, and the
+    # same numbers /cart/quote returns
+    try:
+        priced = quote(items)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    queue = current_app.extensions.get('order_intake')
+    if queue is not None:
+        # durably queued; the intake writer commits it with the next batch
+        reference = queue.submit(name, email, phone, priced)
+        return jsonify({'reference': reference, 'status': 'queued'}), 202
+
+    order = Order(customer_name=name, customer_email=email, customer_phone=phone, status='pending',
+                  total_cents=priced['total_cents'], reference=new_reference())
     db.session.add(order)
     db.session.flush()
-
-    for it in items:
-        mi = MenuItem.query.get(it.get('menu_item_id'))
-        if not mi:
-            db.session.rollback()
-            return jsonify({'error': f"Menu item {it.get('menu_item_id')} not found"}), 400
-        qty = int(it.get('qty', 1))
-        total += mi.price_cents * qty
-        oi = OrderItem(order_id=order.id, menu_item_id=mi.id, qty=qty, unit_price_cents=mi.price_cents)
-        db.session.add(oi)
-
-    order.total_cents = total
+    # single executemany for all order lines
+    rows = [
+        {'order_id': order.id, 'menu_item_id': line['menu_item_id'], 'qty': line['qty'],
+         'unit_price_cents': line['unit_price_cents'], 'category_id': rollups.category_of(line['menu_item_id'])}
+        for line in priced['lines']
+    ]
+    db.session.execute(insert(OrderItem), rows)
+    lines = [(line['menu_item_id'], line['qty'], line['unit_price_cents']) for line in priced['lines']]
+    created_at = order.created_at
     db.session.commit()
-
-    return jsonify({'order_id': order.id, 'status': order.status})
+    # not in the order transaction: every checkout would upsert the same
+    # sales_hourly row and wait on the one before it
+    buffer = current_app.extensions.get('sales_rollups')
+    if buffer is not None:
+        buffer.add(created_at, [
+            (row['menu_item_id'], row['qty'], row['unit_price_cents'], row['category_id']) for row in rows
+        ])
+    feed.publish_order('order', order, lines)
+
+    return jsonify({'order_id': order.id, 'reference': order.reference, 'status': order.status})
+
+
+@api_bp.route('/orders/<reference>', methods=['GET'])
+@query_budget(2)
+def order_status(reference):
+    """Look up an order by the reference checkout returned."""
+    order = Order.query.filter_by(reference=reference).first()
+    if order is not None:
+        return jsonify({'order_id': order.id, 'reference': order.reference, 'status': order.status})
+    queue = current_app.extensions.get('order_intake')
+    state = queue.queued(reference) if queue is not None else None
+    if state is None:
+        return jsonify({'error': 'order not found'}), 404
+    return jsonify({'order_id': None, 'reference': reference, 'status': state})
+
+
+@api_bp.route('/cart/quote', methods=['POST'])
+# cold: pricing table, promotion schedule (inside a savepoint)
+@query_budget(4)
+def cart_quote():
+    """Price a cart with active promotions applied, without touching the database."""
+    data = request.get_json() or {}
+    items = data.get('items', [])
+    if not items:
+        return jsonify({'error': 'Missing items'}), 400
+    try:
+        return jsonify(quote(items))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
 
 @api_bp.route('/')
+@replica_reads
+@query_budget(5)
 def index():
     """Return menu categories and items as JSON for the frontend."""
-    categories = Category.query.order_by(Category.position).all()
-    # prepare items for JSON response
-    cats = []
-    for c in categories:
-        items = MenuItem.query.filter_by(category_id=c.id).all()
-        cats.append({
-            'id': c.id,
-            'name': c.name,
-            'items': [
-                {
-                    'id': i.id,
-                    'name': i.name,
-                    'description': i.description,
-                    'price_cents': i.price_cents,
-                    'available': i.available,
-                    'image_filename': getattr(i, 'image_filename', None),
-                    'category_id': i.category_id
-                }
-                for i in items
-            ]
-        })
     # This endpoint serves the same data the frontend expects during development.
-    return jsonify(cats)
+    return send_encoded(get_body('index'))
 
 
 # --- Admin routes (dev-only simple auth) ---------------------------------
@@ -110,42 +135,271 @@ def _is_admin(req):
     return token and token == ADMIN_SECRET
 
 
+def _parse_limit(req, default=50, maximum=200):
+    try:
+        limit = int(req.args.get('limit', default))
+    except (TypeError, ValueError):
+        raise ValueError('limit must be an integer')
+    return max(1, min(limit, maximum))
+
+
+def _parse_range(req, start_arg='from', end_arg='to'):
+    """Parse ISO ``from``/``to`` query args; a date-only ``to`` includes that whole day."""
+    bounds = []
+    for arg in (start_arg, end_arg):
+        raw = req.args.get(arg)
+        if not raw:
+            bounds.append(None)
+            continue
+        try:
+            value = datetime.fromisoformat(raw)
+        except ValueError:
+            raise ValueError(f'invalid {arg}; use ISO date or datetime')
+        if arg == end_arg and len(raw) == 10:
+            value += timedelta(days=1)
+        bounds.append(value)
+    return bounds
+
+
+def _encode_cursor(*values):
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def _decode_cursor(cursor):
+    """Decode a cursor from _encode_cursor() into (datetime, id)."""
+    try:
+        ts, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return datetime.fromisoformat(ts), int(row_id)
+    except Exception:
+        raise ValueError('invalid cursor')
+
+
+def _serialize_order(o, items):
+    return order_payload(o, [(it.menu_item_id, it.qty, it.unit_price_cents) for it in items])
+
+
 @api_bp.route('/admin/orders', methods=['GET'])
+@replica_reads
+@query_budget(3)
 def admin_list_orders():
+    """Return one page of orders, newest first.
+
+    Query args: limit (default 50, max 200), cursor, status, from, to. The body
+    stays a plain list; when more orders exist the cursor for the next page is
+    sent in the X-Next-Cursor header.
+    """
+    if not _is_admin(request):
+        return jsonify({'error': 'unauthorized'}), 401
+    try:
+        limit = _parse_limit(request)
+        start, end = _parse_range(request)
+        cursor = request.args.get('cursor')
+        after = _decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    q = Order.query
+    status = request.args.get('status')
+    if status:
+        q = q.filter(Order.status == status)
+    if start:
+        q = q.filter(Order.created_at >= start)
+    if end:
+        q = q.filter(Order.created_at < end)
+    if after:
+        ts, order_id = after
+        # the leading <= gives every database an index range to start from
+        q = q.filter(Order.created_at <= ts, or_(Order.created_at < ts, Order.id < order_id))
+    orders = q.order_by(Order.created_at.desc(), Order.id.desc()).limit(limit + 1).all()
+    has_more = len(orders) > limit
+    orders = orders[:limit]
+
+    # one query for the items of the whole page
+    items_by_order = {o.id: [] for o in orders}
+    if orders:
+        for it in OrderItem.query.filter(OrderItem.order_id.in_(items_by_order)).order_by(OrderItem.id):
+            items_by_order[it.order_id].append(it)
+
+    resp = jsonify([_serialize_order(o, items_by_order[o.id]) for o in orders])
+    if has_more:
+        last = orders[-1]
+        resp.headers['X-Next-Cursor'] = _encode_cursor(last.created_at, last.id)
+    return resp
+
+
+
+@api_bp.route('/admin/orders/stream', methods=['GET'])
+def admin_order_stream():
+    """Server-Sent Events feed of new and updated orders.
+
+    Events are ``order`` (new) and ``order_status`` (status changed) with the
+    same JSON as the listing; ``reset`` means the client missed events and
+    should reload /api/admin/orders. Reconnects resume from Last-Event-ID
+    (EventSource sends it automatically). Served from memory: connected
+    dashboards cost no queries.
+    """
+    if not _is_admin(request):
+        return jsonify({'error': 'unauthorized'}), 401
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    resp = Response(feed.stream(last_event_id), mimetype='text/event-stream')
+    resp.headers['Cache-Control'] = 'no-cache'
+    # stop nginx from buffering the stream
+    resp.headers['X-Accel-Buffering'] = 'no'
+    return resp
+
+
+@api_bp.route('/admin/orders/<int:order_id>', methods=['PUT', 'PATCH'])
+def admin_update_order(order_id):
+    """Change an order's status, e.g. {"status": "served"}."""
+    if not _is_admin(request):
+        return jsonify({'error': 'unauthorized'}), 401
+    data = request.get_json() or {}
+    status = data.get('status')
+    if not isinstance(status, str) or not status.strip():
+        return jsonify({'error': 'status is required'}), 400
+    order = Order.query.get(order_id)
+    if not order:
+        return jsonify({'error': 'not found'}), 404
+    was_cancelled = order.status == 'cancelled'
+    order.status = status.strip()[:64]
+    items = OrderItem.query.filter_by(order_id=order.id).order_by(OrderItem.id).all()
+    if was_cancelled != (order.status == 'cancelled'):
+        # cancelled orders don't count towards sales
+        rollups.record_orders([(order.created_at, [
+            (i.menu_item_id, i.qty, i.unit_price_cents or 0,
+             i.category_id if i.category_id is not None else rollups.category_of(i.menu_item_id))
+            for i in items
+        ])], sign=1 if was_cancelled else -1)
+    db.session.commit()
+    payload = _serialize_order(order, items)
+    feed.publish('order_status', payload)
+    return jsonify(payload)
+
+EXPORT_ORDER_COLUMNS = ['order_id', 'created_at', 'status', 'customer_name', 'customer_email', 'customer_phone', 'total_cents']
+EXPORT_ITEM_COLUMNS = ['menu_item_id', 'qty', 'unit_price_cents']
+
+
+def _export_rows(start, end):
+    """Yield (order columns..., item columns...) rows through a server-side cursor."""
+    stmt = (
+        select(
+            Order.id, Order.created_at, Order.status, Order.customer_name, Order.customer_email,
+            Order.customer_phone, Order.total_cents,
+            OrderItem.menu_item_id, OrderItem.qty, OrderItem.unit_price_cents,
+        )
+        .outerjoin(OrderItem, OrderItem.order_id == Order.id)
+        .order_by(Order.id, OrderItem.id)
+    )
+    if start:
+        stmt = stmt.where(Order.created_at >= start)
+    if end:
+        stmt = stmt.where(Order.created_at < end)
+    # yield_per streams from the database in batches instead of buffering the result
+    yield from db.session.execute(stmt.execution_options(yield_per=1000))
+
+
+def _export_ndjson(rows):
+    # rows arrive grouped by order; emit one line per order with its items nested
+    current = None
+    n_order = len(EXPORT_ORDER_COLUMNS)
+    for row in rows:
+        if current is None or current['order_id'] != row[0]:
+            if current is not None:
+                yield json.dumps(current) + '\n'
+            current = dict(zip(EXPORT_ORDER_COLUMNS, row[:n_order]))
+            current['created_at'] = current['created_at'].isoformat() if current['created_at'] else None
+            current['items'] = []
+        if row[n_order] is not None:
+            current['items'].append(dict(zip(EXPORT_ITEM_COLUMNS, row[n_order:])))
+    if current is not None:
+        yield json.dumps(current) + '\n'
+
+
+def _export_csv(rows):
+    # one line per order item; orders without items get a single line with empty item columns
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(EXPORT_ORDER_COLUMNS + EXPORT_ITEM_COLUMNS)
+    for n, row in enumerate(rows, 1):
+        row = list(row)
+        row[1] = row[1].isoformat() if row[1] else ''
+        writer.writerow(row)
+        # flush in chunks rather than per row to keep the number of writes down
+        if n % 500 == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+
+@api_bp.route('/admin/orders/export', methods=['GET'])
+@replica_reads
+def admin_export_orders():
+    """Stream every order (optionally within from/to) with its items as NDJSON or CSV."""
     if not _is_admin(request):
         return jsonify({'error': 'unauthorized'}), 401
-    orders = Order.query.order_by(Order.created_at.desc()).all()
-    result = []
-    for o in orders:
-        items = OrderItem.query.filter_by(order_id=o.id).all()
-        result.append({
-            'id': o.id,
-            'customer_name': o.customer_name,
-            'customer_email': o.customer_email,
-            'customer_phone': o.customer_phone,
-            'total_cents': o.total_cents,
-            'status': o.status,
-            'created_at': o.created_at.isoformat(),
-            'items': [
-                {'menu_item_id': it.menu_item_id, 'qty': it.qty, 'unit_price_cents': it.unit_price_cents}
-                for it in items
-            ]
-        })
-    return jsonify(result)
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in ('ndjson', 'csv'):
+        return jsonify({'error': 'format must be ndjson or csv'}), 400
+    try:
+        start, end = _parse_range(request)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    rows = _export_rows(start, end)
+    if fmt == 'csv':
+        body, mimetype = _export_csv(rows), 'text/csv'
+    else:
+        body, mimetype = _export_ndjson(rows), 'application/x-ndjson'
+    resp = Response(stream_with_context(body), mimetype=mimetype)
+    resp.headers['Content-Disposition'] = f'attachment; filename=orders.{fmt}'
+    return resp
 
 
 @api_bp.route('/admin/menu_items', methods=['GET'])
+@replica_reads
+@query_budget(5)
 def admin_list_menu_items():
     if not _is_admin(request):
         return jsonify({'error': 'unauthorized'}), 401
-    items = MenuItem.query.order_by(MenuItem.created_at.desc()).all()
-    return jsonify([
-        {'id': i.id, 'name': i.name, 'description': i.description, 'price_cents': i.price_cents, 'available': i.available, 'category_id': i.category_id, 'image_filename': getattr(i, 'image_filename', None)}
-        for i in items
-    ])
+    return send_encoded(get_body('admin_menu_items'), cache_control='private, no-cache')
 
 
+
+@api_bp.route('/admin/changes', methods=['GET'])
+@query_budget(2)
+def admin_list_changes():
+    """Changes to categories, menu items, promotions and reservations after ``since``.
+
+    Without ``since`` only the current cursor is returned: read it first, then
+    load the full admin listings, then poll with ``since=<next>`` and apply
+    each change (``data`` holds the row's columns; null for deletes). A 410
+    means the changes after ``since`` were pruned: start over.
+    """
+    if not _is_admin(request):
+        return jsonify({'error': 'unauthorized'}), 401
+    try:
+        limit = _parse_limit(request, default=500, maximum=5000)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    raw = request.args.get('since')
+    if raw is None:
+        return jsonify({'changes': [], 'next': changes.head(), 'has_more': False})
+    try:
+        since = int(raw)
+    except ValueError:
+        return jsonify({'error': 'since must be an integer'}), 400
+    rows = changes.since(since, limit + 1)
+    if rows is None:
+        return jsonify({'error': 'since is older than the change log; reload'}), 410
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return jsonify({'changes': rows, 'next': rows[-1]['seq'] if rows else since, 'has_more': has_more})
+
 @api_bp.route('/admin/categories', methods=['GET'])
+@replica_reads
+@query_budget(2)
 def admin_list_categories():
     if not _is_admin(request):
         return jsonify({'error': 'unauthorized'}), 401
@@ -219,21 +473,12 @@ def admin_create_menu_item():
         return jsonify({'error': f'category {category_id} not found'}), 400
 
     image_filename = None
-    # if an image file is included, save it to Images/ and record filename
+    # if an image file is included, save it to Images/ and record filename;
+    # resized variants are built in the background
     if 'image' in request.files:
         img = request.files.get('image')
         if img and img.filename:
-            images_dir = os.path.normpath(os.path.join(os.path.dirname(__file__), '..', '..', 'Images'))
-            try:
-                os.makedirs(images_dir, exist_ok=True)
-            except Exception:
-                pass
-            fname = secure_filename(img.filename)
-            # prefix with timestamp to avoid collisions
-            fname = f"{int(time.time())}_{fname}"
-            save_path = os.path.join(images_dir, fname)
-            img.save(save_path)
-            image_filename = fname
+            image_filename = save_upload(img)
 
     mi = MenuItem(name=name, description=data.get('description'), price_cents=int(price), available=bool(data.get('available', True)), category_id=category_id)
     if image_filename:
@@ -274,17 +519,8 @@ def admin_update_menu_item(item_id):
     if 'image' in request.files:
         img = request.files.get('image')
         if img and img.filename:
-            images_dir = os.path.normpath(os.path.join(os.path.dirname(__file__), '..', '..', 'Images'))
-            try:
-                os.makedirs(images_dir, exist_ok=True)
-            except Exception:
-                pass
-            fname = secure_filename(img.filename)
-            fname = f"{int(time.time())}_{fname}"
-            save_path = os.path.join(images_dir, fname)
             try:
-                img.save(save_path)
-                mi.image_filename = fname
+                mi.image_filename = save_upload(img)
             except Exception as e:
                 db.session.rollback()
                 return jsonify({'error': 'failed to save uploaded image', 'details': str(e)}), 500
@@ -313,16 +549,78 @@ def admin_delete_menu_item(item_id):
     return jsonify({'ok': True}), 200
 
 
+@api_bp.route('/admin/menu/import', methods=['POST'])
+def admin_import_menu():
+    """Upsert a batch of categories and menu items in one transaction.
+
+    Accepts JSON ``{"categories": [...], "items": [...]}``, a ``text/csv``
+    body, or a multipart upload in ``file`` (.csv or .json). Either the whole
+    batch is applied or nothing is; ``?dry_run=1`` validates and reports the
+    counts without committing.
+    """
+    if not _is_admin(request):
+        return jsonify({'error': 'unauthorized'}), 401
+    upload = request.files.get('file')
+    try:
+        if upload is not None:
+            text = upload.read().decode('utf-8-sig')
+            batch = parse_csv(text) if upload.filename.lower().endswith('.csv') else json.loads(text)
+        elif request.mimetype == 'text/csv':
+            batch = parse_csv(request.get_data(as_text=True))
+        else:
+            batch = request.get_json(silent=True)
+    except MenuImportError as e:
+        return jsonify({'error': str(e), 'errors': e.errors}), 400
+    except (UnicodeDecodeError, ValueError) as e:
+        return jsonify({'error': f'could not parse upload: {e}'}), 400
+    if not isinstance(batch, dict):
+        return jsonify({'error': 'expected a JSON object with categories and/or items, or CSV'}), 400
+    dry_run = request.args.get('dry_run', '').lower() in ('1', 'true', 'yes')
+    try:
+        counts = import_menu(batch, dry_run=dry_run)
+    except MenuImportError as e:
+        return jsonify({'error': str(e), 'errors': e.errors}), 400
+    return jsonify({'ok': True, 'dry_run': dry_run, **counts})
+
+
+@api_bp.route('/admin/menu/export', methods=['GET'])
+@replica_reads
+def admin_export_menu():
+    """Stream categories and menu items as JSON or CSV, in the import format."""
+    if not _is_admin(request):
+        return jsonify({'error': 'unauthorized'}), 401
+    fmt = request.args.get('format', 'json')
+    if fmt not in ('json', 'csv'):
+        return jsonify({'error': 'format must be json or csv'}), 400
+    body, mimetype = (export_csv(), 'text/csv') if fmt == 'csv' else (export_json(), 'application/json')
+    resp = Response(stream_with_context(body), mimetype=mimetype)
+    resp.headers['Content-Disposition'] = f'attachment; filename=menu.{fmt}'
+    return resp
+
+
 @api_bp.route('/gallery', methods=['GET'])
+@replica_reads
+@query_budget(0)
 def gallery_list():
     """Return list of image filenames in the project Images/ folder."""
-    # Images folder is located at repository root: ../../Images relative to this file
-    images_dir = os.path.normpath(os.path.join(os.path.dirname(__file__), '..', '..', 'Images'))
+    return send_encoded(gallery_index.listing_body())
+
+
+@api_bp.route('/gallery/index', methods=['GET'])
+@replica_reads
+@query_budget(0)
+def gallery_index_page():
+    """Paginated image metadata for the gallery.
+
+    Each entry has filename, width, height, bytes, mime_type, hash and a tiny
+    ``placeholder`` data URI to show while the image loads. Pass the returned
+    ``next_cursor`` as ``?after=`` to fetch the next page.
+    """
     try:
-        files = [f for f in os.listdir(images_dir) if os.path.isfile(os.path.join(images_dir, f))]
-    except Exception:
-        files = []
-    return jsonify(sorted(files))
+        limit = _parse_limit(request, default=50, maximum=200)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return send_encoded(gallery_index.page_body(request.args.get('after') or None, limit))
 
 
 @api_bp.route('/reservations', methods=['POST'])
@@ -370,43 +668,90 @@ def create_reservation():
         if newsletter:
             customer.newsletter = True
 
-    # table assignment: 1..30
-    TOTAL_TABLES = 30
-    # get reserved table numbers for the same timeslot
-    existing = Reservation.query.filter_by(time_slot=time_slot).all()
-    taken_tables = {r.table_number for r in existing}
-    available = [t for t in range(1, TOTAL_TABLES + 1) if t not in taken_tables]
-
-    if not available:
+    # table assignment: 1..TOTAL_TABLES, safe against concurrent bookings
+    res = allocator.allocate(customer.id, time_slot, guests)
+    if res is None:
         db.session.rollback()
         return jsonify({'error': 'no tables available for that time slot'}), 409
+    table_number = res.table_number
+    try:
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        allocator.release(time_slot, table_number)
+        raise
 
-    table_number = random.choice(available)
+    return jsonify({'reservation_id': res.id, 'table_number': table_number, 'time_slot': time_slot.isoformat()}), 201
 
-    res = Reservation(customer_id=customer.id, time_slot=time_slot, table_number=table_number, guests=guests)
-    db.session.add(res)
-    db.session.commit()
 
-    return jsonify({'reservation_id': res.id, 'table_number': table_number, 'time_slot': time_slot.isoformat()}), 201
+@api_bp.route('/reservations/availability', methods=['GET'])
+@query_budget(2)
+def reservation_availability():
+    """Free tables per time slot for ``date`` (YYYY-MM-DD) and the following ``days`` - 1 days (max 7)."""
+    try:
+        day = date.fromisoformat(request.args.get('date', ''))
+    except ValueError:
+        return jsonify({'error': 'date is required in YYYY-MM-DD format'}), 400
+    try:
+        n_days = int(request.args.get('days', 1))
+    except ValueError:
+        return jsonify({'error': 'days must be an integer'}), 400
+    n_days = max(1, min(n_days, 7))
+    return jsonify({
+        'total_tables': TOTAL_TABLES,
+        'days': [{'date': d.isoformat(), 'slots': slots} for d, slots in availability.get(day, n_days)],
+    })
 
 
 @api_bp.route('/admin/reservations', methods=['GET'])
+@replica_reads
+@query_budget(2)
 def admin_list_reservations():
+    """Return one page of reservations, latest time slot first, with their customers.
+
+    Query args: limit (default 100, max 500), cursor, from, to (on time_slot).
+    As with orders, the next page cursor is sent in the X-Next-Cursor header.
+    """
     if not _is_admin(request):
         return jsonify({'error': 'unauthorized'}), 401
-    resv = Reservation.query.order_by(Reservation.time_slot.desc()).all()
-    out = []
-    for r in resv:
-        cust = Customer.query.get(r.customer_id)
-        out.append({
-            'id': r.id,
-            'customer': {'id': cust.id, 'name': cust.name, 'email': cust.email, 'phone': cust.phone},
-            'time_slot': r.time_slot.isoformat(),
-            'table_number': r.table_number,
-            'guests': r.guests,
-            'created_at': r.created_at.isoformat()
-        })
-    return jsonify(out)
+    try:
+        limit = _parse_limit(request, default=100, maximum=500)
+        start, end = _parse_range(request)
+        cursor = request.args.get('cursor')
+        after = _decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # one joined query over just the columns the dashboard shows
+    q = db.session.query(
+        Reservation.id, Reservation.time_slot, Reservation.table_number, Reservation.guests, Reservation.created_at,
+        Customer.id, Customer.name, Customer.email, Customer.phone,
+    ).join(Customer, Customer.id == Reservation.customer_id)
+    if start:
+        q = q.filter(Reservation.time_slot >= start)
+    if end:
+        q = q.filter(Reservation.time_slot < end)
+    if after:
+        ts, res_id = after
+        q = q.filter(Reservation.time_slot <= ts, or_(Reservation.time_slot < ts, Reservation.id < res_id))
+    rows = q.order_by(Reservation.time_slot.desc(), Reservation.id.desc()).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    resp = jsonify([
+        {
+            'id': res_id,
+            'customer': {'id': cust_id, 'name': cust_name, 'email': cust_email, 'phone': cust_phone},
+            'time_slot': time_slot.isoformat(),
+            'table_number': table_number,
+            'guests': guests,
+            'created_at': created_at.isoformat() if created_at else None
+        }
+        for res_id, time_slot, table_number, guests, created_at, cust_id, cust_name, cust_email, cust_phone in rows
+    ])
+    if has_more:
+        resp.headers['X-Next-Cursor'] = _encode_cursor(rows[-1][1], rows[-1][0])
+    return resp
 
 
 @api_bp.route('/admin/reservations/<int:res_id>', methods=['DELETE'])
@@ -425,13 +770,75 @@ def admin_delete_reservation(res_id):
     return jsonify({'ok': True}), 200
 
 
+def _serialize_promotion(p):
+    def clock(t):
+        return t.isoformat(timespec='minutes') if t is not None else None
+    return {
+        'id': p.id,
+        'menu_item_id': p.menu_item_id,
+        'category_id': p.category_id,
+        'percent': p.percent,
+        'active': p.active,
+        'starts_at': p.starts_at.isoformat() if p.starts_at else None,
+        'ends_at': p.ends_at.isoformat() if p.ends_at else None,
+        'daily_start': clock(p.daily_start),
+        'daily_end': clock(p.daily_end),
+        'weekdays': [d for d in range(7) if p.weekdays >> d & 1] if p.weekdays is not None else None,
+    }
+
+
+def _apply_promotion_fields(promo, data):
+    """Copy percent/active and the schedule fields present in ``data`` onto ``promo``.
+
+    Raises ValueError with a client-facing message on bad values.
+    """
+    if 'percent' in data:
+        try:
+            percent = int(data['percent'])
+        except (TypeError, ValueError):
+            percent = -1
+        if percent < 0 or percent > 100:
+            raise ValueError('percent must be an integer 0-100')
+        promo.percent = percent
+    if 'active' in data:
+        promo.active = bool(data['active'])
+    for field in ('starts_at', 'ends_at'):
+        if field in data:
+            try:
+                setattr(promo, field, datetime.fromisoformat(data[field]) if data[field] else None)
+            except (TypeError, ValueError):
+                raise ValueError(f'{field} must be an ISO datetime (restaurant local time) or null')
+    for field in ('daily_start', 'daily_end'):
+        if field in data:
+            try:
+                setattr(promo, field, time.fromisoformat(data[field]) if data[field] else None)
+            except (TypeError, ValueError):
+                raise ValueError(f'{field} must be a time like "15:00" or null')
+    if 'weekdays' in data:
+        days = data['weekdays']
+        if days is None:
+            promo.weekdays = None
+        else:
+            if not isinstance(days, list) or not days or any(not isinstance(d, int) or not 0 <= d <= 6 for d in days):
+                raise ValueError('weekdays must be a non-empty list of day numbers, 0 = Monday .. 6 = Sunday, or null')
+            promo.weekdays = sum(1 << d for d in set(days))
+    if promo.starts_at and promo.ends_at and promo.starts_at >= promo.ends_at:
+        raise ValueError('ends_at must be after starts_at')
+    if (promo.daily_start is None) != (promo.daily_end is None):
+        raise ValueError('daily_start and daily_end go together')
+    if promo.daily_start is not None and promo.daily_start == promo.daily_end:
+        raise ValueError('daily_start and daily_end must differ; leave both out for all day')
+
+
 @api_bp.route('/admin/promotions', methods=['GET'])
+@replica_reads
+@query_budget(2)
 def admin_list_promotions():
     if not _is_admin(request):
         return jsonify({'error': 'unauthorized'}), 401
     try:
         promos = Promotion.query.order_by(Promotion.created_at.desc()).all()
-        return jsonify([{'id': p.id, 'menu_item_id': p.menu_item_id, 'percent': p.percent, 'active': p.active} for p in promos])
+        return jsonify([_serialize_promotion(p) for p in promos])
     except Exception:
         # promotions table doesn't exist yet
         return jsonify([])
@@ -439,32 +846,33 @@ def admin_list_promotions():
 
 @api_bp.route('/admin/promotions', methods=['POST'])
 def admin_create_promotion():
+    """Create a promotion for one menu item or a whole category.
+
+    Optional ``starts_at``/``ends_at`` (ISO datetimes) bound it in time and
+    ``daily_start``/``daily_end`` ("HH:MM", with ``weekdays`` as 0 = Monday
+    .. 6 = Sunday) repeat it daily, all in restaurant local time. Several
+    promotions may cover the same item; see promotions.py for which wins.
+    """
     if not _is_admin(request):
         return jsonify({'error': 'unauthorized'}), 401
     data = request.get_json() or {}
     menu_item_id = data.get('menu_item_id')
-    percent = data.get('percent')
-    active = bool(data.get('active', True))
-    if menu_item_id is None or percent is None:
-        return jsonify({'error': 'menu_item_id and percent are required'}), 400
-    # check if item exists
-    item = MenuItem.query.get(menu_item_id)
-    if not item:
+    category_id = data.get('category_id')
+    if (menu_item_id is None) == (category_id is None) or data.get('percent') is None:
+        return jsonify({'error': 'percent and exactly one of menu_item_id or category_id are required'}), 400
+    # check the target exists
+    if menu_item_id is not None and not MenuItem.query.get(menu_item_id):
         return jsonify({'error': f'menu item {menu_item_id} not found'}), 404
-    # check if promotion already exists for this item
-    existing = Promotion.query.filter_by(menu_item_id=menu_item_id).first()
-    if existing:
-        return jsonify({'error': f'promotion already exists for item {menu_item_id}'}), 400
+    if category_id is not None and not Category.query.get(category_id):
+        return jsonify({'error': f'category {category_id} not found'}), 404
+    promo = Promotion(menu_item_id=menu_item_id, category_id=category_id, active=True)
     try:
-        percent = int(percent)
-        if percent < 0 or percent > 100:
-            raise ValueError()
-    except Exception:
-        return jsonify({'error': 'percent must be an integer 0-100'}), 400
-    promo = Promotion(menu_item_id=menu_item_id, percent=percent, active=active)
+        _apply_promotion_fields(promo, data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     db.session.add(promo)
     db.session.commit()
-    return jsonify({'id': promo.id, 'menu_item_id': promo.menu_item_id, 'percent': promo.percent, 'active': promo.active}), 201
+    return jsonify(_serialize_promotion(promo)), 201
 
 
 @api_bp.route('/admin/promotions/<int:pid>', methods=['PUT', 'PATCH'])
@@ -475,16 +883,11 @@ def admin_update_promotion(pid):
     if not promo:
         return jsonify({'error': 'not found'}), 404
     data = request.get_json() or {}
-    if 'percent' in data:
-        try:
-            p = int(data['percent'])
-            if p < 0 or p > 100:
-                raise ValueError()
-            promo.percent = p
-        except Exception:
-            return jsonify({'error': 'percent must be an integer 0-100'}), 400
-    if 'active' in data:
-        promo.active = bool(data['active'])
+    try:
+        _apply_promotion_fields(promo, data)
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
     db.session.commit()
     return jsonify({'ok': True})
 
@@ -501,16 +904,108 @@ def admin_delete_promotion(pid):
     return jsonify({'ok': True}), 200
 
 
+# --- Sales analytics: read only the rollup tables (see rollups.py) ---------
+ANALYTICS_MAX_DAYS = 366
+ANALYTICS_MAX_HOURLY_DAYS = 92
+
+
+def _parse_days(req, max_days=ANALYTICS_MAX_DAYS):
+    """``from``/``to`` local dates, both inclusive; defaults to the last 30 days.
+
+    Returns ``(start, end)`` with ``end`` exclusive.
+    """
+    try:
+        end = date.fromisoformat(req.args['to']) if req.args.get('to') else local_now().date()
+        start = date.fromisoformat(req.args['from']) if req.args.get('from') else end - timedelta(days=29)
+    except ValueError:
+        raise ValueError('from and to must be ISO dates (YYYY-MM-DD)')
+    if start > end:
+        raise ValueError('from must not be after to')
+    if (end - start).days >= max_days:
+        raise ValueError(f'at most {max_days} days per request')
+    return start, end + timedelta(days=1)
+
+
+def _analytics_breakdown(kind, model, id_arg):
+    """Ranking by revenue, or one entity's daily series when ``id_arg`` is given."""
+    if not _is_admin(request):
+        return jsonify({'error': 'unauthorized'}), 401
+    try:
+        start, end = _parse_days(request)
+        limit = _parse_limit(request, default=20, maximum=500)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    raw_id = request.args.get(id_arg)
+    if raw_id and not raw_id.isdigit():
+        return jsonify({'error': f'{id_arg} must be an integer'}), 400
+    entity_id = int(raw_id) if raw_id else None
+    period = {'from': start.isoformat(), 'to': (end - timedelta(days=1)).isoformat()}
+    if entity_id is not None:
+        return jsonify({**period, id_arg: entity_id, 'series': rollups.series(kind, entity_id, start, end)})
+    rows = rollups.ranking(kind, start, end, limit)
+    ids = [r['id'] for r in rows if r['id']]
+    names = dict(db.session.query(model.id, model.name).filter(model.id.in_(ids))) if ids else {}
+    for r in rows:
+        r['name'] = names.get(r['id'])
+    return jsonify({**period, 'rows': rows})
+
+
+@api_bp.route('/admin/analytics/revenue', methods=['GET'])
+@replica_reads
+@query_budget(2)
+def admin_analytics_revenue():
+    """Orders, covers and revenue per day (or ``interval=hour``) for a date range."""
+    if not _is_admin(request):
+        return jsonify({'error': 'unauthorized'}), 401
+    interval = request.args.get('interval', 'day')
+    if interval not in ('day', 'hour'):
+        return jsonify({'error': 'interval must be day or hour'}), 400
+    try:
+        start, end = _parse_days(request, ANALYTICS_MAX_HOURLY_DAYS if interval == 'hour' else ANALYTICS_MAX_DAYS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    body = rollups.revenue(start, end, interval)
+    return jsonify({'from': start.isoformat(), 'to': (end - timedelta(days=1)).isoformat(), 'interval': interval, **body})
+
+
+@api_bp.route('/admin/analytics/items', methods=['GET'])
+@replica_reads
+@query_budget(2)
+def admin_analytics_items():
+    """Top menu items by revenue, or one item's days with ``menu_item_id``."""
+    return _analytics_breakdown('item', MenuItem, 'menu_item_id')
+
+
+@api_bp.route('/admin/analytics/categories', methods=['GET'])
+@replica_reads
+@query_budget(2)
+def admin_analytics_categories():
+    """Top categories by revenue, or one category's days with ``category_id``."""
+    return _analytics_breakdown('category', Category, 'category_id')
+
+
 @api_bp.route('/images/<path:filename>')
 def serve_image(filename):
-    images_dir = os.path.normpath(os.path.join(os.path.dirname(__file__), '..', '..', 'Images'))
-    # basic security: don't allow path traversal
-    full_path = os.path.normpath(os.path.join(images_dir, filename))
-    if not full_path.startswith(os.path.abspath(images_dir)):
-        abort(404)
-    if not os.path.exists(full_path):
+    """Serve an image; ``?w=320`` asks for a resized variant (WebP when accepted)."""
+    width = request.args.get('w', type=int)
+    if width and width > 0:
+        # only an explicit image/webp counts; */* also comes from browsers without WebP
+        fmt = 'webp' if 'image/webp' in request.accept_mimetypes.values() else 'jpeg'
+        variant = find_variant(filename, width, fmt)
+        resp = send_image(VARIANTS_DIR, variant) if variant else None
+        if resp is None:
+            # not the variant this URL will serve once it's built: don't let
+            # browsers or CDNs keep the full-size original under it for a year
+            resp = send_image(IMAGES_DIR, filename, max_age=VARIANT_PENDING_MAX_AGE)
+        if resp is None:
+            abort(404)
+        resp.vary.add('Accept')
+        return resp
+    # send_image rejects path traversal (safe_join) and missing files
+    resp = send_image(IMAGES_DIR, filename)
+    if resp is None:
         abort(404)
-    return send_from_directory(images_dir, filename)
+    return resp
 
 
 @api_bp.route('/newsletter', methods=['POST'])
@@ -0,0 +1,149 @@
+"""In-memory catalog snapshot for the menu, index and admin item endpoints.
+
+``list_menu`` and ``index`` are hit on every page load, so instead of querying
+categories, promotions and items per request we build the whole tree once from
+a single joined query and keep it until an admin write to categories, menu
+items or promotions commits (see ``hooks.on_commit``), or a promotion window
+opens or closes (see ``promotions.schedule``). Each response is kept as a
+pre-encoded, pre-compressed ``EncodedBody`` for that catalog version.
+
+The snapshot is per process. Commits made elsewhere (other workers, menu
+imports run from a script) reach it through ``hooks.sync``, which every
+request runs first, so a worker serves the old snapshot and ETag for at most
+``CACHE_SYNC_INTERVAL`` seconds after another process's change.
+"""
+import threading
+from . import db
+from .database import use_primary
+from .hooks import on_commit
+from .models import Category, MenuItem, Promotion
+from .promotions import schedule
+from .responses import encode_json
+
+CATALOG_MODELS = (Category, MenuItem, Promotion)
+
+_lock = threading.Lock()
+# bumped on every commit that touches CATALOG_MODELS
+_version = 0
+# name -> EncodedBody, all built for _snapshot_key: (_version, promotion schedule token)
+_snapshot = {}
+_snapshot_key = None
+
+
+def catalog_version():
+    return _version
+
+
+def invalidate(changes=None):
+    global _version
+    with _lock:
+        _version += 1
+        _snapshot.clear()
+
+
+def _build_menu():
+    # keep the order the per-category queries used to produce
+    rows = (
+        db.session.query(Category, MenuItem)
+        .select_from(Category)
+        .outerjoin(MenuItem, MenuItem.category_id == Category.id)
+        .order_by(Category.position, Category.id, MenuItem.id)
+        .all()
+    )
+    categories = []
+    by_cat = {}
+    for cat, item in rows:
+        if cat.id not in by_cat:
+            by_cat[cat.id] = {'cat': cat, 'items': []}
+            categories.append(by_cat[cat.id])
+        if item is not None:
+            by_cat[cat.id]['items'].append(item)
+
+    # discounts in effect now; get_body rebuilds when the schedule moves on
+    _token, active_promos = schedule.current()
+
+    menu = {
+        'categories': [
+            {
+                'id': c['cat'].id,
+                'name': c['cat'].name,
+                'items': [
+                    {
+                        'id': i.id,
+                        'name': i.name,
+                        'description': i.description,
+                        'price_cents': i.price_cents,
+                        'available': i.available,
+                        'image_filename': i.image_filename,
+                        'discount_percent': active_promos.get(i.id),
+                    }
+                    for i in c['items']
+                ],
+            }
+            for c in categories
+        ],
+        'promotions': sorted(active_promos.items()),
+    }
+    index = [
+        {
+            'id': c['cat'].id,
+            'name': c['cat'].name,
+            'items': [
+                {
+                    'id': i.id,
+                    'name': i.name,
+                    'description': i.description,
+                    'price_cents': i.price_cents,
+                    'available': i.available,
+                    'image_filename': i.image_filename,
+                    'category_id': i.category_id,
+                }
+                for i in c['items']
+            ],
+        }
+        for c in categories
+    ]
+    return {'menu': encode_json(menu), 'index': encode_json(index)}
+
+
+def _build_admin_menu_items():
+    items = MenuItem.query.order_by(MenuItem.created_at.desc()).all()
+    return {'admin_menu_items': encode_json([
+        {'id': i.id, 'name': i.name, 'description': i.description, 'price_cents': i.price_cents, 'available': i.available, 'category_id': i.category_id, 'image_filename': i.image_filename}
+        for i in items
+    ])}
+
+
+# body name -> builder returning {name: EncodedBody}; one builder may fill several
+_BUILDERS = {
+    'menu': _build_menu,
+    'index': _build_menu,
+    'admin_menu_items': _build_admin_menu_items,
+}
+
+
+def get_body(name):
+    """Return the pre-encoded body ``name`` for the current catalog version."""
+    global _snapshot_key
+    # discounts change at promotion window boundaries as well as on commits
+    token, _discounts = schedule.current()
+    key = (_version, token)
+    if _snapshot_key == key:
+        body = _snapshot.get(name)
+        if body is not None:
+            return body
+    with _lock:
+        key = (_version, token)
+        if _snapshot_key != key:
+            _snapshot.clear()
+            _snapshot_key = key
+        if name not in _snapshot:
+            # invalidate() waits on the lock, so a commit landing mid-build
+            # bumps the version afterwards and the next call rebuilds; read
+            # from the primary so a lagging replica can't pin stale data
+            with use_primary():
+                _snapshot.update(_BUILDERS[name]())
+        return _snapshot[name]
+
+
+on_commit(CATALOG_MODELS, invalidate)
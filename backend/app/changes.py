@@ -0,0 +1,194 @@
+"""Change log for admin delta sync.
+
+Every flush that inserts, updates or deletes a category, menu item,
+promotion or reservation appends one ``change_log`` row per instance in the
+same transaction, so the log commits (or rolls back) together with the data.
+``GET /api/admin/changes?since=<seq>`` returns the rows after a cursor and
+clients replay them onto their local copy.
+
+Writers don't coordinate: the sequence orders rows, but on PostgreSQL seq 11
+can commit while 10 is still in flight, and a reader that moved its cursor
+to 11 would never see 10. So readers only move the cursor over a gap once
+the row after it is ``CHANGE_LOG_GAP_SECONDS`` old (default 30); requests
+commit within seconds of their flush, so by then the missing number has been
+rolled back. ``hooks.sync`` still applies rows past a young gap; the API
+stops at it until it settles.
+
+``prune`` deletes rows older than ``CHANGE_LOG_RETENTION_DAYS`` (default 7);
+scripts/refresh_rollups.py runs it. A cursor older than what is left gets
+``None`` from ``since`` and the client has to reload.
+"""
+import json
+import os
+import uuid
+from datetime import date, datetime, time, timedelta
+from sqlalchemy import delete, event, func, insert
+from . import db
+from .models import Category, ChangeLog, MenuItem, Promotion, Reservation
+
+# model -> entity name used in the log and the API
+TRACKED = {
+    Category: 'category',
+    MenuItem: 'menu_item',
+    Promotion: 'promotion',
+    Reservation: 'reservation',
+}
+GAP_SECONDS = float(os.getenv('CHANGE_LOG_GAP_SECONDS', '30'))
+RETENTION_DAYS = float(os.getenv('CHANGE_LOG_RETENTION_DAYS', '7'))
+# (pid, token): regenerated in a forked worker
+_origin = (None, None)
+
+
+def process_origin():
+    """Token logged as ``change_log.origin`` for rows this process writes."""
+    global _origin
+    pid = os.getpid()
+    if _origin[0] != pid:
+        _origin = (pid, uuid.uuid4().hex)
+    return _origin[1]
+
+
+def row_dict(obj):
+    """Column values of a loaded instance, as logged in ``data``."""
+    return {column.key: getattr(obj, column.key) for column in obj.__table__.columns}
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def _entry(entity, op, data):
+    return {
+        'entity': entity,
+        'entity_id': data['id'],
+        'op': op,
+        'data': None if op == 'delete' else json.dumps(data, separators=(',', ':'), default=_json_default),
+        'changed_at': datetime.utcnow(),
+        'origin': process_origin(),
+    }
+
+
+def _write(session, rows):
+    if not rows:
+        return
+    session.connection().execute(insert(ChangeLog), rows)
+
+
+def _after_flush(session, flush_context):
+    rows = []
+    groups = (
+        ('insert', session.new),
+        ('update', [o for o in session.dirty if session.is_modified(o)]),
+        ('delete', session.deleted),
+    )
+    for op, objs in groups:
+        for obj in objs:
+            entity = TRACKED.get(type(obj))
+            if entity is not None:
+                rows.append(_entry(entity, op, {'id': obj.id} if op == 'delete' else row_dict(obj)))
+    _write(session, rows)
+
+
+def record(session, model, op, rows):
+    """Log changes written with bulk statements, which skip flush events.
+
+    ``rows`` are dicts of every column after the change (just ``id`` for
+    deletes); they are logged in the current transaction.
+    """
+    entity = TRACKED[model]
+    _write(session, [_entry(entity, op, data) for data in rows])
+
+
+def _settle_cutoff():
+    return datetime.utcnow() - timedelta(seconds=GAP_SECONDS)
+
+
+def settled(rows, seq):
+    """How many of ``rows`` (``(seq, changed_at)`` after ``seq``, in seq order) the cursor may pass.
+
+    It stops before a gap whose next row is younger than ``GAP_SECONDS``:
+    the missing number may still commit.
+    """
+    cutoff = _settle_cutoff()
+    count = 0
+    for row_seq, changed_at in rows:
+        if row_seq != seq + 1 and changed_at > cutoff:
+            break
+        count += 1
+        seq = row_seq
+    return count
+
+
+def head():
+    """Cursor covering every settled row (0 when the log is empty).
+
+    Younger rows may sit above it; a client starting here gets them again on
+    its first poll, which replays harmlessly.
+    """
+    return (
+        db.session.query(func.max(ChangeLog.seq))
+        .filter(ChangeLog.changed_at <= _settle_cutoff())
+        .scalar()
+    ) or 0
+
+
+def since(seq, limit):
+    """Up to ``limit`` settled changes after ``seq``, oldest first.
+
+    None when rows after ``seq`` have been pruned.
+    """
+    rows = (
+        ChangeLog.query.filter(ChangeLog.seq > seq)
+        .order_by(ChangeLog.seq)
+        .limit(limit)
+        .all()
+    )
+    rows = rows[:settled([(r.seq, r.changed_at) for r in rows], seq)]
+    if rows and rows[0].seq > seq + 1:
+        # a settled gap at the start: pruned if nothing before it is left
+        oldest = db.session.query(func.min(ChangeLog.seq)).scalar()
+        if oldest == rows[0].seq:
+            return None
+    return [
+        {
+            'seq': r.seq,
+            'entity': r.entity,
+            'id': r.entity_id,
+            'op': r.op,
+            'data': json.loads(r.data) if r.data is not None else None,
+            'changed_at': r.changed_at.isoformat(),
+        }
+        for r in rows
+    ]
+
+
+def prune(days=RETENTION_DAYS):
+    """Delete the rows before the first one younger than ``days`` and commit.
+
+    Returns how many. Only a prefix of the log is ever removed, so ``since``
+    can tell a pruned cursor from a gap, and the newest row is always kept
+    so the head never goes backwards.
+    """
+    keep = (
+        db.session.query(func.min(ChangeLog.seq))
+        .filter(ChangeLog.changed_at >= datetime.utcnow() - timedelta(days=days))
+        .scalar()
+    )
+    if keep is None:
+        keep = db.session.query(func.max(ChangeLog.seq)).scalar()
+        if keep is None:
+            return 0
+    result = db.session.execute(delete(ChangeLog).where(ChangeLog.seq < keep))
+    db.session.commit()
+    return result.rowcount
+
+
+def _install():
+    if event.contains(db.session, 'after_flush', _after_flush):
+        return
+    event.listen(db.session, 'after_flush', _after_flush)
+
+
+_install()
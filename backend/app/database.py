@@ -0,0 +1,149 @@
+"""Engine configuration and read-replica routing.
+
+Pool settings, pre-ping, recycling and a per-statement timeout come from the
+environment (see ``.env.example``) and apply to the primary and, when
+``DATABASE_REPLICA_URL`` is set, to the replica as well.
+
+Views marked with ``@replica_reads`` run their ORM reads against the replica
+when one is configured; anything flushed still goes to the primary. Caches
+that are invalidated on commit (the catalog snapshot) must be rebuilt from
+the primary, otherwise a lagging replica would pin the old data until the
+next change, so their builders run inside ``use_primary()``.
+"""
+import os
+import time
+from contextlib import contextmanager
+from flask import g, has_app_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+REPLICA_BIND = 'replica'
+# SQLite only checks the deadline every this many VM instructions
+_SQLITE_PROGRESS_STEPS = 10000
+
+
+def _env_int(name, default):
+    return int(os.getenv(name, str(default)))
+
+
+def engine_options(url):
+    """Engine keyword arguments for ``url`` built from the DB_* settings."""
+    url = make_url(url)
+    options = {'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', '1').lower() in ('1', 'true', 'yes')}
+    memory_sqlite = url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+    # in-memory SQLite runs on a single StaticPool connection
+    if not memory_sqlite:
+        options.update(
+            pool_size=_env_int('DB_POOL_SIZE', 5),
+            max_overflow=_env_int('DB_MAX_OVERFLOW', 10),
+            pool_timeout=_env_int('DB_POOL_TIMEOUT', 30),
+            pool_recycle=_env_int('DB_POOL_RECYCLE', 1800),
+        )
+    timeout_ms = _env_int('DB_STATEMENT_TIMEOUT_MS', 30000)
+    if timeout_ms and url.get_backend_name() == 'postgresql':
+        options['connect_args'] = {'options': f'-c statement_timeout={timeout_ms}'}
+    return options
+
+
+def configure(app):
+    """Set engine config on ``app``; call before ``db.init_app``."""
+    primary = app.config['SQLALCHEMY_DATABASE_URI']
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(primary)
+    app.config['DB_STATEMENT_TIMEOUT_MS'] = _env_int('DB_STATEMENT_TIMEOUT_MS', 30000)
+    replica = os.getenv('DATABASE_REPLICA_URL')
+    if replica:
+        app.config['SQLALCHEMY_BINDS'] = {REPLICA_BIND: {'url': replica, **engine_options(replica)}}
+
+
+def init_app(app, db):
+    """Install the statement timeout listeners and per-request routing."""
+    timeout_ms = app.config.get('DB_STATEMENT_TIMEOUT_MS')
+    with app.app_context():
+        for engine in db.engines.values():
+            if timeout_ms and engine.dialect.name == 'sqlite':
+                _sqlite_statement_timeout(engine, timeout_ms / 1000.0)
+            elif timeout_ms and engine.dialect.name == 'mysql':
+                _mysql_statement_timeout(engine, timeout_ms)
+
+    @app.before_request
+    def _route_reads():
+        view = app.view_functions.get(request.endpoint)
+        g.db_read_replica = getattr(view, 'replica_reads', False) and request.method in ('GET', 'HEAD')
+
+
+def _sqlite_statement_timeout(engine, seconds):
+    # SQLite has no statement timeout; abort from the progress handler once the
+    # statement has run past its deadline (the cursor raises "interrupted")
+    deadlines = {}
+
+    @event.listens_for(engine, 'connect')
+    def _install(dbapi_conn, _record):
+        key = id(dbapi_conn)
+        dbapi_conn.set_progress_handler(
+            lambda: 1 if deadlines.get(key, float('inf')) < time.monotonic() else 0,
+            _SQLITE_PROGRESS_STEPS,
+        )
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        deadlines[id(conn.connection.dbapi_connection)] = time.monotonic() + seconds
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _stop(conn, cursor, statement, parameters, context, executemany):
+        deadlines.pop(id(conn.connection.dbapi_connection), None)
+
+
+def _mysql_statement_timeout(engine, timeout_ms):
+    @event.listens_for(engine, 'connect')
+    def _set_timeout(dbapi_conn, _record):
+        cursor = dbapi_conn.cursor()
+        cursor.execute(f'SET SESSION max_execution_time = {int(timeout_ms)}')
+        cursor.close()
+
+
+# PostgreSQL undefined_table / undefined_column, MySQL ER_NO_SUCH_TABLE / ER_BAD_FIELD_ERROR
+_MISSING_PGCODES = ('42P01', '42703')
+_MISSING_MYSQL_CODES = (1146, 1054)
+
+
+def missing_table(error):
+    """True when a DBAPI error says a table or column doesn't exist (schema not migrated yet)."""
+    orig = getattr(error, 'orig', error)
+    if getattr(orig, 'pgcode', None) is not None:
+        return orig.pgcode in _MISSING_PGCODES
+    if orig.args and orig.args[0] in _MISSING_MYSQL_CODES:
+        return True
+    message = str(orig).lower()
+    return message.startswith('no such table') or message.startswith('no such column')
+
+
+def replica_reads(view):
+    """Mark a read-only view so its queries go to the read replica."""
+    view.replica_reads = True
+    return view
+
+
+@contextmanager
+def use_primary():
+    """Force reads inside the block onto the primary."""
+    if not has_app_context():
+        yield
+        return
+    previous = g.get('db_read_replica', False)
+    g.db_read_replica = False
+    try:
+        yield
+    finally:
+        g.db_read_replica = previous
+
+
+class RoutingSession(Session):
+    """Session that sends reads to the replica inside ``@replica_reads`` views."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_app_context() and g.get('db_read_replica'):
+            engine = self._db.engines.get(REPLICA_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
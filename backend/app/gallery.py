@@ -0,0 +1,181 @@
+"""Persistent gallery index.
+
+Keeps width, height, byte size, MIME type, content hash and a tiny inline
+placeholder (LQIP) for every image in ``Images/``, so the frontend can reserve
+space and show a blurred preview before downloading anything. The index is
+stored next to the images in ``.cache/gallery-index.json`` and refreshed
+incrementally: a request only stats the directory, and when its mtime moved
+(an upload, a deletion) just the new or changed files are re-read.
+
+Files overwritten in place under the same name do not bump the directory
+mtime; uploads never do that since they are content-addressed.
+"""
+import base64
+import hashlib
+import io
+import json
+import mimetypes
+import os
+import threading
+from .images import CHUNK_SIZE, HASH_CHARS, IMAGES_DIR
+from .responses import encode_json
+
+try:
+    from PIL import Image
+except ImportError:  # optional; without it dimensions and placeholders are null
+    Image = None
+
+# kept in a subdirectory so rewriting it doesn't bump the Images/ mtime
+INDEX_PATH = os.path.join('.cache', 'gallery-index.json')
+PLACEHOLDER_WIDTH = 16
+# cached encoded pages per index version
+MAX_CACHED_PAGES = 256
+
+
+class GalleryIndex:
+    def __init__(self, images_dir=IMAGES_DIR):
+        self.images_dir = images_dir
+        self.index_path = os.path.join(images_dir, INDEX_PATH)
+        self._lock = threading.Lock()
+        self._dir_mtime = None
+        # filename -> metadata dict; _names holds the keys in sorted order
+        self._entries = None
+        self._names = []
+        self._pages = {}
+        self._listing = None
+
+    def _load(self):
+        try:
+            with open(self.index_path, encoding='utf-8') as f:
+                return json.load(f).get('images', {})
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self):
+        tmp = self.index_path + '.tmp'
+        try:
+            os.makedirs(os.path.dirname(tmp), exist_ok=True)
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump({'images': self._entries}, f, separators=(',', ':'))
+            os.replace(tmp, self.index_path)
+        except OSError:
+            # a read-only Images/ still works, we just rebuild after restarts
+            pass
+
+    def _describe(self, name, st):
+        path = os.path.join(self.images_dir, name)
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+        meta = {
+            'filename': name,
+            'bytes': st.st_size,
+            'mime_type': mimetypes.guess_type(name)[0] or 'application/octet-stream',
+            'hash': digest.hexdigest()[:HASH_CHARS],
+            'width': None,
+            'height': None,
+            'placeholder': None,
+            'mtime_ns': st.st_mtime_ns,
+        }
+        if Image is not None:
+            try:
+                with Image.open(path) as img:
+                    meta['width'], meta['height'] = img.size
+                    thumb = img.convert('RGB')
+                    thumb.thumbnail((PLACEHOLDER_WIDTH, PLACEHOLDER_WIDTH * 4))
+                    buf = io.BytesIO()
+                    thumb.save(buf, 'WEBP', quality=30)
+                    meta['placeholder'] = 'data:image/webp;base64,' + base64.b64encode(buf.getvalue()).decode('ascii')
+            except Exception:
+                # formats Pillow can't read (e.g. AVIF without a plugin) keep null dimensions
+                pass
+        return meta
+
+    def refresh(self, force=False):
+        """Bring the index up to date with the directory; cheap when nothing changed."""
+        try:
+            dir_mtime = os.stat(self.images_dir).st_mtime_ns
+        except OSError:
+            dir_mtime = None
+        if not force and self._entries is not None and dir_mtime == self._dir_mtime:
+            return
+        with self._lock:
+            if not force and self._entries is not None and dir_mtime == self._dir_mtime:
+                return
+            known = self._entries if self._entries is not None else self._load()
+            entries = {}
+            changed = self._entries is None
+            try:
+                names = os.listdir(self.images_dir)
+            except OSError:
+                names = []
+            for name in names:
+                # dotfiles are in-flight uploads
+                if name.startswith('.'):
+                    continue
+                try:
+                    st = os.stat(os.path.join(self.images_dir, name))
+                except OSError:
+                    continue
+                if not os.path.isfile(os.path.join(self.images_dir, name)):
+                    continue
+                meta = known.get(name)
+                if meta is None or meta.get('bytes') != st.st_size or meta.get('mtime_ns') != st.st_mtime_ns:
+                    try:
+                        meta = self._describe(name, st)
+                    except OSError:
+                        continue
+                    changed = True
+                entries[name] = meta
+            if set(entries) != set(known):
+                changed = True
+            self._entries = entries
+            self._names = sorted(entries)
+            self._pages = {}
+            self._listing = None
+            self._dir_mtime = dir_mtime
+            if changed:
+                self._save()
+
+    def listing_body(self):
+        """Pre-encoded sorted list of filenames (the original /api/gallery shape)."""
+        self.refresh()
+        body = self._listing
+        if body is None:
+            body = self._listing = encode_json(self._names)
+        return body
+
+    def page_body(self, after=None, limit=50):
+        """Pre-encoded page of metadata for filenames sorted after ``after``."""
+        self.refresh()
+        key = (after, limit)
+        body = self._pages.get(key)
+        if body is not None:
+            return body
+        names = self._names
+        start = 0
+        if after:
+            # keyset on filename: first name strictly greater than the cursor
+            lo, hi = 0, len(names)
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if names[mid] <= after:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            start = lo
+        page = names[start:start + limit]
+        images = []
+        for name in page:
+            meta = dict(self._entries[name])
+            meta.pop('mtime_ns', None)
+            images.append(meta)
+        next_cursor = page[-1] if start + limit < len(names) and page else None
+        body = encode_json({'images': images, 'next_cursor': next_cursor, 'total': len(names)})
+        if len(self._pages) < MAX_CACHED_PAGES:
+            self._pages[key] = body
+        return body
+
+
+gallery_index = GalleryIndex()
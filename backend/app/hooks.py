@@ -0,0 +1,189 @@
+"""Commit hooks shared by the in-memory caches.
+
+Subsystems register interest in a set of models with ``on_commit``; the hook
+collects matching rows as the session flushes and calls back once the
+surrounding transaction has actually committed (never on rollback).
+
+That only sees commits made by this process. Other workers, imports and CLI
+scripts are picked up by ``sync``, which every request runs first: the change
+log (see ``changes.py``) is the shared version stamp, and when its head has
+moved the watchers of every entity another process logged since the last
+look are reset. Rows this process wrote are skipped: its own commits already
+went through the watchers' callbacks, which update the caches key by key. The
+head is read at most every ``CACHE_SYNC_INTERVAL`` seconds (default 1), so
+that is how long another process's change can take to show up here. A
+worker that hasn't synced for longer than the change log retention resets
+everything, since the rows it missed may have been pruned.
+"""
+import os
+import threading
+import time
+from sqlalchemy import event, func
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from . import db
+from .database import missing_table, use_primary
+
+SYNC_INTERVAL = float(os.getenv('CACHE_SYNC_INTERVAL', '1'))
+
+# list of (models, callback, capture, reset) registered via on_commit()
+_watchers = []
+_INFO_KEY = 'commit_hooks'
+_sync_lock = threading.Lock()
+# change log cursor as of the last sync (None: never synced), when that was
+# and when to look again
+_synced_seq = None
+_synced_at = 0.0
+_next_sync = 0.0
+# rows past a young gap in the log (see changes.settled) already applied
+_applied = set()
+
+
+def _default_capture(op, obj):
+    return (op, type(obj).__name__, getattr(obj, 'id', None))
+
+
+def on_commit(models, callback, capture=None, reset=None):
+    """Call ``callback(changes)`` after a commit that touched any of ``models``.
+
+    ``changes`` is a list built from ``capture(op, obj)`` for every inserted,
+    updated or deleted instance, where ``op`` is 'insert', 'update' or
+    'delete'. Capture runs at flush time while the instance is still loaded,
+    so it should copy whatever the callback needs (instances are expired by
+    the time the callback runs).
+
+    ``reset()`` drops everything the watcher caches; ``sync`` calls it when
+    another process changed one of ``models``. Watchers with the default
+    capture get ``callback(None)`` instead; ones with a custom capture and
+    no ``reset`` are not synced.
+    """
+    _watchers.append((tuple(models), callback, capture or _default_capture, reset))
+    _install()
+
+
+def _after_flush(session, flush_context):
+    pending = session.info.setdefault(_INFO_KEY, {})
+    groups = (
+        ('insert', session.new),
+        ('update', [o for o in session.dirty if session.is_modified(o)]),
+        ('delete', session.deleted),
+    )
+    for idx, (models, _cb, capture, _reset) in enumerate(_watchers):
+        for op, objs in groups:
+            for obj in objs:
+                if isinstance(obj, models):
+                    pending.setdefault(idx, []).append(capture(op, obj))
+
+
+def record(session, op, model, ids):
+    """Register changes written with bulk statements, which skip flush events.
+
+    Only watchers using the default capture can be fed this way; they receive
+    ``(op, model name, id)`` tuples exactly as if the rows had been flushed.
+    """
+    pending = session.info.setdefault(_INFO_KEY, {})
+    for idx, (models, _cb, capture, _reset) in enumerate(_watchers):
+        if not issubclass(model, models):
+            continue
+        if capture is not _default_capture:
+            raise ValueError(f'{model.__name__} has a watcher with a custom capture; write it through the ORM')
+        pending.setdefault(idx, []).extend((op, model.__name__, i) for i in ids)
+
+
+def _after_commit(session):
+    pending = session.info.pop(_INFO_KEY, None)
+    if not pending:
+        return
+    for idx, changes in pending.items():
+        _watchers[idx][1](changes)
+
+
+def _reset(models):
+    for watched, callback, capture, reset in _watchers:
+        if models is not None and not any(issubclass(m, watched) for m in models):
+            continue
+        if reset is not None:
+            reset()
+        elif capture is _default_capture:
+            callback(None)
+
+
+def sync(force=False):
+    """Reset caches holding data another process has changed since the last look.
+
+    Cheap to call often: unless ``force`` it only queries once per
+    ``SYNC_INTERVAL``. Call it before a unit of work starts; if the change
+    log table doesn't exist yet the session is rolled back.
+    """
+    global _synced_seq, _synced_at, _next_sync, _applied
+    now = time.monotonic()
+    if not force and now < _next_sync:
+        return
+    _next_sync = now + SYNC_INTERVAL
+    from .changes import RETENTION_DAYS, TRACKED, head as settled_head, process_origin, settled
+    from .models import ChangeLog
+    seen = _synced_seq
+    if seen is not None and now - _synced_at > RETENTION_DAYS * 86400:
+        seen = None
+    try:
+        with use_primary():
+            if seen is None:
+                head = settled_head()
+                rows = None
+            else:
+                rows = (
+                    db.session.query(
+                        ChangeLog.seq, ChangeLog.changed_at, ChangeLog.entity,
+                        ChangeLog.origin == process_origin(),
+                    )
+                    .filter(ChangeLog.seq > seen)
+                    .order_by(ChangeLog.seq)
+                    .all()
+                )
+                if not rows:
+                    _synced_at = now
+                    return
+                count = settled([(seq, changed_at) for seq, changed_at, _entity, _mine in rows], seen)
+                head = rows[count - 1][0] if count else seen
+    except (OperationalError, ProgrammingError) as e:
+        if not missing_table(e):
+            raise
+        db.session.rollback()
+        return
+    with _sync_lock:
+        if seen is not None and _synced_seq != seen:
+            # a concurrent sync got here first
+            return
+        _synced_seq, _synced_at = head, now
+        if rows is None:
+            _applied, changed = set(), None
+        else:
+            fresh = [row for row in rows if row[0] not in _applied]
+            # rows past a young gap are applied now but stay above the cursor
+            # until it settles; remember them so they aren't reset again
+            _applied = {row[0] for row in rows if row[0] > head}
+            # NULL origin (rows logged before it was recorded) counts as foreign
+            entities = {entity for _seq, _at, entity, mine in fresh if not mine}
+            changed = [model for model, entity in TRACKED.items() if entity in entities]
+    # the first sync can't know what was built before it, so it resets everything
+    if changed is None or changed:
+        _reset(changed)
+
+
+def init_app(app):
+    """Run ``sync`` before every request."""
+    app.before_request(lambda: sync())
+
+
+def _after_soft_rollback(session, previous_transaction):
+    # a rolled back savepoint leaves the outer transaction alive; only forget
+    # what we collected once the whole transaction is gone
+    if not session.in_transaction():
+        session.info.pop(_INFO_KEY, None)
+
+
+def _install():
+    if event.contains(db.session, 'after_flush', _after_flush):
+        return
+    event.listen(db.session, 'after_flush', _after_flush)
+    event.listen(db.session, 'after_commit', _after_commit)
+    event.listen(db.session, 'after_soft_rollback', _after_soft_rollback)
@@ -0,0 +1,346 @@
+"""Menu and gallery images: upload storage and resized variants.
+
+Uploads land in the repository ``Images/`` folder under a content address: the
+upload is streamed to disk in chunks while its SHA-256 is computed, and the
+file is stored as ``<hash>.<ext>``. Uploading bytes we already have reuses the
+existing file, and since a name always means the same bytes, image URLs are
+safe to cache forever. After an upload the admin
+request schedules variant generation on a small background thread pool: the
+image is resized to each width in ``VARIANT_WIDTHS`` and written as WebP and
+JPEG under ``Images/variants/``. ``serve_image`` asks ``find_variant`` for a
+size and falls back to the original until the variant exists.
+
+Resizing needs Pillow; without it no variants are produced and originals are
+always served.
+
+``send_image`` is the serving side: content-addressed names get a year-long
+``immutable`` Cache-Control, conditional GET and Range requests are answered
+by werkzeug, small hot images are kept in an in-memory LRU, and with
+``IMAGES_ACCEL_REDIRECT`` (nginx) or ``USE_X_SENDFILE`` (Apache/lighttpd)
+configured the file transfer is handed off to the front proxy.
+"""
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+import stat
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from flask import current_app, request, send_file
+from werkzeug.security import safe_join
+from werkzeug.utils import secure_filename
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # optional; without it we only serve originals
+    Image = None
+
+log = logging.getLogger(__name__)
+
+# Images folder is located at repository root: ../../Images relative to this file
+IMAGES_DIR = os.path.normpath(os.path.join(os.path.dirname(__file__), '..', '..', 'Images'))
+VARIANTS_DIR = os.path.join(IMAGES_DIR, 'variants')
+# 32 hex chars (128 bits) of the SHA-256 of the file contents
+HASH_CHARS = 32
+CHUNK_SIZE = 64 * 1024
+CONTENT_ADDRESS_RE = re.compile(r'^[0-9a-f]{%d}(_w\d+)?\.[a-z0-9]+$' % HASH_CHARS)
+VARIANT_WIDTHS = (160, 320, 640, 1280)
+# format name -> (file extension, Pillow save options)
+VARIANT_FORMATS = {
+    'webp': ('webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+# immutable content-addressed files vs. names that may be overwritten
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+# the original standing in for a variant that isn't built yet
+VARIANT_PENDING_MAX_AGE = 60
+# images up to this size are kept in memory, up to MEMORY_CACHE_BYTES in total
+MEMORY_MAX_FILE_BYTES = int(os.getenv('IMAGE_MEMORY_MAX_FILE_BYTES', str(64 * 1024)))
+MEMORY_CACHE_BYTES = int(os.getenv('IMAGE_MEMORY_CACHE_BYTES', str(16 * 1024 * 1024)))
+STAT_CACHE_ENTRIES = 4096
+# mkstemp creates files 0600; stored images get the mode open() would give
+# them, so a front proxy running as another user can read them
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+FILE_MODE = 0o666 & ~_UMASK
+FINISHED_ENTRIES = 4096
+
+_executor = ThreadPoolExecutor(max_workers=int(os.getenv('IMAGE_WORKERS', '2')), thread_name_prefix='image-variants')
+# filenames with a job queued or running, so repeat requests don't pile up work
+_pending = set()
+# filenames whose variants this worker built, least recently used first; a
+# failed run isn't recorded so the next request retries it
+_finished = OrderedDict()
+_pending_lock = threading.Lock()
+
+
+def _extension(filename):
+    ext = os.path.splitext(secure_filename(filename or ''))[1].lower().lstrip('.')
+    return 'jpg' if ext == 'jpeg' else ext
+
+
+def is_content_addressed(filename):
+    """True for names produced by store_stream() (and their variants)."""
+    return CONTENT_ADDRESS_RE.match(os.path.basename(filename)) is not None
+
+
+def store_stream(stream, ext, images_dir=IMAGES_DIR):
+    """Copy a binary stream into ``images_dir`` under its content address.
+
+    Returns ``(filename, created)``; ``created`` is False when identical bytes
+    were already stored and the upload was dropped.
+    """
+    os.makedirs(images_dir, exist_ok=True)
+    digest = hashlib.sha256()
+    fd, tmp = tempfile.mkstemp(dir=images_dir, prefix='.upload-', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                out.write(chunk)
+        fname = digest.hexdigest()[:HASH_CHARS] + (f'.{ext}' if ext else '')
+        path = os.path.join(images_dir, fname)
+        if os.path.exists(path):
+            os.remove(tmp)
+            return fname, False
+        os.chmod(tmp, FILE_MODE)
+        # atomic, so two identical uploads racing each other both end up with one file
+        os.replace(tmp, path)
+        return fname, True
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def save_upload(img):
+    """Store an uploaded werkzeug FileStorage in Images/ and return its filename."""
+    fname, created = store_stream(img.stream, _extension(img.filename))
+    if created:
+        schedule_variants(fname)
+    return fname
+
+
+def variant_name(filename, width, fmt):
+    stem = os.path.splitext(filename)[0]
+    return f'{stem}_w{width}.{VARIANT_FORMATS[fmt][0]}'
+
+
+def pick_width(requested):
+    """Smallest configured width that covers ``requested`` (the largest if none does)."""
+    for width in VARIANT_WIDTHS:
+        if width >= requested:
+            return width
+    return VARIANT_WIDTHS[-1]
+
+
+def find_variant(filename, requested_width, fmt):
+    """Return the variant's filename relative to VARIANTS_DIR, or None if not ready.
+
+    A missing variant is scheduled, so originals uploaded before the pipeline
+    existed get their variants on first request.
+    """
+    if Image is None:
+        return None
+    name = variant_name(filename, pick_width(requested_width), fmt)
+    if os.path.isfile(os.path.join(VARIANTS_DIR, name)):
+        return name
+    original = safe_join(IMAGES_DIR, filename)
+    if original is not None and os.path.isfile(original):
+        schedule_variants(filename)
+    return None
+
+
+def schedule_variants(filename):
+    """Queue variant generation for an image in IMAGES_DIR without blocking."""
+    if Image is None:
+        return
+    with _pending_lock:
+        if filename in _finished:
+            _finished.move_to_end(filename)
+            return
+        if filename in _pending:
+            return
+        _pending.add(filename)
+    _executor.submit(_generate_variants, filename)
+
+
+def _generate_variants(filename):
+    done = False
+    try:
+        os.makedirs(VARIANTS_DIR, exist_ok=True)
+        with Image.open(os.path.join(IMAGES_DIR, filename)) as src:
+            src = ImageOps.exif_transpose(src)
+            for width in VARIANT_WIDTHS:
+                # never upscale; requests for larger sizes get the original
+                if width > src.width:
+                    break
+                height = max(1, round(src.height * width / src.width))
+                resized = src.resize((width, height), Image.LANCZOS)
+                for fmt, (_ext, options) in VARIANT_FORMATS.items():
+                    out = resized
+                    if fmt == 'jpeg' and out.mode not in ('RGB', 'L'):
+                        out = out.convert('RGB')
+                    elif out.mode not in ('RGB', 'RGBA', 'L'):
+                        out = out.convert('RGBA')
+                    path = os.path.join(VARIANTS_DIR, variant_name(filename, width, fmt))
+                    # write then rename so a half-written file is never served
+                    tmp = f'{path}.{threading.get_ident()}.tmp'
+                    out.save(tmp, fmt.upper(), **options)
+                    os.replace(tmp, path)
+        done = True
+    except Exception:
+        log.exception('could not build variants for %s', filename)
+    finally:
+        with _pending_lock:
+            _pending.discard(filename)
+            if done:
+                _finished[filename] = True
+                while len(_finished) > FINISHED_ENTRIES:
+                    _finished.popitem(last=False)
+
+
+class _ImageEntry:
+    __slots__ = ('path', 'relpath', 'size', 'mtime', 'etag', 'immutable', 'data')
+
+    def __init__(self, path, relpath, st, immutable):
+        self.path = path
+        self.relpath = relpath
+        self.size = st.st_size
+        self.mtime = st.st_mtime
+        self.immutable = immutable
+        stem = os.path.splitext(os.path.basename(path))[0]
+        # a content address already identifies the bytes
+        self.etag = stem if immutable else f'{int(st.st_mtime_ns)}-{st.st_size}'
+        self.data = None
+
+
+# (directory, filename) -> _ImageEntry, least recently used first
+_entries = OrderedDict()
+_memory_bytes = 0
+_entries_lock = threading.Lock()
+
+
+def _evict_memory_locked():
+    global _memory_bytes
+    for entry in _entries.values():
+        if _memory_bytes <= MEMORY_CACHE_BYTES:
+            break
+        if entry.data is not None:
+            _memory_bytes -= len(entry.data)
+            entry.data = None
+
+
+def _lookup(directory, filename):
+    """Resolve and stat an image, caching the result; None when it doesn't exist."""
+    global _memory_bytes
+    key = (directory, filename)
+    with _entries_lock:
+        entry = _entries.get(key)
+        if entry is not None:
+            _entries.move_to_end(key)
+    # immutable files never change, so their cached stat stays valid
+    if entry is not None and entry.immutable:
+        return entry
+    path = entry.path if entry is not None else safe_join(directory, filename)
+    if path is None:
+        return None
+    try:
+        st = os.stat(path)
+    except OSError:
+        st = None
+    if st is None or not stat.S_ISREG(st.st_mode):
+        with _entries_lock:
+            old = _entries.pop(key, None)
+            if old is not None and old.data is not None:
+                _memory_bytes -= len(old.data)
+        return None
+    if entry is not None and entry.size == st.st_size and entry.mtime == st.st_mtime:
+        return entry
+    entry = _ImageEntry(path, os.path.relpath(path, IMAGES_DIR), st, is_content_addressed(filename))
+    with _entries_lock:
+        old = _entries.pop(key, None)
+        if old is not None and old.data is not None:
+            _memory_bytes -= len(old.data)
+        _entries[key] = entry
+        while len(_entries) > STAT_CACHE_ENTRIES:
+            _k, dropped = _entries.popitem(last=False)
+            if dropped.data is not None:
+                _memory_bytes -= len(dropped.data)
+    return entry
+
+
+def _load_memory(entry):
+    global _memory_bytes
+    try:
+        with open(entry.path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+    if len(data) != entry.size:
+        return None
+    with _entries_lock:
+        if entry.data is None:
+            entry.data = data
+            _memory_bytes += len(data)
+            _evict_memory_locked()
+    return data
+
+
+def send_image(directory, filename, max_age=None):
+    """Serve ``filename`` from ``directory`` (IMAGES_DIR or below); None if missing.
+
+    ``max_age`` replaces the Cache-Control lifetime, for responses whose URL
+    will serve different bytes later (a variant's URL answered with the original).
+    """
+    entry = _lookup(directory, filename)
+    if entry is None:
+        return None
+    config = current_app.config
+    accel_prefix = config.get('IMAGES_ACCEL_REDIRECT')
+    last_modified = datetime.fromtimestamp(entry.mtime, tz=timezone.utc)
+    if accel_prefix:
+        # nginx serves the bytes from an internal location and handles Range/conditionals
+        resp = current_app.response_class()
+        resp.headers['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + entry.relpath.replace(os.sep, '/')
+        resp.set_etag(entry.etag)
+        resp.last_modified = last_modified
+        resp.headers['Content-Type'] = _mimetype(entry.path)
+        resp.headers.pop('Content-Length', None)
+    else:
+        data = entry.data
+        if data is None and entry.size <= MEMORY_MAX_FILE_BYTES and not config.get('USE_X_SENDFILE'):
+            data = _load_memory(entry)
+        if data is not None:
+            resp = current_app.response_class(data, mimetype=_mimetype(entry.path))
+            resp.set_etag(entry.etag)
+            resp.last_modified = last_modified
+            resp.make_conditional(request, accept_ranges=True, complete_length=len(data))
+        else:
+            # send_file honours USE_X_SENDFILE and handles Range/If-* itself
+            try:
+                resp = send_file(entry.path, conditional=True, etag=entry.etag, last_modified=last_modified, max_age=None)
+            except FileNotFoundError:
+                # removed behind our back; forget it so the next hit re-stats
+                with _entries_lock:
+                    _entries.pop((directory, filename), None)
+                return None
+    if max_age is not None:
+        resp.headers['Cache-Control'] = f'public, max-age={max_age}'
+    elif entry.immutable:
+        resp.headers['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    else:
+        resp.headers['Cache-Control'] = 'public, no-cache'
+    return resp
+
+
+def _mimetype(path):
+    return mimetypes.guess_type(path)[0] or 'application/octet-stream'
@@ -0,0 +1,242 @@
+"""Group-commit order intake.
+
+With ``ORDER_INTAKE=1`` checkout doesn't write to the main database. It
+prices the cart, appends the order to a local SQLite queue (WAL mode) and
+answers 202 with a provisional reference. A background writer drains the
+queue and inserts orders into the main database in batches of up to
+``ORDER_INTAKE_BATCH``, one transaction per batch, so the commit cost is
+shared by everything that arrived while the previous batch was committing.
+
+An order is only removed from the queue after its batch committed. If the
+process dies in between, the batch is replayed on restart and orders whose
+reference already exists are skipped, so nothing is lost or inserted twice.
+With the default ``synchronous=NORMAL`` the queue survives process crashes;
+set ``ORDER_INTAKE_SYNC=FULL`` to also survive power loss.
+
+``GET /api/orders/<reference>`` reports ``queued`` until the order lands.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+from sqlalchemy import insert, select
+from sqlalchemy.exc import DataError, IntegrityError
+from . import db, rollups
+from .models import Order, OrderItem
+from .order_feed import feed, order_payload
+
+log = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS queued_orders (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    reference TEXT NOT NULL UNIQUE,
+    payload TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS failed_orders (
+    reference TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    error TEXT NOT NULL,
+    failed_at TEXT NOT NULL
+);
+"""
+
+
+def new_reference():
+    return uuid.uuid4().hex
+
+
+class OrderIntake:
+    def __init__(self, path, batch_size=500, linger=0.01, synchronous='NORMAL'):
+        self.path = path
+        self.batch_size = batch_size
+        # how long the writer waits for more orders after waking up
+        self.linger = linger
+        if synchronous not in ('OFF', 'NORMAL', 'FULL', 'EXTRA'):
+            raise ValueError(f'invalid ORDER_INTAKE_SYNC: {synchronous}')
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        # one connection shared by request threads and the writer; sqlite
+        # serialises writers anyway
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(f'PRAGMA synchronous={synchronous}')
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = None
+
+    def submit(self, customer_name, customer_email, customer_phone, priced):
+        """Durably queue a priced order and return its reference."""
+        reference = new_reference()
+        payload = json.dumps({
+            'customer_name': customer_name,
+            'customer_email': customer_email,
+            'customer_phone': customer_phone,
+            'total_cents': priced['total_cents'],
+            'created_at': datetime.utcnow().isoformat(),
+            'lines': [
+                [line['menu_item_id'], line['qty'], line['unit_price_cents']]
+                for line in priced['lines']
+            ],
+        }, separators=(',', ':'))
+        with self._lock:
+            self._conn.execute('INSERT INTO queued_orders (reference, payload) VALUES (?, ?)', (reference, payload))
+        self._wake.set()
+        return reference
+
+    def queued(self, reference):
+        """'queued', 'failed' or None when the reference isn't in the queue."""
+        with self._lock:
+            if self._conn.execute('SELECT 1 FROM queued_orders WHERE reference = ?', (reference,)).fetchone():
+                return 'queued'
+            if self._conn.execute('SELECT 1 FROM failed_orders WHERE reference = ?', (reference,)).fetchone():
+                return 'failed'
+        return None
+
+    def pending(self):
+        with self._lock:
+            return self._conn.execute('SELECT count(*) FROM queued_orders').fetchone()[0]
+
+    def _next_batch(self):
+        with self._lock:
+            return self._conn.execute(
+                'SELECT seq, reference, payload FROM queued_orders ORDER BY seq LIMIT ?', (self.batch_size,)
+            ).fetchall()
+
+    def _remove(self, seqs):
+        with self._lock:
+            self._conn.execute('BEGIN')
+            self._conn.executemany('DELETE FROM queued_orders WHERE seq = ?', [(s,) for s in seqs])
+            self._conn.execute('COMMIT')
+
+    def _fail(self, seq, reference, payload, error):
+        log.error('queued order %s could not be stored: %s', reference, error)
+        with self._lock:
+            self._conn.execute('BEGIN')
+            self._conn.execute(
+                'INSERT OR REPLACE INTO failed_orders (reference, payload, error, failed_at) VALUES (?, ?, ?, ?)',
+                (reference, payload, str(error), datetime.utcnow().isoformat()),
+            )
+            self._conn.execute('DELETE FROM queued_orders WHERE seq = ?', (seq,))
+            self._conn.execute('COMMIT')
+
+    def _store(self, rows):
+        """Insert queued rows into the main database in one transaction."""
+        references = [r[1] for r in rows]
+        existing = set(db.session.execute(select(Order.reference).where(Order.reference.in_(references))).scalars())
+        orders = []
+        lines = []
+        for _seq, reference, payload in rows:
+            if reference in existing:
+                # committed before a crash, but not yet removed from the queue
+                continue
+            data = json.loads(payload)
+            order = Order(
+                reference=reference,
+                customer_name=data['customer_name'],
+                customer_email=data['customer_email'],
+                customer_phone=data['customer_phone'],
+                status='pending',
+                total_cents=data['total_cents'],
+                created_at=datetime.fromisoformat(data['created_at']),
+            )
+            orders.append(order)
+            lines.append(data['lines'])
+        payloads = []
+        if orders:
+            db.session.add_all(orders)
+            # one multi-row INSERT .. RETURNING for the whole batch
+            db.session.flush()
+            rows = [
+                {'order_id': order.id, 'menu_item_id': item_id, 'qty': qty, 'unit_price_cents': unit,
+                 'category_id': rollups.category_of(item_id)}
+                for order, order_lines in zip(orders, lines)
+                for item_id, qty, unit in order_lines
+            ]
+            db.session.execute(insert(OrderItem), rows)
+            by_order = {}
+            for row in rows:
+                by_order.setdefault(row['order_id'], []).append(
+                    (row['menu_item_id'], row['qty'], row['unit_price_cents'], row['category_id']))
+            rollups.record_orders([(order.created_at, by_order[order.id]) for order in orders])
+            # built before commit expires the instances
+            payloads = [order_payload(order, order_lines) for order, order_lines in zip(orders, lines)]
+        db.session.commit()
+        for payload in payloads:
+            feed.publish('order', payload)
+        return len(orders)
+
+    def drain_once(self):
+        """Move one batch into the main database; returns how many rows were taken."""
+        rows = self._next_batch()
+        if not rows:
+            return 0
+        try:
+            self._store(rows)
+        except (IntegrityError, DataError):
+            db.session.rollback()
+            # isolate the offending order so the rest of the batch still lands;
+            # connection errors propagate and the batch is retried as a whole
+            for row in rows:
+                try:
+                    self._store([row])
+                except (IntegrityError, DataError) as e:
+                    db.session.rollback()
+                    self._fail(row[0], row[1], row[2], e)
+                else:
+                    self._remove([row[0]])
+            return len(rows)
+        except Exception:
+            db.session.rollback()
+            raise
+        self._remove([r[0] for r in rows])
+        return len(rows)
+
+    def _run(self, app):
+        while not self._stopping:
+            self._wake.wait(timeout=1.0)
+            self._wake.clear()
+            if self.linger:
+                time.sleep(self.linger)
+            with app.app_context():
+                try:
+                    while self.drain_once() == self.batch_size:
+                        pass
+                except Exception:
+                    log.exception('order intake writer failed; retrying')
+                finally:
+                    db.session.remove()
+
+    def start(self, app):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, args=(app,), name='order-intake', daemon=True)
+            self._thread.start()
+            # replay whatever a previous process left behind
+            self._wake.set()
+
+    def stop(self):
+        self._stopping = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+def init_app(app):
+    """Start the intake writer when ORDER_INTAKE is enabled."""
+    if not app.config.get('ORDER_INTAKE'):
+        return
+    path = app.config.get('ORDER_INTAKE_PATH') or os.path.join(app.instance_path, 'order-intake.db')
+    intake = OrderIntake(
+        path,
+        batch_size=int(os.getenv('ORDER_INTAKE_BATCH', '500')),
+        linger=int(os.getenv('ORDER_INTAKE_LINGER_MS', '10')) / 1000.0,
+        synchronous=os.getenv('ORDER_INTAKE_SYNC', 'NORMAL').upper(),
+    )
+    app.extensions['order_intake'] = intake
+    intake.start(app)
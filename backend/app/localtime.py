@@ -0,0 +1,30 @@
+"""Restaurant wall-clock time.
+
+Reservation slots, promotion windows and sales rollups are in the
+restaurant's local time, while row timestamps (``created_at``) are stored in
+UTC. ``RESTAURANT_TZ`` (e.g. ``Europe/Paris``) names the zone; without it the
+server's own zone is used.
+"""
+import os
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+
+_TZ = ZoneInfo(os.environ['RESTAURANT_TZ']) if os.getenv('RESTAURANT_TZ') else None
+
+
+def local_now():
+    """Naive wall-clock time in the restaurant's zone."""
+    if _TZ is None:
+        return datetime.now()
+    return datetime.now(_TZ).replace(tzinfo=None)
+
+
+def to_local(utc):
+    """Naive UTC timestamp -> naive restaurant wall-clock time."""
+    return utc.replace(tzinfo=timezone.utc).astimezone(_TZ).replace(tzinfo=None)
+
+
+def to_utc(local):
+    """Naive restaurant wall-clock time -> naive UTC timestamp."""
+    # a naive value (no RESTAURANT_TZ) is taken as the server's local time
+    return local.replace(tzinfo=_TZ).astimezone(timezone.utc).replace(tzinfo=None)
@@ -0,0 +1,355 @@
+"""Bulk menu import and export for admins.
+
+``import_menu`` takes a whole batch of categories and menu items (parsed from
+JSON or CSV), validates it against the database with a couple of ``IN``
+queries instead of one lookup per row, and applies every insert and update in
+a single transaction. Nothing is written unless the whole batch is valid, and
+because it is one commit the catalog and pricing caches are invalidated once
+and the change log records the batch atomically.
+
+Rows are matched to existing ones by ``id`` when given, otherwise categories
+by name and items by name within their category; anything unmatched is
+created. Fields left out of a row are left unchanged (or defaulted for new
+rows); a null ``category_id``/``category`` takes an existing item out of its
+category. Nothing is deleted.
+
+The export writes the same shape, so an exported file can be edited and
+imported back.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+from sqlalchemy import insert, or_, update
+from . import changes, db
+from .hooks import record
+from .models import Category, MenuItem
+
+CATEGORY_FIELDS = ('id', 'name', 'position')
+ITEM_FIELDS = ('id', 'name', 'description', 'price_cents', 'available', 'category_id', 'category', 'image_filename')
+_TRUE = ('1', 'true', 'yes', 'y', 't')
+_FALSE = ('0', 'false', 'no', 'n', 'f')
+
+
+class MenuImportError(ValueError):
+    """The batch failed validation; ``errors`` lists every problem found."""
+
+    def __init__(self, errors):
+        super().__init__(f'{len(errors)} invalid row(s)')
+        self.errors = errors
+
+
+def parse_csv(text):
+    """One item per line with ITEM_FIELDS as header; categories are referenced by name."""
+    reader = csv.DictReader(io.StringIO(text))
+    unknown = set(reader.fieldnames or ()) - set(ITEM_FIELDS)
+    if unknown:
+        raise MenuImportError([{'error': f'unknown column(s): {", ".join(sorted(unknown))}'}])
+    # empty cells mean "not given", as a missing key does in JSON
+    return {'categories': [], 'items': [{k: v for k, v in row.items() if k and v not in (None, '')} for row in reader]}
+
+
+def _int(value, minimum=None):
+    if isinstance(value, bool):
+        raise ValueError
+    if isinstance(value, str):
+        value = value.strip()
+    n = int(value)
+    if isinstance(value, float) and n != value:
+        raise ValueError
+    if minimum is not None and n < minimum:
+        raise ValueError
+    return n
+
+
+def _bool(value):
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in _TRUE:
+        return True
+    if text in _FALSE:
+        return False
+    raise ValueError
+
+
+def _clean(model, field, value, errors, where, label=None):
+    """Coerce one incoming value for ``model.field``; append an error and return None if invalid.
+
+    Errors are reported under ``label`` (default ``field``), the key the row used.
+    """
+    column = model.__table__.c[field]
+    label = label or field
+    if value is None and field == 'category_id':
+        # uncategorized, as exported
+        return None
+    try:
+        if field == 'available':
+            return _bool(value)
+        if field in ('price_cents', 'position', 'category_id', 'id'):
+            return _int(value, minimum=0)
+    except (TypeError, ValueError):
+        errors.append({**where, 'field': label, 'error': f'{label} must be a {"boolean" if field == "available" else "non-negative integer"}'})
+        return None
+    if value is None:
+        if not column.nullable or field == 'name':
+            errors.append({**where, 'field': label, 'error': f'{label} is required'})
+        return None
+    value = str(value).strip() if field == 'name' else str(value)
+    if field == 'name' and not value:
+        errors.append({**where, 'field': label, 'error': f'{label} is required'})
+    elif column.type.length and len(value) > column.type.length:
+        errors.append({**where, 'field': label, 'error': f'{label} longer than {column.type.length} characters'})
+    return value
+
+
+def _rows(batch, key, fields, errors):
+    rows = batch.get(key) or []
+    if not isinstance(rows, list):
+        errors.append({key: None, 'error': f'{key} must be a list'})
+        return []
+    out = []
+    for n, row in enumerate(rows):
+        if not isinstance(row, dict):
+            errors.append({key: n, 'error': 'row must be an object'})
+            continue
+        unknown = set(row) - set(fields)
+        if unknown:
+            errors.append({key: n, 'error': f'unknown field(s): {", ".join(sorted(unknown))}'})
+        out.append((n, row))
+    return out
+
+
+def import_menu(batch, dry_run=False):
+    """Validate and upsert ``{'categories': [...], 'items': [...]}`` in one transaction.
+
+    Raises ``MenuImportError`` (nothing written) when any row is invalid.
+    Returns per-entity counts of created/updated/unchanged rows; with
+    ``dry_run`` the transaction is rolled back instead of committed.
+    """
+    errors = []
+    cat_rows = _rows(batch, 'categories', CATEGORY_FIELDS, errors)
+    item_rows = _rows(batch, 'items', ITEM_FIELDS, errors)
+
+    # coerce everything first, then resolve references against the database
+    cats = []
+    for n, row in cat_rows:
+        where = {'categories': n}
+        clean = {f: _clean(Category, f, row[f], errors, where) for f in CATEGORY_FIELDS if f in row}
+        if 'id' not in row and 'name' not in row:
+            errors.append({**where, 'error': 'id or name is required'})
+        cats.append((n, clean))
+    items = []
+    for n, row in item_rows:
+        where = {'items': n}
+        clean = {f: _clean(MenuItem, f, row[f], errors, where) for f in ITEM_FIELDS if f in row and f != 'category'}
+        if 'category' in row:
+            category = row['category']
+            clean['category'] = None if category is None else _clean(Category, 'name', category, errors, where, 'category')
+        items.append((n, clean))
+    if errors:
+        raise MenuImportError(errors)
+
+    # everything the batch could refer to, in two queries
+    cat_ids = {c['id'] for _, c in cats if 'id' in c} | {i['category_id'] for _, i in items if i.get('category_id') is not None}
+    cat_names = {c['name'] for _, c in cats if 'name' in c} | {i['category'] for _, i in items if i.get('category') is not None}
+    existing_cats = Category.query.filter(or_(Category.id.in_(cat_ids), Category.name.in_(cat_names))).all() if cat_ids or cat_names else []
+    cats_by_id = {c.id: c for c in existing_cats}
+    cats_by_name = {}
+    for c in sorted(existing_cats, key=lambda c: c.id):
+        cats_by_name.setdefault(c.name, c)
+    item_ids = {i['id'] for _, i in items if 'id' in i}
+    item_names = {i['name'] for _, i in items if 'id' not in i and 'name' in i}
+    existing_items = MenuItem.query.filter(or_(MenuItem.id.in_(item_ids), MenuItem.name.in_(item_names))).all() if item_ids or item_names else []
+    items_by_id = {i.id: i for i in existing_items}
+    items_by_key = {}
+    for i in sorted(existing_items, key=lambda i: i.id):
+        items_by_key.setdefault((i.category_id, i.name), i)
+
+    counts = {'categories': dict(created=0, updated=0, unchanged=0), 'items': dict(created=0, updated=0, unchanged=0)}
+
+    # categories: match, then stage changes
+    next_position = (db.session.query(db.func.max(Category.position)).scalar() or 0) + 1
+    batch_cats = {}  # name -> Category (existing or new) named in this batch
+
+    def new_category(name, position=None):
+        nonlocal next_position
+        cat = Category(name=name, position=next_position if position is None else position)
+        next_position = max(next_position, cat.position) + 1
+        db.session.add(cat)
+        counts['categories']['created'] += 1
+        return cat
+
+    seen = set()
+    for n, data in cats:
+        where = {'categories': n}
+        if 'id' in data:
+            cat = cats_by_id.get(data['id'])
+            if cat is None:
+                errors.append({**where, 'error': f'category {data["id"]} not found'})
+                continue
+        else:
+            cat = cats_by_name.get(data['name'])
+        key = cat.id if cat is not None else data['name']
+        if key in seen:
+            errors.append({**where, 'error': 'category appears more than once in the batch'})
+            continue
+        seen.add(key)
+        if cat is None:
+            cat = new_category(data['name'], data.get('position'))
+        elif _assign(cat, data, ('name', 'position')):
+            counts['categories']['updated'] += 1
+        else:
+            counts['categories']['unchanged'] += 1
+        batch_cats[cat.name] = cat
+
+    def category_for(data, where):
+        if data.get('category_id', data.get('category', '')) is None:
+            # explicitly uncategorized
+            data['category_id'] = None
+            return None
+        if 'category_id' in data:
+            cat = cats_by_id.get(data['category_id'])
+            if cat is None:
+                errors.append({**where, 'field': 'category_id', 'error': f'category {data["category_id"]} not found'})
+            return cat
+        if 'category' in data:
+            cat = batch_cats.get(data['category']) or cats_by_name.get(data['category'])
+            if cat is None:
+                # CSV imports name their categories inline; create them on first use
+                cat = batch_cats[data['category']] = new_category(data['category'])
+            return cat
+        return None
+
+    staged = []
+    seen = set()
+    for n, data in items:
+        where = {'items': n}
+        cat = category_for(data, where)
+        if 'id' in data:
+            item = items_by_id.get(data['id'])
+            if item is None:
+                errors.append({**where, 'error': f'menu item {data["id"]} not found'})
+                continue
+        else:
+            if cat is None:
+                errors.append({**where, 'error': 'new items need category_id or category'})
+                continue
+            if 'name' not in data or 'price_cents' not in data:
+                errors.append({**where, 'error': 'new items need name and price_cents'})
+                continue
+            item = items_by_key.get((cat.id, data['name'])) if cat.id is not None else None
+        key = item.id if item is not None else (id(cat), data['name'])
+        if key in seen:
+            errors.append({**where, 'error': 'menu item appears more than once in the batch'})
+            continue
+        seen.add(key)
+        staged.append((item, cat, data))
+    if errors:
+        db.session.rollback()
+        raise MenuImportError(errors)
+
+    # categories are a handful per batch and go through the ORM, which gives
+    # new ones their ids; items are written set-based below
+    db.session.flush()
+    now = datetime.utcnow()
+    fields = ('name', 'description', 'price_cents', 'available', 'image_filename', 'category_id')
+    inserts, updates, logged = [], [], []
+    for item, cat, data in staged:
+        if cat is not None:
+            data['category_id'] = cat.id
+        if item is None:
+            inserts.append({'description': None, 'image_filename': None, 'available': True,
+                            **{f: data[f] for f in fields if f in data}, 'created_at': now})
+            continue
+        diff = {f: data[f] for f in fields if f in data and getattr(item, f) != data[f]}
+        if diff:
+            updates.append({'id': item.id, **diff})
+            logged.append({**changes.row_dict(item), **diff})
+        else:
+            counts['items']['unchanged'] += 1
+    if updates:
+        # rows changing the same columns share one executemany
+        updates.sort(key=lambda row: sorted(row))
+        db.session.execute(update(MenuItem), updates)
+    if inserts:
+        if db.session.connection().dialect.insert_executemany_returning:
+            # batched multi-row INSERT .. RETURNING (PostgreSQL, SQLite). Rows come
+            # back in no particular order (asking for parameter order falls back
+            # to a statement per row on SQLite), but (category_id, name) is unique
+            # among the new rows, so it maps them back to their ids.
+            new_ids = {
+                (category_id, name): item_id
+                for item_id, category_id, name in db.session.execute(
+                    insert(MenuItem).returning(MenuItem.id, MenuItem.category_id, MenuItem.name), inserts
+                )
+            }
+            for row in inserts:
+                row['id'] = new_ids[(row['category_id'], row['name'])]
+        else:
+            for row in inserts:
+                row['id'] = db.session.execute(insert(MenuItem).values(**row)).inserted_primary_key[0]
+    # bulk statements skip flush events: log the changes and notify the
+    # catalog and pricing caches explicitly (they invalidate once, on commit)
+    changes.record(db.session, MenuItem, 'update', logged)
+    changes.record(db.session, MenuItem, 'insert', inserts)
+    record(db.session, 'update', MenuItem, [row['id'] for row in updates])
+    record(db.session, 'insert', MenuItem, [row['id'] for row in inserts])
+    counts['items']['updated'] = len(updates)
+    counts['items']['created'] = len(inserts)
+
+    if dry_run:
+        db.session.rollback()
+    else:
+        db.session.commit()
+    return counts
+
+
+def _assign(obj, data, fields):
+    changed = False
+    for f in fields:
+        if f in data and getattr(obj, f) != data[f]:
+            setattr(obj, f, data[f])
+            changed = True
+    return changed
+
+
+def _export_items():
+    stmt = (
+        db.select(
+            MenuItem.id, MenuItem.name, MenuItem.description, MenuItem.price_cents, MenuItem.available,
+            MenuItem.category_id, Category.name, MenuItem.image_filename,
+        )
+        .outerjoin(Category, Category.id == MenuItem.category_id)
+        .order_by(Category.position, Category.id, MenuItem.id)
+    )
+    yield from db.session.execute(stmt.execution_options(yield_per=1000))
+
+
+def export_csv():
+    """Yield the menu as CSV chunks, one line per item (re-importable)."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(ITEM_FIELDS)
+    for n, row in enumerate(_export_items(), 1):
+        writer.writerow(['' if v is None else v for v in row])
+        if n % 500 == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+
+def export_json():
+    """Yield ``{"categories": [...], "items": [...]}`` in chunks (re-importable)."""
+    cats = db.session.execute(db.select(Category.id, Category.name, Category.position).order_by(Category.position, Category.id))
+    yield '{"categories":' + json.dumps([dict(zip(CATEGORY_FIELDS, row)) for row in cats]) + ',"items":['
+    chunk = []
+    for n, row in enumerate(_export_items()):
+        data = dict(zip(ITEM_FIELDS, row))
+        # category_id is authoritative on re-import; the name is for people reading the file
+        chunk.append(('' if n == 0 else ',') + json.dumps(data))
+        if len(chunk) == 500:
+            yield ''.join(chunk)
+            chunk = []
+    yield ''.join(chunk) + ']}'
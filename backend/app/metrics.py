@@ -0,0 +1,232 @@
+"""Request and SQL metrics in Prometheus text format at ``/metrics``.
+
+Collected per process without extra dependencies:
+
+* ``http_request_duration_seconds{route,method,status}`` histogram
+* ``http_requests_in_flight{route}`` gauge
+* ``http_request_sql_statements{route}`` and ``http_request_sql_seconds{route}``
+  histograms of statements issued, and time spent in them, per request
+* ``db_statements_total`` / ``db_statement_seconds_total`` counters, covering
+  background threads as well
+* ``db_pool_checkout_wait_seconds`` histogram of time spent waiting for a
+  pooled connection, plus ``db_pool_checked_out`` / ``db_pool_size`` gauges
+
+Routes are labelled with their URL rule (``/api/admin/orders/<int:order_id>``),
+not the raw path, to keep the series count bounded. Recording is a few dict
+lookups and a bisect under a lock, cheap enough to leave on; set
+``METRICS_ENABLED=0`` to turn it off. With ``METRICS_TOKEN`` set, scrapes must
+send ``Authorization: Bearer <token>``.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100, 250)
+WAIT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels, buckets):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.buckets = buckets
+        # label values -> [bucket counts..., +Inf count, sum]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            series[idx] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._series.items()]
+        for label_values, series in sorted(items):
+            base = _labels(self.labels, label_values)
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), series):
+                cumulative += count
+                le = bound if bound == '+Inf' else repr(float(bound))
+                lines.append(f'{self.name}_bucket{_labels(self.labels + ("le",), label_values + (le,))} {cumulative}')
+            lines.append(f'{self.name}_sum{base} {series[-1]}')
+            lines.append(f'{self.name}_count{base} {cumulative}')
+        return lines
+
+
+class Gauge:
+    """Gauge/counter keyed by label values; ``kind`` is 'gauge' or 'counter'."""
+
+    def __init__(self, name, help_text, labels=(), kind='gauge'):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.kind = kind
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def add(self, amount, *label_values):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            items = sorted(self._values.items())
+        for label_values, value in items:
+            lines.append(f'{self.name}{_labels(self.labels, label_values)} {value}')
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    return '{' + ','.join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + '}'
+
+
+request_duration = Histogram(
+    'http_request_duration_seconds', 'Request latency.', ('route', 'method', 'status'), LATENCY_BUCKETS)
+in_flight = Gauge('http_requests_in_flight', 'Requests currently being handled.', ('route',))
+request_statements = Histogram(
+    'http_request_sql_statements', 'SQL statements issued per request.', ('route',), STATEMENT_BUCKETS)
+request_sql_seconds = Histogram(
+    'http_request_sql_seconds', 'Time spent executing SQL per request.', ('route',), LATENCY_BUCKETS)
+statements_total = Gauge('db_statements_total', 'SQL statements executed.', ('bind',), kind='counter')
+statement_seconds = Gauge('db_statement_seconds_total', 'Time spent executing SQL.', ('bind',), kind='counter')
+checkout_wait = Histogram(
+    'db_pool_checkout_wait_seconds', 'Time spent waiting for a pooled connection.', ('bind',), WAIT_BUCKETS)
+
+_METRICS = (request_duration, in_flight, request_statements, request_sql_seconds,
+            statements_total, statement_seconds, checkout_wait)
+
+
+class RequestStats:
+    """Per-request counters, kept on ``g.request_stats``."""
+    __slots__ = ('route', 'start', 'status', 'statements', 'sql_seconds')
+
+    def __init__(self, route):
+        self.route = route
+        self.start = time.perf_counter()
+        self.status = None
+        self.statements = 0
+        self.sql_seconds = 0.0
+
+
+def current_stats():
+    """The RequestStats of the request being handled, or None."""
+    return g.get('request_stats') if has_request_context() else None
+
+
+def _before_request():
+    rule = request.url_rule
+    stats = g.request_stats = RequestStats(rule.rule if rule is not None else 'unmatched')
+    in_flight.add(1, stats.route)
+
+
+def _after_request(response):
+    stats = g.get('request_stats')
+    if stats is not None:
+        stats.status = response.status_code
+    return response
+
+
+def _teardown_request(exc):
+    stats = g.pop('request_stats', None)
+    if stats is None:
+        return
+    elapsed = time.perf_counter() - stats.start
+    status = stats.status or (500 if exc is not None else 200)
+    route = stats.route
+    in_flight.add(-1, route)
+    request_duration.observe(elapsed, route, request.method, str(status))
+    request_statements.observe(stats.statements, route)
+    request_sql_seconds.observe(stats.sql_seconds, route)
+
+
+def _instrument_engine(engine, bind):
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('metrics_start', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _stop(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get('metrics_start')
+        if not starts:
+            return
+        elapsed = time.perf_counter() - starts.pop()
+        statements_total.add(1, bind)
+        statement_seconds.add(elapsed, bind)
+        stats = current_stats()
+        if stats is not None:
+            stats.statements += 1
+            stats.sql_seconds += elapsed
+
+    def wrap_pool(pool):
+        connect = pool.connect
+
+        def timed_connect():
+            start = time.perf_counter()
+            try:
+                return connect()
+            finally:
+                checkout_wait.observe(time.perf_counter() - start, bind)
+        pool.connect = timed_connect
+
+    wrap_pool(engine.pool)
+
+    # dispose() swaps in a fresh pool; wrap that one too
+    @event.listens_for(engine, 'engine_disposed')
+    def _rewrap(eng):
+        wrap_pool(eng.pool)
+
+
+def render(engines):
+    lines = []
+    for metric in _METRICS:
+        lines.extend(metric.render())
+    lines.append('# HELP db_pool_checked_out Connections currently checked out of the pool.')
+    lines.append('# TYPE db_pool_checked_out gauge')
+    sizes = []
+    for bind, engine in engines:
+        pool = engine.pool
+        if hasattr(pool, 'checkedout'):
+            lines.append(f'db_pool_checked_out{_labels(("bind",), (bind,))} {pool.checkedout()}')
+            sizes.append(f'db_pool_size{_labels(("bind",), (bind,))} {pool.size()}')
+    lines.append('# HELP db_pool_size Configured pool size.')
+    lines.append('# TYPE db_pool_size gauge')
+    lines.extend(sizes)
+    return '\n'.join(lines) + '\n'
+
+
+def init_app(app, db):
+    if os.getenv('METRICS_ENABLED', '1').lower() not in ('1', 'true', 'yes'):
+        return
+    with app.app_context():
+        engines = [(key or 'primary', engine) for key, engine in db.engines.items()]
+    for bind, engine in engines:
+        _instrument_engine(engine, bind)
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    token = os.getenv('METRICS_TOKEN')
+
+    def metrics():
+        if token and request.headers.get('Authorization') != f'Bearer {token}':
+            return Response('unauthorized\n', status=401, mimetype='text/plain')
+        return Response(render(engines), mimetype='text/plain; version=0.0.4')
+
+    app.add_url_rule('/metrics', 'metrics', metrics)
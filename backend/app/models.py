@@ -5,7 +5,7 @@ class Category(db.Model):
     __tablename__ = 'categories'
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(128), nullable=False)
-    position = db.Column(db.Integer, default=0)
+    position = db.Column(db.Integer, default=0, index=True)
 
 class MenuItem(db.Model):
     __tablename__ = 'menu_items'
@@ -16,11 +16,17 @@ class MenuItem(db.Model):
     image_filename = db.Column(db.String(256))
     price_cents = db.Column(db.Integer, nullable=False)
     available = db.Column(db.Boolean, default=True)
-    category_id = db.Column(db.Integer, db.ForeignKey('categories.id'))
+    category_id = db.Column(db.Integer, db.ForeignKey('categories.id'), index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 class Order(db.Model):
     __tablename__ = 'orders'
+    # keyset pagination walks (created_at, id), optionally within one status
+    __table_args__ = (
+        db.Index('ix_orders_created_at_id', 'created_at', 'id'),
+        db.Index('ix_orders_status_created_at_id', 'status', 'created_at', 'id'),
+        db.UniqueConstraint('reference', name='uq_orders_reference'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     customer_name = db.Column(db.String(128))
     customer_email = db.Column(db.String(128))
@@ -28,14 +34,20 @@ class Order(db.Model):
     total_cents = db.Column(db.Integer)
     status = db.Column(db.String(64), default='pending')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # client-facing reference, issued before the row exists when orders go
+    # through the intake queue; unique so a replayed batch can't insert twice
+    reference = db.Column(db.String(32))
 
 class OrderItem(db.Model):
     __tablename__ = 'order_items'
     id = db.Column(db.Integer, primary_key=True)
-    order_id = db.Column(db.Integer, db.ForeignKey('orders.id'))
-    menu_item_id = db.Column(db.Integer, db.ForeignKey('menu_items.id'))
+    order_id = db.Column(db.Integer, db.ForeignKey('orders.id'), index=True)
+    menu_item_id = db.Column(db.Integer, db.ForeignKey('menu_items.id'), index=True)
     qty = db.Column(db.Integer, default=1)
     unit_price_cents = db.Column(db.Integer)
+    # the item's category when ordered, for the sales rollups (0: none; NULL:
+    # ordered before this was recorded); no foreign key, it's history
+    category_id = db.Column(db.Integer)
 
 
 class Subscriber(db.Model):
@@ -57,6 +69,12 @@ class Customer(db.Model):
 
 class Reservation(db.Model):
     __tablename__ = 'reservations'
+    __table_args__ = (
+        # a table can only be booked once per time slot; the allocator relies on this
+        db.UniqueConstraint('time_slot', 'table_number', name='uq_reservations_slot_table'),
+        # keyset pagination of the admin listing walks (time_slot, id)
+        db.Index('ix_reservations_time_slot_id', 'time_slot', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     customer_id = db.Column(db.Integer, db.ForeignKey('customers.id'), nullable=False)
     time_slot = db.Column(db.DateTime, nullable=False)
@@ -70,8 +88,83 @@ class Reservation(db.Model):
 
 class Promotion(db.Model):
     __tablename__ = 'promotions'
+    __table_args__ = (
+        db.Index('ix_promotions_menu_item_id_active', 'menu_item_id', 'active'),
+        # a promotion targets exactly one menu item or one whole category
+        db.CheckConstraint('(menu_item_id IS NULL) <> (category_id IS NULL)', name='ck_promotions_target'),
+    )
     id = db.Column(db.Integer, primary_key=True)
-    menu_item_id = db.Column(db.Integer, db.ForeignKey('menu_items.id'), nullable=False)
+    menu_item_id = db.Column(db.Integer, db.ForeignKey('menu_items.id'))
+    category_id = db.Column(db.Integer, db.ForeignKey('categories.id'), index=True)
     percent = db.Column(db.Integer, nullable=False, default=0)  # discount percent (0-100)
     active = db.Column(db.Boolean, default=True)
+    # optional windows in restaurant local time (see promotions.py): absolute
+    # [starts_at, ends_at) and/or daily [daily_start, daily_end), the latter
+    # running past midnight when it ends before it starts; weekdays is a
+    # bitmask of the days a daily window opens on, bit 0 = Monday
+    starts_at = db.Column(db.DateTime)
+    ends_at = db.Column(db.DateTime)
+    daily_start = db.Column(db.Time)
+    daily_end = db.Column(db.Time)
+    weekdays = db.Column(db.Integer)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class ChangeLog(db.Model):
+    """Append-only log of admin-visible row changes, read by /api/admin/changes."""
+    __tablename__ = 'change_log'
+    __table_args__ = {'sqlite_autoincrement': True}
+    # seq is the sync cursor: increasing in flush order, may commit out of order (see changes.py)
+    seq = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(32), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=False)
+    op = db.Column(db.String(8), nullable=False)
+    # JSON of the row's columns after the change; NULL for deletes
+    data = db.Column(db.Text)
+    changed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    # the writing process (changes.process_origin), so hooks.sync can skip
+    # commits whose on_commit callbacks already ran here
+    origin = db.Column(db.String(32))
+
+
+# Sales rollups (see rollups.py): derived from orders and reservations, so no
+# foreign keys; days and hours are restaurant local time
+class SalesItemDaily(db.Model):
+    __tablename__ = 'sales_item_daily'
+    # one item's history without walking every day's rows
+    __table_args__ = (db.Index('ix_sales_item_daily_item_day', 'menu_item_id', 'day'),)
+    day = db.Column(db.Date, primary_key=True)
+    menu_item_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    qty = db.Column(db.Integer, nullable=False, default=0)
+    # orders that included the item
+    orders = db.Column(db.Integer, nullable=False, default=0)
+    revenue_cents = db.Column(db.Integer, nullable=False, default=0)
+
+
+class SalesCategoryDaily(db.Model):
+    __tablename__ = 'sales_category_daily'
+    __table_args__ = (db.Index('ix_sales_category_daily_category_day', 'category_id', 'day'),)
+    day = db.Column(db.Date, primary_key=True)
+    # 0 for items without a category
+    category_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    qty = db.Column(db.Integer, nullable=False, default=0)
+    orders = db.Column(db.Integer, nullable=False, default=0)
+    revenue_cents = db.Column(db.Integer, nullable=False, default=0)
+
+
+class SalesDaily(db.Model):
+    __tablename__ = 'sales_daily'
+    day = db.Column(db.Date, primary_key=True)
+    orders = db.Column(db.Integer, nullable=False, default=0)
+    revenue_cents = db.Column(db.Integer, nullable=False, default=0)
+    # reserved guests whose time slot falls on this day
+    covers = db.Column(db.Integer, nullable=False, default=0)
+
+
+class SalesHourly(db.Model):
+    __tablename__ = 'sales_hourly'
+    # start of the hour
+    hour = db.Column(db.DateTime, primary_key=True)
+    orders = db.Column(db.Integer, nullable=False, default=0)
+    revenue_cents = db.Column(db.Integer, nullable=False, default=0)
+    # reserved guests whose time slot starts in this hour
+    covers = db.Column(db.Integer, nullable=False, default=0)
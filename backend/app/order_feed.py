@@ -0,0 +1,112 @@
+"""In-process publish/subscribe hub for the live order feed.
+
+``checkout``, the intake writer and admin status updates publish an event
+after their transaction commits; ``GET /api/admin/orders/stream`` relays
+events to dashboards as Server-Sent Events. Recent events are kept in a ring
+buffer so a reconnecting client that sends ``Last-Event-ID`` gets what it
+missed without touching the database. If the id is older than the buffer, or
+was issued by another process (ids carry a per-process epoch), the client
+gets a ``reset`` event and should reload ``/api/admin/orders`` once.
+
+The hub lives in one process: with several workers, run the dashboards
+against a single worker or put a broker in front.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+
+BUFFER_EVENTS = int(os.getenv('ORDER_FEED_BUFFER', '1000'))
+# comment line sent when idle so proxies keep the connection open
+KEEPALIVE_SECONDS = 15
+
+
+def order_payload(order, lines):
+    """JSON-ready order; ``lines`` are (menu_item_id, qty, unit_price_cents)."""
+    return {
+        'id': order.id,
+        'reference': order.reference,
+        'customer_name': order.customer_name,
+        'customer_email': order.customer_email,
+        'customer_phone': order.customer_phone,
+        'total_cents': order.total_cents,
+        'status': order.status,
+        'created_at': order.created_at.isoformat() if order.created_at else None,
+        'items': [
+            {'menu_item_id': menu_item_id, 'qty': qty, 'unit_price_cents': unit_price_cents}
+            for menu_item_id, qty, unit_price_cents in lines
+        ],
+    }
+
+
+class OrderFeed:
+    def __init__(self, size=BUFFER_EVENTS):
+        self._epoch = format(int(time.time() * 1000), 'x')
+        self._seq = 0
+        # (seq, pre-formatted SSE frame)
+        self._events = deque(maxlen=size)
+        self._cond = threading.Condition()
+
+    def publish(self, event, data):
+        with self._cond:
+            self._seq += 1
+            frame = f'id: {self._epoch}-{self._seq}\nevent: {event}\ndata: {json.dumps(data, separators=(",", ":"))}\n\n'
+            self._events.append((self._seq, frame))
+            self._cond.notify_all()
+
+    def publish_order(self, event, order, lines):
+        self.publish(event, order_payload(order, lines))
+
+    def _parse_last_id(self, last_event_id):
+        """Sequence to resume after, or None when the client must resync."""
+        if not last_event_id:
+            return self._seq
+        epoch, _sep, seq = last_event_id.partition('-')
+        if epoch != self._epoch or not seq.isdigit():
+            return None
+        seq = int(seq)
+        oldest = self._events[0][0] if self._events else self._seq + 1
+        if seq > self._seq or seq < oldest - 1:
+            return None
+        return seq
+
+    def _after(self, seq):
+        # walk back from the newest event; usually only a few are new
+        frames = []
+        for s, frame in reversed(self._events):
+            if s <= seq:
+                break
+            frames.append(frame)
+        frames.reverse()
+        return frames
+
+    def stream(self, last_event_id=None, keepalive=KEEPALIVE_SECONDS):
+        """Yield SSE frames forever, starting after ``last_event_id``."""
+        with self._cond:
+            seq = self._parse_last_id(last_event_id)
+            if seq is None:
+                seq = self._seq
+                first = f'id: {self._epoch}-{seq}\nevent: reset\ndata: {{}}\n\n'
+            else:
+                first = 'retry: 3000\n\n'
+        yield first
+        while True:
+            with self._cond:
+                if self._seq == seq:
+                    self._cond.wait(timeout=keepalive)
+                if self._seq == seq:
+                    frames = None
+                elif self._events and self._events[0][0] > seq + 1:
+                    # fell behind by more than the buffer holds
+                    frames = [f'id: {self._epoch}-{self._seq}\nevent: reset\ndata: {{}}\n\n']
+                else:
+                    frames = self._after(seq)
+                seq = self._seq
+            if frames is None:
+                yield ': keepalive\n\n'
+            else:
+                yield from frames
+
+
+feed = OrderFeed()
@@ -0,0 +1,102 @@
+"""Compiled pricing table shared by the cart quote endpoint and checkout.
+
+The table maps every menu item to its list price, availability and category
+(which the sales rollups use too). It is built with one query and kept in
+memory until a commit touches menu items; discounts come from the promotion
+schedule, so pricing a cart costs no queries. Changes committed by other
+processes reset it through ``hooks.sync``; checkout forces that check
+rather than trusting a table up to ``CACHE_SYNC_INTERVAL`` old.
+Quote and checkout both go through ``quote()``, which keeps the quoted price
+and the charged price identical.
+"""
+import threading
+from . import db
+from .hooks import on_commit
+from .models import MenuItem
+from .promotions import schedule
+
+_lock = threading.Lock()
+# menu_item_id -> (price_cents, available, category_id)
+_table = None
+
+
+def invalidate(changes=None):
+    global _table
+    with _lock:
+        _table = None
+
+
+def _build():
+    return {item_id: (price, available, category_id) for item_id, price, available, category_id in
+            db.session.query(MenuItem.id, MenuItem.price_cents, MenuItem.available, MenuItem.category_id)}
+
+
+def get_table():
+    global _table
+    table = _table
+    if table is not None:
+        return table
+    with _lock:
+        if _table is None:
+            _table = _build()
+        return _table
+
+
+def discounted_price(price_cents, percent):
+    # round half up, the same way the frontend displays it
+    if not percent:
+        return price_cents
+    return (price_cents * (100 - percent) + 50) // 100
+
+
+def merge_lines(items):
+    """Turn raw cart lines into {menu_item_id: qty}, merging duplicates.
+
+    Raises ValueError with a client-facing message on malformed lines.
+    """
+    wanted = {}
+    for it in items:
+        try:
+            item_id = int(it.get('menu_item_id'))
+            qty = int(it.get('qty', 1))
+        except (AttributeError, TypeError, ValueError):
+            raise ValueError('each item needs an integer menu_item_id and qty')
+        if qty < 1:
+            raise ValueError(f'qty for menu item {item_id} must be at least 1')
+        wanted[item_id] = wanted.get(item_id, 0) + qty
+    return wanted
+
+
+def quote(items):
+    """Price raw cart lines against the pricing table.
+
+    Returns a dict with per-line prices and subtotal/discount/total in cents.
+    Raises ValueError for malformed lines and missing or unavailable items.
+    """
+    table = get_table()
+    _token, discounts = schedule.current()
+    lines = []
+    subtotal = total = 0
+    for item_id, qty in merge_lines(items).items():
+        entry = table.get(item_id)
+        if entry is None:
+            raise ValueError(f"Menu item {item_id} not found")
+        price, available, _category_id = entry
+        percent = discounts.get(item_id)
+        if available is False:
+            raise ValueError(f"Menu item {item_id} is not available")
+        unit = discounted_price(price, percent)
+        lines.append({
+            'menu_item_id': item_id,
+            'qty': qty,
+            'list_price_cents': price,
+            'discount_percent': percent,
+            'unit_price_cents': unit,
+            'line_total_cents': unit * qty,
+        })
+        subtotal += price * qty
+        total += unit * qty
+    return {'lines': lines, 'subtotal_cents': subtotal, 'discount_cents': subtotal - total, 'total_cents': total}
+
+
+on_commit((MenuItem,), invalidate)
@@ -0,0 +1,154 @@
+"""Promotion schedule: the discount each menu item gets right now.
+
+A promotion targets one menu item or a whole category, and can be limited
+to an absolute window (``starts_at``/``ends_at``) and/or a daily window
+(``daily_start``/``daily_end``, optionally only on some ``weekdays``), e.g.
+20% off all pastries 15:00-17:00 on weekdays. Times are the restaurant's
+wall clock, like reservation slots (see ``localtime``).
+
+``PromotionSchedule`` loads the active promotions, with the items of every
+targeted category, in one query and keeps them until a commit touches
+promotions, menu items or categories (in another process: see
+``hooks.sync``). From that list it derives the discount map for the current
+segment, the stretch of time up to the next window boundary, so a lookup is
+a single dict access. Once the clock passes the
+boundary the next segment is computed from the in-memory list without going
+back to the database, and ``current()`` hands out a new token so the catalog
+knows to re-encode the menu.
+
+When several promotions cover an item at once, an item promotion beats a
+category-wide one, and among equals the newest wins, as it always did for
+item promotions.
+"""
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from . import db
+from .database import missing_table, use_primary
+from .hooks import on_commit
+from .localtime import local_now
+from .models import Category, MenuItem, Promotion
+
+
+class _Rule:
+    __slots__ = ('id', 'percent', 'specific', 'item_ids', 'starts_at', 'ends_at', 'daily_start', 'daily_end', 'weekdays')
+
+    def __init__(self, row):
+        self.id = row.id
+        self.percent = row.percent
+        self.specific = row.menu_item_id is not None
+        self.item_ids = [row.menu_item_id] if self.specific else []
+        self.starts_at = row.starts_at
+        self.ends_at = row.ends_at
+        self.daily_start = row.daily_start
+        self.daily_end = row.daily_end
+        self.weekdays = row.weekdays
+
+    def active_at(self, now):
+        if self.starts_at is not None and now < self.starts_at:
+            return False
+        if self.ends_at is not None and now >= self.ends_at:
+            return False
+        day = now.date()
+        if self.daily_start is not None:
+            t = now.time()
+            if self.daily_start < self.daily_end:
+                if not self.daily_start <= t < self.daily_end:
+                    return False
+            elif t < self.daily_end:
+                # the tail of a window that opened yesterday evening
+                day -= timedelta(days=1)
+            elif t < self.daily_start:
+                return False
+        return self.weekdays is None or bool(self.weekdays >> day.weekday() & 1)
+
+    def next_change(self, now, limit):
+        """Earliest moment after ``now`` (and before ``limit``) this rule may flip."""
+        candidates = [self.starts_at, self.ends_at]
+        if self.daily_start is not None:
+            today = now.date()
+            candidates += [datetime.combine(today, self.daily_start), datetime.combine(today, self.daily_end)]
+        return min((c for c in candidates if c is not None and now < c < limit), default=limit)
+
+
+class PromotionSchedule:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rules = None
+        # (valid_from, valid_until, token, {menu_item_id: percent})
+        self._segment = None
+        self._token = 0
+
+    def invalidate(self, changes=None):
+        with self._lock:
+            self._rules = None
+            self._segment = None
+
+    def _load(self):
+        q = (
+            db.session.query(
+                Promotion.id, Promotion.percent, Promotion.menu_item_id, Promotion.starts_at, Promotion.ends_at,
+                Promotion.daily_start, Promotion.daily_end, Promotion.weekdays, MenuItem.id.label('category_item_id'),
+            )
+            .outerjoin(MenuItem, MenuItem.category_id == Promotion.category_id)
+            .filter(Promotion.active.is_(True))
+            .order_by(Promotion.id)
+        )
+        try:
+            # a savepoint, so a failure can't take the caller's transaction with it
+            with use_primary(), db.session.begin_nested():
+                rows = q.all()
+        except (OperationalError, ProgrammingError) as e:
+            if not missing_table(e):
+                raise
+            # promotions table not created (or migrated) yet: no discounts, and
+            # nothing cached so the next call looks again
+            return None
+        rules = {}
+        for row in rows:
+            rule = rules.get(row.id)
+            if rule is None:
+                rule = rules[row.id] = _Rule(row)
+            if not rule.specific and row.category_item_id is not None:
+                rule.item_ids.append(row.category_item_id)
+        # apply category rules first and item rules last, oldest to newest,
+        # so later assignments are the ones that win
+        return sorted(rules.values(), key=lambda r: (r.specific, r.id))
+
+    def _compute(self, now):
+        # recompute at least daily so daily windows only need today's times
+        until = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+        discounts = {}
+        for rule in self._rules:
+            if rule.active_at(now):
+                for item_id in rule.item_ids:
+                    discounts[item_id] = rule.percent
+            until = rule.next_change(now, until)
+        return discounts, until
+
+    def current(self, now=None):
+        """``(token, {menu_item_id: percent})`` in effect at ``now``.
+
+        The token changes whenever the map does; the map must not be mutated.
+        """
+        now = now or local_now()
+        segment = self._segment
+        if segment is not None and segment[0] <= now < segment[1]:
+            return segment[2], segment[3]
+        with self._lock:
+            if self._rules is None:
+                rules = self._load()
+                if rules is None:
+                    return self._token, {}
+                self._rules = rules
+            segment = self._segment
+            if segment is None or not segment[0] <= now < segment[1]:
+                discounts, until = self._compute(now)
+                self._token += 1
+                segment = self._segment = (now, until, self._token, discounts)
+            return segment[2], segment[3]
+
+
+schedule = PromotionSchedule()
+
+on_commit((Category, MenuItem, Promotion), schedule.invalidate)
@@ -0,0 +1,121 @@
+"""Per-request query budgets and N+1 detection.
+
+Every SQL statement a request issues is counted and grouped by shape (the
+statement text with bound parameters, expanded ``IN`` lists collapsed). At the
+end of the request two things are checked:
+
+* routes decorated with ``@query_budget(n)`` must not issue more than ``n``
+  statements;
+* no statement shape may repeat ``N_PLUS_ONE_THRESHOLD`` or more times,
+  which is what a query inside a loop over rows looks like.
+
+``QUERY_BUDGET_MODE`` decides what a violation does: ``warn`` (the default)
+logs it, ``raise`` raises ``QueryBudgetExceeded`` so tests and
+``scripts/check_query_budgets.py`` fail, ``off`` skips tracking entirely.
+"""
+import logging
+import os
+import re
+from collections import Counter
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+
+log = logging.getLogger(__name__)
+
+N_PLUS_ONE_THRESHOLD = int(os.getenv('QUERY_BUDGET_REPEAT_THRESHOLD', '5'))
+# "IN (?, ?, ?)" / "IN (__[POSTCOMPILE_x])" / "%(p_1)s, %(p_2)s" all collapse to one shape
+_IN_LIST_RE = re.compile(r'\(\s*(?:\?|%\([^)]*\)s|:\w+|\$\d+)(?:\s*,\s*(?:\?|%\([^)]*\)s|:\w+|\$\d+))*\s*\)')
+_SPACE_RE = re.compile(r'\s+')
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def query_budget(max_queries):
+    """Declare the most SQL statements one request to this view may issue."""
+    def decorator(view):
+        view.query_budget = max_queries
+        return view
+    return decorator
+
+
+def shape(statement):
+    return _IN_LIST_RE.sub('(?)', _SPACE_RE.sub(' ', statement.strip()))
+
+
+class QueryLog:
+    __slots__ = ('endpoint', 'budget', 'shapes', 'count')
+
+    def __init__(self, endpoint, budget):
+        self.endpoint = endpoint
+        self.budget = budget
+        self.shapes = Counter()
+        self.count = 0
+
+    def problems(self):
+        found = []
+        if self.budget is not None and self.count > self.budget:
+            found.append(f'{self.count} queries, budget is {self.budget}')
+        for stmt, n in self.shapes.most_common():
+            if n < N_PLUS_ONE_THRESHOLD:
+                break
+            found.append(f'possible N+1: {n}x {stmt[:200]}')
+        return found
+
+
+def _before_request():
+    view = current_app.view_functions.get(request.endpoint)
+    g.query_log = QueryLog(request.endpoint, getattr(view, 'query_budget', None))
+
+
+def _after_request(response):
+    qlog = g.pop('query_log', None)
+    if qlog is None:
+        return response
+    if current_app.testing:
+        current_app.extensions['query_budget_last'] = qlog
+    problems = qlog.problems()
+    if problems:
+        message = f'{request.method} {request.path} ({qlog.endpoint}): ' + '; '.join(problems)
+        if current_app.config.get('QUERY_BUDGET_MODE') == 'raise':
+            raise QueryBudgetExceeded(message)
+        log.warning('query budget: %s', message)
+    return response
+
+
+def _count(conn, cursor, statement, parameters, context, executemany):
+    if not has_request_context():
+        return
+    qlog = g.get('query_log')
+    if qlog is not None:
+        qlog.count += 1
+        qlog.shapes[shape(statement)] += 1
+
+
+def init_app(app, db):
+    mode = os.getenv('QUERY_BUDGET_MODE', 'warn').lower()
+    app.config.setdefault('QUERY_BUDGET_MODE', mode)
+    if mode == 'off':
+        return
+    with app.app_context():
+        for engine in db.engines.values():
+            event.listen(engine, 'before_cursor_execute', _count)
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+
+
+def assert_budgets(client, calls):
+    """Test helper: issue each ``(method, url, kwargs)`` through a test client.
+
+    The app must have ``TESTING`` set and ``QUERY_BUDGET_MODE='raise'`` so a
+    violation propagates as ``QueryBudgetExceeded``. Returns
+    ``[(method, url, statements, budget)]`` for reporting.
+    """
+    results = []
+    for method, url, kwargs in calls:
+        client.open(url, method=method, **kwargs).get_data()
+        qlog = client.application.extensions.pop('query_budget_last', None)
+        if qlog is not None:
+            results.append((method, url, qlog.count, qlog.budget))
+    return results
@@ -0,0 +1,209 @@
+"""Table allocation for reservations.
+
+Each time slot's occupancy is kept as a bitmap (bit ``n - 1`` set means table
+``n`` is taken), so picking a free table never rescans the slot's rows. The
+bitmap is only a hint: the unique constraint on ``(time_slot, table_number)``
+is what prevents double booking across threads and worker processes. When an
+insert loses that race the slot's bitmap is stale, so we reread it from the
+database and pick again.
+
+``AvailabilityCache`` answers the booking calendar: free tables per slot for a
+day, computed with one grouped query and cached until a reservation for that
+day is created or deleted. Bookings made by other workers reset both caches
+through ``hooks.sync`` within ``CACHE_SYNC_INTERVAL``.
+"""
+import os
+import random
+import threading
+from collections import OrderedDict
+from datetime import datetime, time, timedelta
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from . import db
+from .hooks import on_commit
+from .models import Reservation
+
+TOTAL_TABLES = 30
+# bookable slots shown on the calendar: every SLOT_MINUTES from OPEN up to (not including) CLOSE
+OPENING_TIME = time.fromisoformat(os.getenv('RESERVATION_OPEN', '17:00'))
+CLOSING_TIME = time.fromisoformat(os.getenv('RESERVATION_CLOSE', '22:00'))
+SLOT_MINUTES = int(os.getenv('RESERVATION_SLOT_MINUTES', '30'))
+
+
+class TableAllocator:
+    def __init__(self, total_tables=TOTAL_TABLES, max_slots=4096):
+        self.total_tables = total_tables
+        self.max_slots = max_slots
+        self._lock = threading.Lock()
+        # time_slot -> occupancy bitmap, least recently used first
+        self._slots = OrderedDict()
+
+    def _load(self, time_slot):
+        bits = 0
+        for (table_number,) in db.session.query(Reservation.table_number).filter(Reservation.time_slot == time_slot):
+            if 1 <= table_number <= self.total_tables:
+                bits |= 1 << (table_number - 1)
+        return bits
+
+    def _claim(self, time_slot, reload=False):
+        """Pick a free table for the slot and mark it taken; None when full."""
+        loaded = None
+        if reload or time_slot not in self._slots:
+            # read outside the lock; a stale read is corrected by the constraint
+            loaded = self._load(time_slot)
+        with self._lock:
+            bits = self._slots.get(time_slot, 0)
+            if loaded is not None:
+                # keep claims other threads made while we were reading, unless
+                # we are reloading precisely because the cached bits are stale
+                bits = loaded if reload else bits | loaded
+            free = [n for n in range(1, self.total_tables + 1) if not bits & (1 << (n - 1))]
+            if not free:
+                self._store(time_slot, bits)
+                return None
+            table_number = random.choice(free)
+            self._store(time_slot, bits | (1 << (table_number - 1)))
+            return table_number
+
+    def _store(self, time_slot, bits):
+        self._slots[time_slot] = bits
+        self._slots.move_to_end(time_slot)
+        while len(self._slots) > self.max_slots:
+            self._slots.popitem(last=False)
+
+    def release(self, time_slot, table_number):
+        with self._lock:
+            bits = self._slots.get(time_slot)
+            if bits is not None:
+                self._slots[time_slot] = bits & ~(1 << (table_number - 1))
+
+    def mark_taken(self, time_slot, table_number):
+        with self._lock:
+            bits = self._slots.get(time_slot)
+            if bits is not None:
+                self._slots[time_slot] = bits | (1 << (table_number - 1))
+
+    def allocate(self, customer_id, time_slot, guests):
+        """Insert a Reservation on a free table inside the current transaction.
+
+        Returns the flushed Reservation, or None when the slot is fully booked.
+        The caller commits; if that commit fails it should call ``release``.
+        """
+        stale = False
+        while True:
+            table_number = self._claim(time_slot, reload=stale)
+            if table_number is None and not stale:
+                # another worker may have freed tables since we cached the slot
+                stale = True
+                table_number = self._claim(time_slot, reload=True)
+            if table_number is None:
+                return None
+            res = Reservation(customer_id=customer_id, time_slot=time_slot, table_number=table_number, guests=guests)
+            try:
+                with db.session.begin_nested():
+                    db.session.add(res)
+            except IntegrityError:
+                # booked by another worker, so the cached bits for the slot are
+                # stale: reread them instead of probing tables one INSERT at a time
+                stale = True
+                continue
+            return res
+
+    def reset(self):
+        # bookings made by other processes: reload slots lazily
+        with self._lock:
+            self._slots.clear()
+
+    def on_commit(self, changes):
+        for op, time_slot, table_number in changes:
+            if op == 'delete':
+                self.release(time_slot, table_number)
+            elif op == 'insert':
+                self.mark_taken(time_slot, table_number)
+            else:
+                # moved to another slot or table: reload that slot lazily
+                with self._lock:
+                    self._slots.pop(time_slot, None)
+
+
+class AvailabilityCache:
+    def __init__(self, total_tables=TOTAL_TABLES, max_days=366):
+        self.total_tables = total_tables
+        self.max_days = max_days
+        self._lock = threading.Lock()
+        # date -> list of {'time_slot', 'free_tables'}, least recently used first
+        self._days = OrderedDict()
+        # bumped on every invalidation so a computation that raced a commit is not cached
+        self._epoch = 0
+
+    def _schedule(self, day):
+        slot = datetime.combine(day, OPENING_TIME)
+        close = datetime.combine(day, CLOSING_TIME)
+        while slot < close:
+            yield slot
+            slot += timedelta(minutes=SLOT_MINUTES)
+
+    def _compute(self, first, last):
+        """Build slot lists for days first..last (inclusive) from one grouped query."""
+        start = datetime.combine(first, time.min)
+        end = datetime.combine(last + timedelta(days=1), time.min)
+        booked = dict(
+            db.session.query(Reservation.time_slot, func.count(Reservation.id))
+            .filter(Reservation.time_slot >= start, Reservation.time_slot < end)
+            .group_by(Reservation.time_slot)
+            .all()
+        )
+        days = {}
+        day = first
+        while day <= last:
+            slots = set(self._schedule(day))
+            # bookings made for off-schedule times still show up
+            slots.update(ts for ts in booked if ts.date() == day)
+            days[day] = [
+                {'time_slot': ts.isoformat(), 'free_tables': max(0, self.total_tables - booked.get(ts, 0))}
+                for ts in sorted(slots)
+            ]
+            day += timedelta(days=1)
+        return days
+
+    def get(self, first, n_days=1):
+        """Return [(date, slots)] for ``n_days`` days starting at ``first``."""
+        wanted = [first + timedelta(days=n) for n in range(n_days)]
+        with self._lock:
+            cached = {d: self._days[d] for d in wanted if d in self._days}
+            epoch = self._epoch
+        missing = [d for d in wanted if d not in cached]
+        if missing:
+            fresh = self._compute(missing[0], missing[-1])
+            with self._lock:
+                for d in (missing if epoch == self._epoch else ()):
+                    self._days[d] = fresh[d]
+                    self._days.move_to_end(d)
+                while len(self._days) > self.max_days:
+                    self._days.popitem(last=False)
+            cached.update(fresh)
+        return [(d, cached[d]) for d in wanted]
+
+    def reset(self):
+        with self._lock:
+            self._epoch += 1
+            self._days.clear()
+
+    def on_commit(self, changes):
+        with self._lock:
+            self._epoch += 1
+            for _op, time_slot, _table_number in changes:
+                self._days.pop(time_slot.date(), None)
+
+
+allocator = TableAllocator()
+availability = AvailabilityCache()
+
+
+def _capture(op, res):
+    return (op, res.time_slot, res.table_number)
+
+
+# reset: bookings committed by other processes, see hooks.sync
+on_commit([Reservation], allocator.on_commit, _capture, reset=allocator.reset)
+on_commit([Reservation], availability.on_commit, _capture, reset=availability.reset)
@@ -0,0 +1,69 @@
+"""Pre-encoded response bodies.
+
+An ``EncodedBody`` holds a JSON document as ready-made bytes together with its
+gzip and brotli variants, so cached endpoints can answer with no JSON encoding
+or compression work per request. ``send_encoded`` picks the variant from
+``Accept-Encoding`` and handles ``If-None-Match``.
+"""
+import gzip
+import hashlib
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:  # optional; without it we only offer gzip
+    brotli = None
+
+# below this size compression costs more than it saves
+MIN_COMPRESS_BYTES = 512
+
+
+class EncodedBody:
+    def __init__(self, raw, mimetype='application/json'):
+        self.mimetype = mimetype
+        digest = hashlib.sha1(raw).hexdigest()
+        # encoding -> (bytes, etag); strong ETags must differ per encoding
+        self.variants = {'identity': (raw, digest)}
+        if len(raw) >= MIN_COMPRESS_BYTES:
+            self.variants['gzip'] = (gzip.compress(raw, compresslevel=9, mtime=0), digest + '-gzip')
+            if brotli is not None:
+                self.variants['br'] = (brotli.compress(raw), digest + '-br')
+        self.etags = [etag for _body, etag in self.variants.values()]
+
+    @property
+    def raw(self):
+        return self.variants['identity'][0]
+
+
+def encode_json(payload):
+    """Serialize ``payload`` exactly like ``jsonify`` would and pre-compress it."""
+    return EncodedBody(current_app.json.response(payload).get_data())
+
+
+def _negotiate(body):
+    accept = request.accept_encodings
+    best, best_q = 'identity', 0
+    # prefer brotli over gzip when the client rates them equally
+    for encoding in ('br', 'gzip'):
+        if encoding in body.variants:
+            q = accept[encoding]
+            if q > best_q:
+                best, best_q = encoding, q
+    return best
+
+
+def send_encoded(body, cache_control='no-cache'):
+    """Return a response for ``body``, or 304 if the client already has it."""
+    encoding = _negotiate(body)
+    data, etag = body.variants[encoding]
+    if any(request.if_none_match.contains(e) for e in body.etags):
+        resp = current_app.response_class(status=304)
+    else:
+        resp = current_app.response_class(data, mimetype=body.mimetype)
+        if encoding != 'identity':
+            resp.headers['Content-Encoding'] = encoding
+    resp.set_etag(etag)
+    resp.vary.add('Accept-Encoding')
+    if cache_control:
+        resp.headers['Cache-Control'] = cache_control
+    return resp
@@ -0,0 +1,391 @@
+"""Sales rollups: pre-aggregated revenue per item, category, day and hour.
+
+Four tables, keyed by restaurant-local day or hour (see ``localtime``):
+
+* ``sales_item_daily``: qty, orders and revenue per menu item per day
+* ``sales_category_daily``: the same per category per day
+* ``sales_daily``: orders, revenue and reserved covers per day
+* ``sales_hourly``: the same per hour
+
+Orders count towards the category their items were in when ordered
+(``order_items.category_id``), so moving an item to another category leaves
+past sales where they were; lines from before that column existed fall back
+to the item's current category.
+
+Cancelled orders are left out. With ``SALES_ROLLUPS=incremental`` (the
+default) writes keep the tables up to date. Deltas are upserts (``INSERT ..
+ON CONFLICT DO UPDATE SET n = n + excluded.n``), in key order so concurrent
+writers lock rows in the same order:
+
+* checkout hands its order to ``RollupBuffer`` after committing; a background
+  thread per worker sums them and upserts every
+  ``SALES_ROLLUPS_FLUSH_SECONDS``, so concurrent checkouts don't queue on the
+  current hour's ``sales_hourly`` row. A worker that dies loses at most one
+  interval's worth; ``scripts/refresh_rollups.py`` recomputes those days.
+* the intake writer (already one transaction per batch) and status changes to
+  or from ``cancelled`` call ``record_orders`` in their own transaction.
+* reservation inserts and deletes adjust covers from a flush hook.
+
+With ``SALES_ROLLUPS=batch`` writes leave the tables alone and
+``refresh()`` (``scripts/refresh_rollups.py``, e.g. from cron) recomputes
+whole days from ``orders``; it is also how existing data is backfilled.
+
+The analytics endpoints read only these tables, so a year of daily revenue
+is a few hundred rows rather than a scan of ``order_items``.
+"""
+import atexit
+import logging
+import os
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta
+from sqlalchemy import delete, event, func, inspect, or_, select
+from . import db
+from .localtime import to_local, to_utc
+from .models import (
+    MenuItem, Order, OrderItem, Reservation, SalesCategoryDaily, SalesDaily, SalesHourly, SalesItemDaily,
+)
+
+log = logging.getLogger(__name__)
+
+MODE = os.getenv('SALES_ROLLUPS', 'incremental').lower()
+NO_CATEGORY = 0
+
+
+class _Totals:
+    """Deltas keyed per table, ready to upsert or insert."""
+
+    def __init__(self):
+        self.items = defaultdict(lambda: [0, 0, 0])       # (day, item) -> qty, orders, revenue
+        self.categories = defaultdict(lambda: [0, 0, 0])  # (day, category) -> qty, orders, revenue
+        self.days = defaultdict(lambda: [0, 0, 0])        # day -> orders, revenue, covers
+        self.hours = defaultdict(lambda: [0, 0, 0])       # hour -> orders, revenue, covers
+
+    def add_order(self, local_ts, lines, sign=1):
+        day = local_ts.date()
+        hour = local_ts.replace(minute=0, second=0, microsecond=0)
+        total = 0
+        seen_categories = set()
+        for item_id, qty, unit, category_id in lines:
+            revenue = qty * unit
+            total += revenue
+            row = self.items[(day, item_id)]
+            row[0] += sign * qty
+            row[1] += sign
+            row[2] += sign * revenue
+            row = self.categories[(day, category_id)]
+            row[0] += sign * qty
+            if category_id not in seen_categories:
+                seen_categories.add(category_id)
+                row[1] += sign
+            row[2] += sign * revenue
+        for row in (self.days[day], self.hours[hour]):
+            row[0] += sign
+            row[1] += sign * total
+
+    def add_covers(self, time_slot, guests):
+        self.days[time_slot.date()][2] += guests
+        self.hours[time_slot.replace(minute=0, second=0, microsecond=0)][2] += guests
+
+    def _tables(self):
+        return (self.items, self.categories, self.days, self.hours)
+
+    def merge(self, other):
+        for mine, theirs in zip(self._tables(), other._tables()):
+            for key, values in theirs.items():
+                row = mine[key]
+                for i, value in enumerate(values):
+                    row[i] += value
+
+    def __bool__(self):
+        return any(self._tables())
+
+    def rows(self):
+        return (
+            [{'day': d, 'menu_item_id': i, 'qty': q, 'orders': o, 'revenue_cents': r}
+             for (d, i), (q, o, r) in sorted(self.items.items())],
+            [{'day': d, 'category_id': c, 'qty': q, 'orders': o, 'revenue_cents': r}
+             for (d, c), (q, o, r) in sorted(self.categories.items())],
+            [{'day': d, 'orders': o, 'revenue_cents': r, 'covers': c}
+             for d, (o, r, c) in sorted(self.days.items())],
+            [{'hour': h, 'orders': o, 'revenue_cents': r, 'covers': c}
+             for h, (o, r, c) in sorted(self.hours.items())],
+        )
+
+
+def _upsert(session, model, rows):
+    if not rows:
+        return
+    table = model.__table__
+    keys = [c.name for c in table.primary_key.columns]
+    counters = [c.name for c in table.columns if c.name not in keys]
+    conn = session.connection()
+    dialect = conn.dialect.name
+    if dialect == 'mysql':
+        from sqlalchemy.dialects.mysql import insert as upsert
+        stmt = upsert(table)
+        stmt = stmt.on_duplicate_key_update({c: table.c[c] + stmt.inserted[c] for c in counters})
+    else:
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as upsert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as upsert
+        stmt = upsert(table)
+        stmt = stmt.on_conflict_do_update(index_elements=keys, set_={c: table.c[c] + stmt.excluded[c] for c in counters})
+    conn.execute(stmt, rows)
+
+
+# in the order _Totals.rows() returns them, which is also the upsert (lock) order
+_TABLES = (SalesItemDaily, SalesCategoryDaily, SalesDaily, SalesHourly)
+
+
+def _apply(session, totals):
+    for model, rows in zip(_TABLES, totals.rows()):
+        _upsert(session, model, rows)
+
+
+def category_of(item_id):
+    """The item's category right now (``NO_CATEGORY`` for none), from the pricing table."""
+    from .pricing import get_table
+    entry = get_table().get(item_id)
+    return entry[2] if entry is not None and entry[2] is not None else NO_CATEGORY
+
+
+def record_orders(orders, sign=1):
+    """Add orders to the rollups inside the caller's transaction.
+
+    ``orders`` yields ``(created_at, lines)`` with ``created_at`` in UTC and
+    lines as ``(menu_item_id, qty, unit_price_cents, category_id)``, the
+    category being the one stored on the order line; ``sign=-1`` takes them
+    back out (an order being cancelled).
+    """
+    if MODE != 'incremental':
+        return
+    totals = _Totals()
+    for created_at, lines in orders:
+        totals.add_order(to_local(created_at), lines, sign)
+    _apply(db.session, totals)
+
+
+class RollupBuffer:
+    """Checkout deltas summed in memory and upserted by a background thread."""
+
+    def __init__(self, interval=1.0):
+        self.interval = interval
+        self._totals = _Totals()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = None
+
+    def add(self, created_at, lines):
+        """Queue a committed order; lines as for ``record_orders``."""
+        with self._lock:
+            self._totals.add_order(to_local(created_at), lines)
+
+    def flush(self):
+        """Upsert everything queued so far in one transaction; True if there was anything."""
+        with self._lock:
+            totals, self._totals = self._totals, _Totals()
+        if not totals:
+            return False
+        try:
+            _apply(db.session, totals)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            # keep the deltas for the next round
+            with self._lock:
+                totals.merge(self._totals)
+                self._totals = totals
+            raise
+        return True
+
+    def _run(self, app):
+        while True:
+            stopping = self._stopping
+            with app.app_context():
+                try:
+                    self.flush()
+                except Exception:
+                    log.exception('sales rollup flush failed; retrying')
+                finally:
+                    db.session.remove()
+            if stopping:
+                return
+            self._wake.wait(timeout=self.interval)
+
+    def start(self, app):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, args=(app,), name='sales-rollups', daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def stop(self):
+        """Flush what's left and stop the thread."""
+        self._stopping = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+def _after_flush(session, flush_context):
+    if MODE != 'incremental':
+        return
+    totals = None
+    for op, objs in (('insert', session.new), ('delete', session.deleted), ('update', session.dirty)):
+        for obj in objs:
+            if not isinstance(obj, Reservation):
+                continue
+            totals = totals or _Totals()
+            if op == 'update':
+                state = inspect(obj)
+                slot, guests = state.attrs.time_slot.history, state.attrs.guests.history
+                if not slot.has_changes() and not guests.has_changes():
+                    continue
+                old_slot = (slot.deleted or slot.unchanged)[0]
+                old_guests = (guests.deleted or guests.unchanged or [0])[0] or 0
+                totals.add_covers(old_slot, -old_guests)
+                totals.add_covers(obj.time_slot, obj.guests or 0)
+            else:
+                totals.add_covers(obj.time_slot, (obj.guests or 0) * (1 if op == 'insert' else -1))
+    if totals is not None:
+        _items, _categories, days, hours = totals.rows()
+        _upsert(session, SalesDaily, days)
+        _upsert(session, SalesHourly, hours)
+
+
+def refresh(start=None, end=None, batch=5000):
+    """Recompute the rollups for local days ``start`` <= day < ``end`` and commit.
+
+    Without bounds, every day with orders or reservations. Run it when writes
+    are not also updating the same days incrementally (batch mode, a backfill,
+    or for past days). Returns the number of rows written per table.
+    """
+    if start is None or end is None:
+        first, last = db.session.query(func.min(Order.created_at), func.max(Order.created_at)).one()
+        slots = db.session.query(func.min(Reservation.time_slot), func.max(Reservation.time_slot)).one()
+        days = [to_local(t).date() for t in (first, last) if t is not None] + [t.date() for t in slots if t is not None]
+        if not days:
+            return {model.__tablename__: 0 for model in _TABLES}
+        start = start or min(days)
+        end = end or max(days) + timedelta(days=1)
+    lo = datetime.combine(start, datetime.min.time())
+    hi = datetime.combine(end, datetime.min.time())
+
+    # only for lines from before order_items.category_id was recorded
+    categories = dict(db.session.query(MenuItem.id, MenuItem.category_id))
+
+    totals = _Totals()
+    stmt = (
+        select(Order.id, Order.created_at, OrderItem.menu_item_id, OrderItem.qty, OrderItem.unit_price_cents,
+               OrderItem.category_id)
+        .join(OrderItem, OrderItem.order_id == Order.id)
+        .where(Order.created_at >= to_utc(lo), Order.created_at < to_utc(hi))
+        .where(or_(Order.status.is_(None), Order.status != 'cancelled'))
+        .order_by(Order.id)
+    )
+    # rows arrive grouped by order; bucket each order once its lines are in
+    current, local_ts, lines = None, None, []
+    for order_id, created_at, item_id, qty, unit, category_id in db.session.execute(stmt.execution_options(yield_per=batch)):
+        if order_id != current:
+            if lines:
+                totals.add_order(local_ts, lines)
+            current, local_ts, lines = order_id, to_local(created_at), []
+        if category_id is None:
+            category_id = categories.get(item_id) or NO_CATEGORY
+        lines.append((item_id, qty, unit or 0, category_id))
+    if lines:
+        totals.add_order(local_ts, lines)
+    for time_slot, guests in db.session.query(Reservation.time_slot, Reservation.guests).filter(
+            Reservation.time_slot >= lo, Reservation.time_slot < hi):
+        totals.add_covers(time_slot, guests or 0)
+
+    counts = {}
+    for model, rows in zip(_TABLES, totals.rows()):
+        if model is SalesHourly:
+            db.session.execute(delete(model).where(model.hour >= lo, model.hour < hi))
+        else:
+            db.session.execute(delete(model).where(model.day >= start, model.day < end))
+        for i in range(0, len(rows), batch):
+            db.session.execute(model.__table__.insert(), rows[i:i + batch])
+        counts[model.__tablename__] = len(rows)
+    db.session.commit()
+    return counts
+
+
+def _period_rows(start, end, interval):
+    if interval == 'hour':
+        lo = datetime.combine(start, datetime.min.time())
+        hi = datetime.combine(end, datetime.min.time())
+        rows = db.session.execute(
+            select(SalesHourly.hour, SalesHourly.orders, SalesHourly.revenue_cents, SalesHourly.covers)
+            .where(SalesHourly.hour >= lo, SalesHourly.hour < hi)
+            .order_by(SalesHourly.hour)
+        )
+        return [{'period': hour.isoformat(timespec='minutes'), 'orders': o, 'covers': c, 'revenue_cents': r}
+                for hour, o, r, c in rows]
+    # one row per day rather than summing up to 24 hourly ones
+    rows = db.session.execute(
+        select(SalesDaily.day, SalesDaily.orders, SalesDaily.revenue_cents, SalesDaily.covers)
+        .where(SalesDaily.day >= start, SalesDaily.day < end)
+        .order_by(SalesDaily.day)
+    )
+    return [{'period': day.isoformat(), 'orders': o, 'covers': c, 'revenue_cents': r} for day, o, r, c in rows]
+
+
+def revenue(start, end, interval='day'):
+    """Orders, covers and revenue per day or hour for ``start`` <= day < ``end``."""
+    series = _period_rows(start, end, interval)
+    totals = {k: sum(r[k] for r in series) for k in ('orders', 'covers', 'revenue_cents')}
+    return {'series': series, 'totals': totals}
+
+
+def _rollup(kind):
+    if kind == 'item':
+        return SalesItemDaily, SalesItemDaily.menu_item_id
+    return SalesCategoryDaily, SalesCategoryDaily.category_id
+
+
+def ranking(kind, start, end, limit):
+    """Top items or categories by revenue over the range."""
+    model, key = _rollup(kind)
+    revenue_sum = func.sum(model.revenue_cents)
+    rows = db.session.execute(
+        select(key, func.sum(model.qty), func.sum(model.orders), revenue_sum)
+        .where(model.day >= start, model.day < end)
+        .group_by(key)
+        .order_by(revenue_sum.desc(), key)
+        .limit(limit)
+    )
+    return [{'id': k, 'qty': q, 'orders': o, 'revenue_cents': r} for k, q, o, r in rows]
+
+
+def series(kind, entity_id, start, end):
+    """One item's or category's daily figures over the range."""
+    model, key = _rollup(kind)
+    rows = db.session.execute(
+        select(model.day, model.qty, model.orders, model.revenue_cents)
+        .where(key == entity_id, model.day >= start, model.day < end)
+        .order_by(model.day)
+    )
+    return [{'day': d.isoformat(), 'qty': q, 'orders': o, 'revenue_cents': r} for d, q, o, r in rows]
+
+
+def init_app(app):
+    """Start the checkout rollup buffer in incremental mode."""
+    if MODE != 'incremental':
+        return
+    buffer = RollupBuffer(interval=float(os.getenv('SALES_ROLLUPS_FLUSH_SECONDS', '1')))
+    app.extensions['sales_rollups'] = buffer
+    buffer.start(app)
+
+
+def _install():
+    if event.contains(db.session, 'after_flush', _after_flush):
+        return
+    event.listen(db.session, 'after_flush', _after_flush)
+
+
+_install()
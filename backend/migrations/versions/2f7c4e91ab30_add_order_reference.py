@@ -0,0 +1,29 @@
+"""add order reference
+
+Revision ID: 2f7c4e91ab30
+Revises: 8d3f0a6b2c19
+Create Date: 2026-10-18 11:20:05.402817
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2f7c4e91ab30'
+down_revision = '8d3f0a6b2c19'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # existing orders keep a NULL reference; NULLs don't collide in a unique index
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('reference', sa.String(length=32), nullable=True))
+        batch_op.create_unique_constraint('uq_orders_reference', ['reference'])
+
+
+def downgrade():
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_orders_reference', type_='unique')
+        batch_op.drop_column('reference')
@@ -0,0 +1,27 @@
+"""record the writing process in the change log
+
+Revision ID: 4e8a1f6c2d97
+Revises: 9c4d2e7b1a63
+Create Date: 2026-10-18 21:14:05.613289
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4e8a1f6c2d97'
+down_revision = '9c4d2e7b1a63'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('change_log', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('origin', sa.String(length=32), nullable=True))
+
+
+def downgrade():
+    # a rebuilt SQLite table must keep AUTOINCREMENT so sequence numbers aren't reused
+    with op.batch_alter_table('change_log', schema=None, table_kwargs={'sqlite_autoincrement': True}) as batch_op:
+        batch_op.drop_column('origin')
@@ -0,0 +1,29 @@
+"""unique table per reservation time slot
+
+Revision ID: 5b1e9c2d7a41
+Revises: ceefa663802d
+Create Date: 2026-10-18 09:12:40.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b1e9c2d7a41'
+down_revision = 'ceefa663802d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # NOTE: fails if the table already holds double-booked rows; resolve those
+    # (SELECT time_slot, table_number FROM reservations GROUP BY 1, 2 HAVING count(*) > 1)
+    # before upgrading.
+    with op.batch_alter_table('reservations', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_reservations_slot_table', ['time_slot', 'table_number'])
+
+
+def downgrade():
+    with op.batch_alter_table('reservations', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_reservations_slot_table', type_='unique')
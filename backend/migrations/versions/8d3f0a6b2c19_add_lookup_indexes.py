@@ -0,0 +1,40 @@
+"""add lookup indexes
+
+Revision ID: 8d3f0a6b2c19
+Revises: 5b1e9c2d7a41
+Create Date: 2026-10-18 10:03:27.551920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d3f0a6b2c19'
+down_revision = '5b1e9c2d7a41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # the unique (time_slot, table_number) index came with revision 5b1e9c2d7a41;
+    # this one serves the admin listing's (time_slot, id) keyset order
+    op.create_index('ix_reservations_time_slot_id', 'reservations', ['time_slot', 'id'])
+    op.create_index('ix_categories_position', 'categories', ['position'])
+    op.create_index('ix_menu_items_category_id', 'menu_items', ['category_id'])
+    op.create_index('ix_orders_created_at_id', 'orders', ['created_at', 'id'])
+    op.create_index('ix_orders_status_created_at_id', 'orders', ['status', 'created_at', 'id'])
+    op.create_index('ix_order_items_order_id', 'order_items', ['order_id'])
+    op.create_index('ix_order_items_menu_item_id', 'order_items', ['menu_item_id'])
+    op.create_index('ix_promotions_menu_item_id_active', 'promotions', ['menu_item_id', 'active'])
+
+
+def downgrade():
+    op.drop_index('ix_promotions_menu_item_id_active', table_name='promotions')
+    op.drop_index('ix_order_items_menu_item_id', table_name='order_items')
+    op.drop_index('ix_order_items_order_id', table_name='order_items')
+    op.drop_index('ix_orders_status_created_at_id', table_name='orders')
+    op.drop_index('ix_orders_created_at_id', table_name='orders')
+    op.drop_index('ix_menu_items_category_id', table_name='menu_items')
+    op.drop_index('ix_categories_position', table_name='categories')
+    op.drop_index('ix_reservations_time_slot_id', table_name='reservations')
@@ -0,0 +1,27 @@
+"""record the category on order items
+
+Revision ID: 9c4d2e7b1a63
+Revises: e3b9f1c6d845
+Create Date: 2026-10-18 19:02:41.287153
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c4d2e7b1a63'
+down_revision = 'e3b9f1c6d845'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # existing lines stay NULL: the rollups use the item's current category for them
+    with op.batch_alter_table('order_items', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('category_id', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('order_items', schema=None) as batch_op:
+        batch_op.drop_column('category_id')
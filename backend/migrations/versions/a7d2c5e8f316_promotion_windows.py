@@ -0,0 +1,46 @@
+"""promotion windows and category-wide promotions
+
+Revision ID: a7d2c5e8f316
+Revises: c41e8a7d9f52
+Create Date: 2026-10-18 15:06:52.402117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7d2c5e8f316'
+down_revision = 'c41e8a7d9f52'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('promotions', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('category_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('starts_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('ends_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('daily_start', sa.Time(), nullable=True))
+        batch_op.add_column(sa.Column('daily_end', sa.Time(), nullable=True))
+        batch_op.add_column(sa.Column('weekdays', sa.Integer(), nullable=True))
+        batch_op.alter_column('menu_item_id', existing_type=sa.Integer(), nullable=True)
+        batch_op.create_foreign_key('fk_promotions_category_id_categories', 'categories', ['category_id'], ['id'])
+        batch_op.create_index(batch_op.f('ix_promotions_category_id'), ['category_id'], unique=False)
+        batch_op.create_check_constraint('ck_promotions_target', '(menu_item_id IS NULL) <> (category_id IS NULL)')
+
+
+def downgrade():
+    # category-wide promotions have no item to fall back to
+    op.execute('DELETE FROM promotions WHERE menu_item_id IS NULL')
+    with op.batch_alter_table('promotions', schema=None) as batch_op:
+        batch_op.drop_constraint('ck_promotions_target', type_='check')
+        batch_op.drop_index(batch_op.f('ix_promotions_category_id'))
+        batch_op.drop_constraint('fk_promotions_category_id_categories', type_='foreignkey')
+        batch_op.alter_column('menu_item_id', existing_type=sa.Integer(), nullable=False)
+        batch_op.drop_column('weekdays')
+        batch_op.drop_column('daily_end')
+        batch_op.drop_column('daily_start')
+        batch_op.drop_column('ends_at')
+        batch_op.drop_column('starts_at')
+        batch_op.drop_column('category_id')
@@ -0,0 +1,47 @@
+"""add daily sales rollup
+
+Revision ID: b6f3d8a2e519
+Revises: 4e8a1f6c2d97
+Create Date: 2026-10-18 22:05:37.440912
+
+"""
+from collections import defaultdict
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6f3d8a2e519'
+down_revision = '4e8a1f6c2d97'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    sales_daily = op.create_table(
+        'sales_daily',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('orders', sa.Integer(), nullable=False),
+        sa.Column('revenue_cents', sa.Integer(), nullable=False),
+        sa.Column('covers', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('day'),
+    )
+    # fold the hourly rollup into days; in Python, as casting a timestamp to a
+    # date isn't portable (SQLite's CAST .. AS DATE gives the year)
+    hourly = sa.table('sales_hourly', sa.column('hour', sa.DateTime()), sa.column('orders', sa.Integer()),
+                      sa.column('revenue_cents', sa.Integer()), sa.column('covers', sa.Integer()))
+    days = defaultdict(lambda: [0, 0, 0])
+    for hour, orders, revenue, covers in op.get_bind().execute(
+            sa.select(hourly.c.hour, hourly.c.orders, hourly.c.revenue_cents, hourly.c.covers)):
+        row = days[hour.date()]
+        row[0] += orders
+        row[1] += revenue
+        row[2] += covers
+    if days:
+        op.bulk_insert(sales_daily, [
+            {'day': d, 'orders': o, 'revenue_cents': r, 'covers': c} for d, (o, r, c) in sorted(days.items())
+        ])
+
+
+def downgrade():
+    op.drop_table('sales_daily')
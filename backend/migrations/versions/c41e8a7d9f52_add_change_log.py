@@ -0,0 +1,35 @@
+"""add change log
+
+Revision ID: c41e8a7d9f52
+Revises: 2f7c4e91ab30
+Create Date: 2026-10-18 12:41:18.730551
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41e8a7d9f52'
+down_revision = '2f7c4e91ab30'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'change_log',
+        sa.Column('seq', sa.Integer(), nullable=False),
+        sa.Column('entity', sa.String(length=32), nullable=False),
+        sa.Column('entity_id', sa.Integer(), nullable=False),
+        sa.Column('op', sa.String(length=8), nullable=False),
+        sa.Column('data', sa.Text(), nullable=True),
+        sa.Column('changed_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('seq'),
+        # never reuse a sequence number, even after pruning the newest rows
+        sqlite_autoincrement=True,
+    )
+
+
+def downgrade():
+    op.drop_table('change_log')
@@ -0,0 +1,56 @@
+"""add sales rollups
+
+Revision ID: e3b9f1c6d845
+Revises: a7d2c5e8f316
+Create Date: 2026-10-18 17:24:09.615830
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3b9f1c6d845'
+down_revision = 'a7d2c5e8f316'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'sales_item_daily',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('menu_item_id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('qty', sa.Integer(), nullable=False),
+        sa.Column('orders', sa.Integer(), nullable=False),
+        sa.Column('revenue_cents', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('day', 'menu_item_id'),
+    )
+    op.create_index('ix_sales_item_daily_item_day', 'sales_item_daily', ['menu_item_id', 'day'], unique=False)
+    op.create_table(
+        'sales_category_daily',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('category_id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('qty', sa.Integer(), nullable=False),
+        sa.Column('orders', sa.Integer(), nullable=False),
+        sa.Column('revenue_cents', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('day', 'category_id'),
+    )
+    op.create_index('ix_sales_category_daily_category_day', 'sales_category_daily', ['category_id', 'day'], unique=False)
+    op.create_table(
+        'sales_hourly',
+        sa.Column('hour', sa.DateTime(), nullable=False),
+        sa.Column('orders', sa.Integer(), nullable=False),
+        sa.Column('revenue_cents', sa.Integer(), nullable=False),
+        sa.Column('covers', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('hour'),
+    )
+    # backfill with: python -m scripts.refresh_rollups --all
+
+
+def downgrade():
+    op.drop_table('sales_hourly')
+    op.drop_index('ix_sales_category_daily_category_day', table_name='sales_category_daily')
+    op.drop_table('sales_category_daily')
+    op.drop_index('ix_sales_item_daily_item_day', table_name='sales_item_daily')
+    op.drop_table('sales_item_daily')
@@ -0,0 +1,41 @@
+"""Shared fixtures: one app on a seeded throwaway SQLite database per test run.
+
+The seed is the one ``scripts/check_query_plans.py`` uses, so plans, query
+budgets and the reservation checks see the same data as the scripts. The
+catalog, pricing and reservation caches are module-level, so every test
+shares the one app rather than each building its own database.
+"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+os.environ['QUERY_BUDGET_MODE'] = 'raise'
+
+# importing check_query_plans points DATABASE_URL at a throwaway SQLite file
+from scripts.check_query_plans import seed  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+from backend.app import create_app, db  # noqa: E402
+
+SEED_ORDERS = 20000
+
+
+@pytest.fixture(scope='session')
+def app():
+    app = create_app()
+    app.testing = True
+    with app.app_context():
+        # bookings come from many threads at once in the contention tests
+        @event.listens_for(db.engine, 'connect')
+        def _sqlite_pragmas(dbapi_conn, _record):
+            dbapi_conn.execute('PRAGMA journal_mode=WAL')
+            dbapi_conn.execute('PRAGMA busy_timeout=30000')
+
+        db.engine.dispose()
+        db.create_all()
+        seed(SEED_ORDERS)
+    yield app
@@ -0,0 +1,48 @@
+import os
+import subprocess
+import sys
+from datetime import datetime
+
+from backend.app.hooks import sync
+from backend.app.reservations import allocator, availability
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+
+def _book(client, slot, n):
+    resp = client.post('/api/reservations', json={
+        'name': f'Sync {n}', 'email': f'sync{n}@example.com', 'guests': 2, 'time_slot': slot.isoformat(),
+    })
+    assert resp.status_code == 201, resp.get_json()
+
+
+def test_own_commits_keep_the_reservation_caches(client):
+    slot = datetime(2030, 7, 1, 19, 0)
+    other_day = datetime(2030, 7, 8).date()
+    _book(client, slot, 1)
+    availability.get(other_day)
+    sync(force=True)
+    _book(client, slot, 2)
+    sync(force=True)
+    # the commit hooks updated the slot and dropped only the booked day;
+    # sync must not throw the rest away
+    assert slot in allocator._slots
+    assert other_day in availability._days
+
+
+def test_other_processes_commits_reset_the_caches(app, client):
+    slot = datetime(2030, 7, 2, 19, 0)
+    _book(client, slot, 3)
+    availability.get(slot.date())
+    sync(force=True)
+    subprocess.run([sys.executable, '-c', f'''
+from datetime import datetime
+from backend.app import create_app, db
+from backend.app.models import Reservation
+with create_app().app_context():
+    db.session.add(Reservation(customer_id=1, time_slot=datetime({slot.year}, {slot.month}, {slot.day}, 20), table_number=1, guests=2))
+    db.session.commit()
+'''], check=True, cwd=ROOT)
+    sync(force=True)
+    assert slot not in allocator._slots
+    assert slot.date() not in availability._days
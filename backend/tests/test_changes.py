@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend.app import changes, db
+from backend.app.models import ChangeLog
+from scripts.check_query_plans import ADMIN
+
+
+@pytest.fixture
+def log_rows(app):
+    """Insert change_log rows at ``newest seq + offset``; removed again afterwards."""
+    base = db.session.query(db.func.max(ChangeLog.seq)).scalar() or 0
+    added = []
+
+    def add(offset, age=timedelta(0)):
+        seq = base + offset
+        db.session.add(ChangeLog(
+            seq=seq, entity='category', entity_id=0, op='delete',
+            changed_at=datetime.utcnow() - age,
+        ))
+        db.session.commit()
+        added.append(seq)
+        return seq
+
+    yield base, add
+    ChangeLog.query.filter(ChangeLog.seq.in_(added)).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def _poll(client, since):
+    return client.get('/api/admin/changes', query_string={'since': since}, headers=ADMIN)
+
+
+def test_cursor_waits_at_a_young_gap(client, log_rows):
+    base, add = log_rows
+    first = add(1)
+    # base + 2 is still in flight in another transaction
+    after_gap = add(3)
+
+    body = _poll(client, base).get_json()
+    assert [c['seq'] for c in body['changes']] == [first]
+    assert body['next'] == first
+
+    # once the row after the gap is old enough, the missing number was rolled back
+    ChangeLog.query.filter_by(seq=after_gap).update(
+        {'changed_at': datetime.utcnow() - timedelta(seconds=changes.GAP_SECONDS + 1)})
+    db.session.commit()
+    body = _poll(client, first).get_json()
+    assert [c['seq'] for c in body['changes']] == [after_gap]
+
+
+def test_prune_keeps_the_newest_row_and_expires_old_cursors(client, log_rows):
+    base, add = log_rows
+    old = datetime.utcnow() - timedelta(days=changes.RETENTION_DAYS + 1)
+    # age the whole log, as if nothing had been written for a while
+    ChangeLog.query.update({'changed_at': old})
+    db.session.commit()
+    stale = [add(n, timedelta(days=changes.RETENTION_DAYS + 1)) for n in (1, 2, 3)]
+    # the newest row survives so the head doesn't go backwards
+    changes.prune()
+    assert [seq for (seq,) in db.session.query(ChangeLog.seq)] == [stale[-1]]
+
+    newest = add(4, timedelta(seconds=changes.GAP_SECONDS + 1))
+    assert changes.prune() == 1
+    assert [seq for (seq,) in db.session.query(ChangeLog.seq)] == [newest]
+
+    assert _poll(client, base).status_code == 410
+    assert _poll(client, stale[0]).status_code == 410
+    body = _poll(client, stale[-1]).get_json()
+    assert [c['seq'] for c in body['changes']] == [newest]
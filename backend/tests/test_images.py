@@ -0,0 +1,57 @@
+import io
+import time
+
+import pytest
+
+from backend.app import api, images
+
+Image = pytest.importorskip('PIL.Image')
+
+
+@pytest.fixture
+def images_dir(tmp_path, monkeypatch):
+    variants = tmp_path / 'variants'
+    for module in (api, images):
+        monkeypatch.setattr(module, 'IMAGES_DIR', str(tmp_path))
+        monkeypatch.setattr(module, 'VARIANTS_DIR', str(variants))
+    return tmp_path
+
+
+def _jpeg(width=800, height=600):
+    buf = io.BytesIO()
+    Image.new('RGB', (width, height), (200, 80, 40)).save(buf, 'JPEG')
+    buf.seek(0)
+    return buf
+
+
+def test_original_standing_in_for_a_variant_is_not_cached_for_long(client, images_dir):
+    filename, _created = images.store_stream(_jpeg(), 'jpg', str(images_dir))
+
+    resp = client.get(f'/api/images/{filename}?w=320')
+    assert resp.status_code == 200
+    assert 'immutable' not in resp.headers['Cache-Control']
+    assert f'max-age={images.VARIANT_PENDING_MAX_AGE}' in resp.headers['Cache-Control']
+
+    # the request scheduled the variant; once built, it's served for good
+    deadline = time.monotonic() + 10
+    while filename in images._pending and time.monotonic() < deadline:
+        time.sleep(0.01)
+    resp = client.get(f'/api/images/{filename}?w=320', headers={'Accept': 'image/webp'})
+    assert resp.status_code == 200
+    assert resp.mimetype == 'image/webp'
+    assert 'immutable' in resp.headers['Cache-Control']
+
+
+def test_original_is_immutable(client, images_dir):
+    filename, _created = images.store_stream(_jpeg(), 'jpg', str(images_dir))
+    resp = client.get(f'/api/images/{filename}')
+    assert resp.status_code == 200
+    assert 'immutable' in resp.headers['Cache-Control']
+
+
+def test_stored_upload_is_readable_by_the_front_proxy(images_dir, monkeypatch):
+    # what a umask of 022 gives; mkstemp alone would leave 0600
+    monkeypatch.setattr(images, 'FILE_MODE', 0o644)
+    filename, created = images.store_stream(_jpeg(), 'jpg', str(images_dir))
+    assert created
+    assert (images_dir / filename).stat().st_mode & 0o777 == 0o644
@@ -0,0 +1,51 @@
+import pytest
+
+from backend.app import db
+from backend.app.intake import OrderIntake
+from backend.app.models import Order, OrderItem
+from backend.app.pricing import quote
+
+
+@pytest.fixture
+def queue_path(tmp_path):
+    return str(tmp_path / 'order-intake.db')
+
+
+def _submit(intake, n):
+    priced = quote([{'menu_item_id': 20 + n % 5, 'qty': 1 + n % 3}])
+    return intake.submit(f'Queued {n}', None, None, priced)
+
+
+def _stored(references):
+    return db.session.query(Order.reference).filter(Order.reference.in_(references)).count()
+
+
+def test_queued_orders_survive_a_restart(app, queue_path):
+    references = [_submit(OrderIntake(queue_path), n) for n in range(5)]
+    assert _stored(references) == 0
+
+    restarted = OrderIntake(queue_path)
+    assert restarted.pending() == 5
+    assert restarted.drain_once() == 5
+    assert restarted.pending() == 0
+    assert _stored(references) == 5
+    assert all(restarted.queued(r) is None for r in references)
+
+
+def test_batch_committed_before_a_crash_is_not_inserted_twice(app, queue_path):
+    intake = OrderIntake(queue_path, batch_size=10)
+    references = [_submit(intake, n) for n in range(4)]
+    # the batch lands in the database, then the process dies before the
+    # queue rows are removed
+    intake._store(intake._next_batch())
+    assert _stored(references) == 4
+    assert intake.pending() == 4
+
+    restarted = OrderIntake(queue_path, batch_size=10)
+    late = _submit(restarted, 99)
+    assert restarted.drain_once() == 5
+    assert restarted.pending() == 0
+    assert _stored(references) == 4
+    assert _stored([late]) == 1
+    order_ids = [i for (i,) in db.session.query(Order.id).filter(Order.reference.in_(references))]
+    assert db.session.query(OrderItem).filter(OrderItem.order_id.in_(order_ids)).count() == 4
@@ -0,0 +1,46 @@
+import json
+
+import pytest
+
+from backend.app import db
+from backend.app.menu_io import MenuImportError, export_csv, export_json, import_menu, parse_csv
+from backend.app.models import MenuItem
+
+
+@pytest.fixture
+def uncategorized(app):
+    item = MenuItem(name='Round trip special', price_cents=1250, available=True, category_id=None)
+    db.session.add(item)
+    db.session.commit()
+    yield item
+    db.session.delete(item)
+    db.session.commit()
+
+
+def test_json_export_imports_back_unchanged(uncategorized):
+    exported = json.loads(''.join(export_json()))
+    row = next(r for r in exported['items'] if r['id'] == uncategorized.id)
+    assert row['category_id'] is None and row['category'] is None
+
+    counts = import_menu(exported, dry_run=True)
+    assert counts['items'] == {'created': 0, 'updated': 0, 'unchanged': len(exported['items'])}
+    assert counts['categories']['created'] == counts['categories']['updated'] == 0
+
+
+def test_csv_export_imports_back_unchanged(uncategorized):
+    batch = parse_csv(''.join(export_csv()))
+    counts = import_menu(batch, dry_run=True)
+    assert counts['items'] == {'created': 0, 'updated': 0, 'unchanged': len(batch['items'])}
+
+
+def test_null_category_uncategorizes_an_item(app):
+    item = db.session.get(MenuItem, 10)
+    assert item.category_id is not None
+    counts = import_menu({'items': [{'id': 10, 'category_id': None}]}, dry_run=True)
+    assert counts['items']['updated'] == 1
+
+
+def test_bad_category_is_reported_under_category():
+    with pytest.raises(MenuImportError) as e:
+        import_menu({'items': [{'name': 'x', 'price_cents': 1, 'category': 'c' * 500}]}, dry_run=True)
+    assert [err['field'] for err in e.value.errors] == ['category']
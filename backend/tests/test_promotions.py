@@ -0,0 +1,88 @@
+from datetime import datetime, time
+
+import pytest
+from sqlalchemy import event
+
+from backend.app import db
+from backend.app.models import MenuItem, Promotion
+from backend.app.promotions import schedule
+
+# 2030-06-07 is a Friday
+FRIDAY = datetime(2030, 6, 7)
+FRIDAY_ONLY = 1 << 4
+WEEKDAYS = 0b11111
+
+
+def at(day_offset, hour, minute=0):
+    return FRIDAY.replace(day=FRIDAY.day + day_offset, hour=hour, minute=minute)
+
+
+@pytest.fixture
+def promotions(app):
+    created = []
+
+    def add(**fields):
+        promo = Promotion(active=True, **fields)
+        db.session.add(promo)
+        db.session.commit()
+        created.append(promo)
+        return promo
+
+    yield add
+    for promo in created:
+        db.session.delete(promo)
+    db.session.commit()
+
+
+def discount(item_id, now):
+    return schedule.current(now)[1].get(item_id)
+
+
+def test_window_crossing_midnight_belongs_to_the_day_it_opened(promotions):
+    promotions(menu_item_id=8, percent=30, daily_start=time(22), daily_end=time(2), weekdays=FRIDAY_ONLY)
+    assert discount(8, at(0, 21, 59)) is None
+    assert discount(8, at(0, 23)) == 30
+    # Saturday morning is still Friday night's window
+    assert discount(8, at(1, 1, 30)) == 30
+    assert discount(8, at(1, 2)) is None
+    assert discount(8, at(1, 23)) is None
+    # Friday's early hours are the tail of Thursday's window, which doesn't open
+    assert discount(8, at(0, 1)) is None
+
+
+def test_weekday_mask_limits_a_daily_window(promotions):
+    promotions(menu_item_id=9, percent=20, daily_start=time(15), daily_end=time(17), weekdays=WEEKDAYS)
+    assert discount(9, at(3, 16)) == 20      # Monday
+    assert discount(9, at(0, 16)) == 20      # Friday
+    assert discount(9, at(1, 16)) is None    # Saturday
+    assert discount(9, at(3, 17)) is None    # end is exclusive
+    assert discount(9, at(3, 14, 59)) is None
+
+
+def test_item_promotion_beats_its_category(promotions):
+    category_id = db.session.get(MenuItem, 12).category_id
+    promotions(category_id=category_id, percent=10, daily_start=time(12), daily_end=time(14))
+    promotions(menu_item_id=12, percent=40)
+    assert discount(12, at(0, 13)) == 40
+    sibling = db.session.query(MenuItem.id).filter(MenuItem.category_id == category_id, MenuItem.id != 12,
+                                                    MenuItem.id.notin_(range(1, 501, 10))).first()[0]
+    assert discount(sibling, at(0, 13)) == 10
+    assert discount(sibling, at(0, 14)) is None
+
+
+def test_crossing_a_boundary_does_not_query(promotions):
+    promotions(menu_item_id=13, percent=25, daily_start=time(18), daily_end=time(19))
+    token, _ = schedule.current(at(0, 17))
+    statements = []
+
+    def listener(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        next_token, discounts = schedule.current(at(0, 18, 30))
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    assert discounts.get(13) == 25
+    assert next_token != token
+    assert statements == []
@@ -0,0 +1,18 @@
+import pytest
+
+from scripts.check_query_budgets import calls
+from backend.app.query_budget import QueryBudgetExceeded, assert_budgets
+
+
+def test_routes_stay_within_budget(client):
+    results = assert_budgets(client, calls())
+    # every call was counted, and the routes that declare a budget were checked
+    assert len(results) == len(calls())
+    assert any(budget is not None for _method, _url, _count, budget in results)
+
+
+def test_over_budget_raises(app, client, monkeypatch):
+    view = app.view_functions['api.list_menu']
+    monkeypatch.setattr(view, 'query_budget', -1, raising=False)
+    with pytest.raises(QueryBudgetExceeded):
+        assert_budgets(client, [('GET', '/api/menu', {})])
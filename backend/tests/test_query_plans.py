@@ -0,0 +1,18 @@
+from scripts.check_query_plans import ALWAYS_SCANNABLE, capture_plans, cases, problems
+
+
+def test_endpoints_use_indexes(client):
+    failures = []
+    for label, call, extra in cases(client):
+        for statement, plan in capture_plans(call):
+            failures.extend(f'{label}: {p}: {" ".join(statement.split())[:120]}'
+                            for p in problems(plan, statement, ALWAYS_SCANNABLE | extra))
+    assert not failures, '\n'.join(failures)
+
+
+def test_problems_flags_scans_and_unindexed_pages():
+    assert problems(['SCAN orders'], 'SELECT * FROM orders', set()) == ['full scan of orders']
+    assert problems(['SCAN orders'], 'SELECT * FROM orders', {'orders'}) == []
+    assert problems(['SCAN orders USING INDEX ix_orders_created_at'], 'SELECT * FROM orders', set()) == []
+    assert problems(['USE TEMP B-TREE FOR ORDER BY'], 'SELECT * FROM orders ORDER BY x LIMIT 10', set())
+    assert problems(['USE TEMP B-TREE FOR ORDER BY'], 'SELECT * FROM orders ORDER BY x', set()) == []
@@ -0,0 +1,65 @@
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from sqlalchemy import event, func, insert
+
+from backend.app import db
+from backend.app.models import Customer, Reservation
+from backend.app.reservations import TOTAL_TABLES, allocator
+
+
+def test_parallel_bookings_never_share_a_table(app):
+    slot = '2030-06-01T19:30'
+
+    def book(n):
+        # a client per call: test clients keep per-thread context state
+        resp = app.test_client().post('/api/reservations', json={
+            'name': f'Guest {n}', 'email': f'contention{n}@example.com', 'guests': 2, 'time_slot': slot,
+        })
+        return resp.status_code, (resp.get_json() or {}).get('table_number')
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(book, range(TOTAL_TABLES * 3)))
+
+    statuses = Counter(status for status, _ in results)
+    tables = [table for status, table in results if status == 201]
+    assert statuses == {201: TOTAL_TABLES, 409: TOTAL_TABLES * 2}
+    assert sorted(tables) == list(range(1, TOTAL_TABLES + 1))
+    stored = db.session.query(func.count(Reservation.id)).filter(
+        Reservation.time_slot == datetime.fromisoformat(slot)).scalar()
+    assert stored == TOTAL_TABLES
+
+
+def test_lost_insert_reloads_the_slot(app):
+    slot = datetime(2030, 6, 2, 19, 30)
+    customer = Customer(name='Stale cache', email='stale@example.com')
+    db.session.add(customer)
+    db.session.commit()
+    assert allocator.allocate(customer.id, slot, 2) is not None
+    db.session.commit()
+    taken = db.session.query(Reservation.table_number).filter(Reservation.time_slot == slot).scalar()
+
+    # another worker books all but two tables; this process's bitmap doesn't know
+    others = [n for n in range(1, TOTAL_TABLES + 1) if n != taken][:-2]
+    db.session.execute(insert(Reservation), [
+        {'customer_id': customer.id, 'time_slot': slot, 'table_number': n, 'guests': 2} for n in others
+    ])
+    db.session.commit()
+
+    inserts = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('INSERT INTO RESERVATIONS'):
+            inserts.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', count)
+    try:
+        booked = [allocator.allocate(customer.id, slot, 2) for _ in range(3)]
+        db.session.commit()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count)
+
+    assert [r is not None for r in booked] == [True, True, False]
+    # at most one INSERT lost to the stale bitmap before the slot was reread
+    assert len(inserts) <= 3
@@ -1,22 +1,41 @@
 import React, { useEffect, useState } from 'react'
 
-function useAdminFetch(path, adminSecret) {
+function adminRequest(path, adminSecret) {
   return fetch(path, { headers: { 'X-Admin-Secret': adminSecret } }).then(async (r) => {
     if (!r.ok) {
       const err = await r.json().catch(() => ({}))
       throw new Error(err.error || `HTTP ${r.status}`)
     }
-    return r.json()
+    return r
   })
 }
 
+function useAdminFetch(path, adminSecret) {
+  return adminRequest(path, adminSecret).then((r) => r.json())
+}
+
+// one page of a paginated admin listing; the cursor for the next page (if any)
+// comes back in the X-Next-Cursor header
+function fetchAdminPage(path, adminSecret, cursor) {
+  const url = cursor ? `${path}${path.includes('?') ? '&' : '?'}cursor=${encodeURIComponent(cursor)}` : path
+  return adminRequest(url, adminSecret).then(async (r) => ({ rows: await r.json(), next: r.headers.get('X-Next-Cursor') }))
+}
+
+// append a page, skipping rows already shown (e.g. pushed by the live stream)
+function appendPage(prev, rows) {
+  const seen = new Set(prev.map((row) => row.id))
+  return [...prev, ...rows.filter((row) => !seen.has(row.id))]
+}
+
 export default function AdminDashboard() {
   const [adminSecret, setAdminSecret] = useState(localStorage.getItem('admin_secret') || '')
   const [tab, setTab] = useState('orders')
   const [orders, setOrders] = useState([])
+  const [ordersNext, setOrdersNext] = useState(null)
   const [menuItems, setMenuItems] = useState([])
   const [categories, setCategories] = useState([])
   const [reservations, setReservations] = useState([])
+  const [reservationsNext, setReservationsNext] = useState(null)
   const [promotions, setPromotions] = useState([])
   const [error, setError] = useState(null)
   const [editingItem, setEditingItem] = useState(null)
@@ -43,13 +62,9 @@ export default function AdminDashboard() {
       .catch(() => {})
 
     if (tab === 'orders') {
-      useAdminFetch('/api/admin/orders', adminSecret)
-        .then(setOrders)
-        .catch((e) => setError(e.message))
+      loadOrders()
     } else if (tab === 'reservations') {
-      useAdminFetch('/api/admin/reservations', adminSecret)
-        .then(setReservations)
-        .catch((e) => setError(e.message))
+      loadReservations()
     } else if (tab === 'menu') {
       useAdminFetch('/api/admin/menu_items', adminSecret)
         .then(setMenuItems)
@@ -86,6 +101,43 @@ export default function AdminDashboard() {
     }
   }, [tab, adminSecret])
 
+  // live updates for the orders tab instead of re-polling the listing
+  useEffect(() => {
+    if (!adminSecret || tab !== 'orders') return
+    const source = new EventSource(`/api/admin/orders/stream?admin_secret=${encodeURIComponent(adminSecret)}`)
+    const upsert = (e) => {
+      const order = JSON.parse(e.data)
+      setOrders((prev) => [order, ...prev.filter((o) => o.id !== order.id)])
+    }
+    source.addEventListener('order', upsert)
+    source.addEventListener('order_status', (e) => {
+      const order = JSON.parse(e.data)
+      setOrders((prev) => prev.map((o) => (o.id === order.id ? order : o)))
+    })
+    // missed too much while disconnected: reload the first page once
+    source.addEventListener('reset', () => loadOrders())
+    return () => source.close()
+  }, [tab, adminSecret])
+
+  // first page when cursor is empty, otherwise the page after it
+  function loadOrders(cursor) {
+    return fetchAdminPage('/api/admin/orders', adminSecret, cursor)
+      .then(({ rows, next }) => {
+        setOrders((prev) => (cursor ? appendPage(prev, rows) : rows))
+        setOrdersNext(next)
+      })
+      .catch((e) => setError(e.message))
+  }
+
+  function loadReservations(cursor) {
+    return fetchAdminPage('/api/admin/reservations', adminSecret, cursor)
+      .then(({ rows, next }) => {
+        setReservations((prev) => (cursor ? appendPage(prev, rows) : rows))
+        setReservationsNext(next)
+      })
+      .catch((e) => setError(e.message))
+  }
+
   function promptForSecret() {
     const s = window.prompt('Enter admin secret (dev)')
     if (s) {
@@ -272,9 +324,29 @@ export default function AdminDashboard() {
     }
   }
 
-  async function deletePromo(promo) {
+  // what a promotion applies to: one item or a whole category
+  function promoTarget(promo) {
+    if (promo.category_id) {
+      const cat = categories.find((c) => c.id === promo.category_id)
+      return `All ${cat ? cat.name : `category ${promo.category_id}`}`
+    }
     const item = menuItems.find((m) => m.id === promo.menu_item_id)
-    const itemName = item ? item.name : `item ${promo.menu_item_id}`
+    return item ? item.name : `item ${promo.menu_item_id}`
+  }
+
+  // when a promotion runs, e.g. "Mon Tue Wed Thu Fri, 15:00–17:00, from 2026-12-01 00:00"
+  function promoWindow(promo) {
+    const DAYS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+    const parts = []
+    if (promo.weekdays) parts.push(promo.weekdays.map((d) => DAYS[d]).join(' '))
+    if (promo.daily_start) parts.push(`${promo.daily_start}–${promo.daily_end}`)
+    if (promo.starts_at) parts.push(`from ${promo.starts_at.replace('T', ' ').slice(0, 16)}`)
+    if (promo.ends_at) parts.push(`until ${promo.ends_at.replace('T', ' ').slice(0, 16)}`)
+    return parts.length ? parts.join(', ') : 'always'
+  }
+
+  async function deletePromo(promo) {
+    const itemName = promoTarget(promo)
     if (!window.confirm(`Delete promotion for "${itemName}"?`)) return
     try {
       await fetchAdmin(`/api/admin/promotions/${promo.id}`, { method: 'DELETE' })
@@ -289,11 +361,23 @@ export default function AdminDashboard() {
     e.preventDefault()
     const form = e.target
     const menu_item_id = parseInt(form.menu_item_id.value, 10)
+    const category_id = parseInt(form.category_id.value, 10)
     const percent = parseInt(form.percent.value, 10)
     const active = form.active.checked
-    if (!menu_item_id || isNaN(percent)) return setError('invalid inputs')
+    if (!menu_item_id === !category_id || isNaN(percent)) return setError('pick an item or a category, and a percent')
+    const body = { percent, active }
+    if (menu_item_id) body.menu_item_id = menu_item_id
+    else body.category_id = category_id
+    // optional windows, in restaurant local time
+    if (form.daily_start.value && form.daily_end.value) {
+      body.daily_start = form.daily_start.value
+      body.daily_end = form.daily_end.value
+    }
+    if (form.weekdays_only.checked) body.weekdays = [0, 1, 2, 3, 4]
+    if (form.starts_at.value) body.starts_at = form.starts_at.value
+    if (form.ends_at.value) body.ends_at = form.ends_at.value
     try {
-      await fetchAdmin('/api/admin/promotions', { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify({ menu_item_id, percent, active }) })
+      await fetchAdmin('/api/admin/promotions', { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify(body) })
       const promos = await useAdminFetch('/api/admin/promotions', adminSecret)
       setPromotions(promos)
       form.reset()
@@ -341,6 +425,7 @@ export default function AdminDashboard() {
                   </li>
                 ))}
               </ul>
+              {ordersNext && <button onClick={() => loadOrders(ordersNext)}>Load more orders</button>}
             </div>
           )}
 
@@ -389,6 +474,9 @@ export default function AdminDashboard() {
                   ))}
                 </tbody>
               </table>
+              {reservationsNext && (
+                <button onClick={() => loadReservations(reservationsNext)} style={{ marginTop: 8 }}>Load more reservations</button>
+              )}
             </div>
           )}
 
@@ -548,18 +636,18 @@ export default function AdminDashboard() {
                   <tr>
                     <th>Item</th>
                     <th>Discount %</th>
+                    <th>When</th>
                     <th>Active</th>
                     <th></th>
                   </tr>
                 </thead>
                 <tbody>
                   {promotions.map((p) => {
-                    const item = menuItems.find((m) => m.id === p.menu_item_id)
-                    const itemName = item ? item.name : `item ${p.menu_item_id}`
                     return (
                       <tr key={p.id}>
-                        <td>{itemName}</td>
+                        <td>{promoTarget(p)}</td>
                         <td>{p.percent}%</td>
+                        <td>{promoWindow(p)}</td>
                         <td>{p.active ? 'yes' : 'no'}</td>
                         <td style={{ display: 'flex', gap: 8 }}>
                           <button onClick={() => togglePromoActive(p)}>{p.active ? 'Disable' : 'Enable'}</button>
@@ -572,19 +660,33 @@ export default function AdminDashboard() {
                 </tbody>
               </table>
 
-              <h4 style={{ marginTop: 12 }}>Create promotion for item</h4>
+              <h4 style={{ marginTop: 12 }}>Create promotion for an item or a whole category</h4>
               <form onSubmit={createPromo}>
                 <div>
-                  <select name="menu_item_id" required>
+                  <select name="menu_item_id">
                     <option value="">-- select item --</option>
                     {menuItems.map((m) => (
                       <option key={m.id} value={m.id}>{m.name} — ${(m.price_cents / 100).toFixed(2)}</option>
                     ))}
                   </select>
+                  {' or '}
+                  <select name="category_id">
+                    <option value="">-- select category --</option>
+                    {categories.map((c) => (
+                      <option key={c.id} value={c.id}>{c.name}</option>
+                    ))}
+                  </select>
                 </div>
                 <div>
                   <input name="percent" type="number" min="0" max="100" placeholder="Discount %" required />
                 </div>
+                <div>
+                  Daily <input name="daily_start" type="time" /> to <input name="daily_end" type="time" />
+                  <label style={{ marginLeft: 8 }}><input name="weekdays_only" type="checkbox" /> Weekdays only</label>
+                </div>
+                <div>
+                  From <input name="starts_at" type="datetime-local" /> until <input name="ends_at" type="datetime-local" />
+                </div>
                 <div><label><input name="active" type="checkbox" defaultChecked /> Active</label></div>
                 <div style={{ marginTop: 8 }}>
                   <button type="submit">Create</button>
@@ -0,0 +1,112 @@
+"""
+scripts/bench_catalog.py
+
+Measure per-request CPU time of GET /api/menu on a 500-item menu, comparing the
+original per-category query + jsonify handler with the pre-encoded catalog
+snapshot (identity, gzip and, if installed, brotli).
+
+Usage:
+  python -m scripts.bench_catalog [--items 500] [--requests 2000]
+
+Runs against an in-memory SQLite database, so it does not touch DATABASE_URL.
+"""
+import argparse
+import os
+import time
+
+os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
+
+from flask import jsonify
+from backend.app import create_app, db
+from backend.app.models import Category, MenuItem, Promotion
+from backend.app.responses import brotli
+
+
+def legacy_list_menu():
+    # the handler as it was before the catalog snapshot
+    categories = Category.query.order_by(Category.position).all()
+    active_promos = {p.menu_item_id: p.percent for p in Promotion.query.filter_by(active=True).all()}
+    result = []
+    for c in categories:
+        items = MenuItem.query.filter_by(category_id=c.id).all()
+        result.append({
+            'id': c.id,
+            'name': c.name,
+            'items': [
+                {
+                    'id': i.id,
+                    'name': i.name,
+                    'description': i.description,
+                    'price_cents': i.price_cents,
+                    'available': i.available,
+                    'image_filename': i.image_filename,
+                    'discount_percent': active_promos.get(i.id),
+                }
+                for i in items
+            ]
+        })
+    return jsonify({'categories': result, 'promotions': list(active_promos.items())})
+
+
+def seed(n_items, n_categories=20):
+    cats = [Category(name=f'Category {n}', position=n) for n in range(n_categories)]
+    db.session.add_all(cats)
+    db.session.flush()
+    items = [
+        MenuItem(
+            name=f'Item {n}',
+            description='A reasonably long description of a dish that is served here. ' * 2,
+            image_filename=f'{n:040x}.jpg',
+            price_cents=250 + n,
+            available=True,
+            category_id=cats[n % n_categories].id,
+        )
+        for n in range(n_items)
+    ]
+    db.session.add_all(items)
+    db.session.flush()
+    db.session.add_all([Promotion(menu_item_id=i.id, percent=10) for i in items[::10]])
+    db.session.commit()
+
+
+def run(client, url, n, headers=None):
+    client.get(url, headers=headers)  # warm up / build caches
+    size = len(client.get(url, headers=headers).data)
+    cpu = time.process_time()
+    wall = time.perf_counter()
+    for _ in range(n):
+        client.get(url, headers=headers)
+    cpu = (time.process_time() - cpu) / n
+    wall = (time.perf_counter() - wall) / n
+    return cpu, wall, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=500)
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    app = create_app()
+    app.add_url_rule('/bench/legacy_menu', 'legacy_menu', legacy_list_menu)
+    with app.app_context():
+        db.create_all()
+        seed(args.items)
+        client = app.test_client()
+        cases = [
+            ('before: queries + jsonify', '/bench/legacy_menu', None),
+            ('after: identity', '/api/menu', None),
+            ('after: gzip', '/api/menu', {'Accept-Encoding': 'gzip'}),
+            ('after: 304 revalidation', '/api/menu', {'If-None-Match': client.get('/api/menu').headers['ETag']}),
+        ]
+        if brotli is not None:
+            cases.insert(3, ('after: br', '/api/menu', {'Accept-Encoding': 'br, gzip'}))
+        print(f'{args.items} menu items, {args.requests} requests per case')
+        print(f'{"case":<28}{"cpu ms/req":>12}{"wall ms/req":>13}{"bytes":>10}')
+        for label, url, headers in cases:
+            cpu, wall, size = run(client, url, args.requests, headers)
+            print(f'{label:<28}{cpu * 1000:>12.3f}{wall * 1000:>13.3f}{size:>10}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+scripts/bench_checkout.py
+
+Compare the original per-line checkout with the batched checkout: SQL
+statements per order and orders per second for a 15-line group order.
+
+Usage:
+  python -m scripts.bench_checkout [--orders 500] [--lines 15]
+
+Uses a throwaway SQLite file so commits hit the disk like a real database.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+_tmpdir = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_tmpdir, 'bench_checkout.db')
+
+from flask import jsonify, request
+from sqlalchemy import event
+from backend.app import create_app, db
+from backend.app.models import Category, MenuItem, Order, OrderItem
+
+
+def legacy_checkout():
+    # the handler as it was before batching
+    data = request.get_json() or {}
+    items = data.get('items', [])
+    total = 0
+    order = Order(customer_name=data.get('customer_name'), status='pending')
+    db.session.add(order)
+    db.session.flush()
+    for it in items:
+        mi = MenuItem.query.get(it.get('menu_item_id'))
+        if not mi:
+            db.session.rollback()
+            return jsonify({'error': 'not found'}), 400
+        qty = int(it.get('qty', 1))
+        total += mi.price_cents * qty
+        db.session.add(OrderItem(order_id=order.id, menu_item_id=mi.id, qty=qty, unit_price_cents=mi.price_cents))
+    order.total_cents = total
+    db.session.commit()
+    return jsonify({'order_id': order.id, 'status': order.status})
+
+
+def run(client, url, payload, n, counter):
+    client.post(url, json=payload)  # warm up
+    counter[0] = 0
+    start = time.perf_counter()
+    for _ in range(n):
+        resp = client.post(url, json=payload)
+        assert resp.status_code == 200, resp.get_json()
+    elapsed = time.perf_counter() - start
+    return n / elapsed, counter[0] / n
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--orders', type=int, default=500)
+    parser.add_argument('--lines', type=int, default=15)
+    args = parser.parse_args()
+
+    app = create_app()
+    app.add_url_rule('/bench/legacy_checkout', 'legacy_checkout', legacy_checkout, methods=['POST'])
+    with app.app_context():
+        db.create_all()
+        cat = Category(name='Lunch', position=1)
+        db.session.add(cat)
+        db.session.flush()
+        items = [MenuItem(name=f'Item {n}', price_cents=500 + n, available=True, category_id=cat.id) for n in range(50)]
+        db.session.add_all(items)
+        db.session.commit()
+
+        counter = [0]
+
+        def count(*_args):
+            counter[0] += 1
+        event.listen(db.engine, 'before_cursor_execute', count)
+
+        payload = {
+            'customer_name': 'Group order',
+            'items': [{'menu_item_id': items[n].id, 'qty': 1 + n % 3} for n in range(args.lines)],
+        }
+        client = app.test_client()
+        print(f'{args.orders} orders of {args.lines} lines each')
+        print(f'{"case":<12}{"orders/s":>10}{"statements/order":>18}')
+        for label, url in (('before', '/bench/legacy_checkout'), ('after', '/api/cart/checkout')):
+            rate, stmts = run(client, url, payload, args.orders, counter)
+            print(f'{label:<12}{rate:>10.1f}{stmts:>18.1f}')
+
+
+if __name__ == '__main__':
+    main()
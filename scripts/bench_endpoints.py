@@ -0,0 +1,232 @@
+"""
+scripts/bench_endpoints.py
+
+Endpoint benchmark suite. Builds a production-sized synthetic dataset
+(hundreds of menu items, a large order history with ~3 lines per order, a
+year of reservations), then drives every public and admin route through the
+Flask test client and reports per endpoint: p50/p95/p99 and mean latency,
+throughput (requests/s, single thread) and peak RSS. Results are written as
+JSON; with --baseline the run is compared against a saved result and exits 1
+when an endpoint's p95 regressed by more than --tolerance.
+
+Usage:
+  python -m scripts.bench_endpoints [--orders 200000] [--requests 200]
+      [--out bench-results.json] [--baseline bench-baseline.json]
+      [--tolerance 0.25] [--only admin] [--database-url URL]
+
+Without --database-url the dataset goes into a throwaway SQLite file. Pass an
+existing database (already seeded) to benchmark against it instead; writes
+(checkout, reservations, promotions) are then skipped unless --writes.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+
+def _rss_mb():
+    # current resident set size, from /proc where available
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError):
+        return None
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+
+def endpoints(client, admin, writes):
+    """(name, callable) pairs; each callable issues one request."""
+    today = datetime.utcnow().date()
+    first = client.get('/api/admin/orders', headers=admin)
+    cursor = first.headers.get('X-Next-Cursor')
+    gallery = client.get('/api/gallery').get_json() or []
+    image = gallery[0] if gallery else None
+    counter = iter(range(10 ** 9))
+
+    def book():
+        # a fresh table each time: TOTAL_TABLES bookings per future day
+        n = next(counter)
+        slot = datetime.combine(today + timedelta(days=30 + n // 30), datetime.min.time()).replace(hour=18)
+        return client.post('/api/reservations', json={
+            'name': 'Bench', 'email': f'bench{n}@example.com', 'time_slot': slot.isoformat()})
+
+    menu = client.get('/api/menu').get_json() or {'categories': []}
+    available = [i['id'] for c in menu['categories'] for i in c['items'] if i['available']]
+    cart = {'items': [{'menu_item_id': n, 'qty': 1 + n % 3} for n in available[:8]]}
+
+    cases = [
+        ('GET /api/menu', lambda: client.get('/api/menu')),
+        ('GET /api/menu (gzip)', lambda: client.get('/api/menu', headers={'Accept-Encoding': 'gzip'})),
+        ('GET /api/', lambda: client.get('/api/')),
+        ('GET /api/gallery', lambda: client.get('/api/gallery')),
+        ('GET /api/gallery/index', lambda: client.get('/api/gallery/index?limit=24')),
+        ('GET /api/reservations/availability', lambda: client.get(f'/api/reservations/availability?date={today}&days=7')),
+        ('POST /api/cart/quote', lambda: client.post('/api/cart/quote', json=cart)),
+        ('GET /api/orders/<reference>', lambda: client.get(f'/api/orders/{1:032x}')),
+        ('GET /api/admin/menu_items', lambda: client.get('/api/admin/menu_items', headers=admin)),
+        ('GET /api/admin/categories', lambda: client.get('/api/admin/categories', headers=admin)),
+        ('GET /api/admin/promotions', lambda: client.get('/api/admin/promotions', headers=admin)),
+        ('GET /api/admin/orders', lambda: client.get('/api/admin/orders', headers=admin)),
+        ('GET /api/admin/orders (cursor)', lambda: client.get('/api/admin/orders', query_string={'cursor': cursor}, headers=admin)),
+        ('GET /api/admin/orders (status, month)', lambda: client.get(
+            '/api/admin/orders', query_string={'status': 'paid', 'from': str(today - timedelta(days=30)), 'to': str(today)}, headers=admin)),
+        ('GET /api/admin/orders/export (one day)', lambda: client.get(
+            '/api/admin/orders/export', query_string={'from': str(today - timedelta(days=1)), 'to': str(today - timedelta(days=1))}, headers=admin)),
+        ('GET /api/admin/reservations', lambda: client.get('/api/admin/reservations', headers=admin)),
+        ('GET /api/admin/reservations (week)', lambda: client.get(
+            '/api/admin/reservations', query_string={'from': str(today - timedelta(days=7)), 'to': str(today)}, headers=admin)),
+        ('GET /api/admin/changes', lambda: client.get('/api/admin/changes?since=0', headers=admin)),
+        ('GET /api/admin/analytics/revenue (quarter)', lambda: client.get(
+            '/api/admin/analytics/revenue', query_string={'from': str(today - timedelta(days=90)), 'to': str(today)}, headers=admin)),
+        ('GET /api/admin/analytics/revenue (hourly, week)', lambda: client.get(
+            '/api/admin/analytics/revenue', query_string={'from': str(today - timedelta(days=7)), 'interval': 'hour'}, headers=admin)),
+        ('GET /api/admin/analytics/items (year)', lambda: client.get(
+            '/api/admin/analytics/items', query_string={'from': str(today - timedelta(days=365))}, headers=admin)),
+        ('GET /api/admin/analytics/categories', lambda: client.get('/api/admin/analytics/categories', headers=admin)),
+        ('GET /metrics', lambda: client.get('/metrics')),
+    ]
+    if image:
+        cases.append(('GET /api/images/<file>', lambda: client.get(f'/api/images/{image}')))
+    if writes:
+        cases += [
+            ('POST /api/cart/checkout', lambda: client.post('/api/cart/checkout', json={'customer_name': 'Bench', **cart})),
+            ('POST /api/reservations', book),
+        ]
+    return cases
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    k = (len(sorted_values) - 1) * pct / 100
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def measure(call, n, warmup=5):
+    for _ in range(warmup):
+        call().get_data()
+    statuses = {}
+    latencies = []
+    peak_before = _peak_rss_mb()
+    started = time.perf_counter()
+    for _ in range(n):
+        t0 = time.perf_counter()
+        resp = call()
+        resp.get_data()
+        latencies.append(time.perf_counter() - t0)
+        statuses[resp.status_code] = statuses.get(resp.status_code, 0) + 1
+        resp.close()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    ms = [v * 1000 for v in latencies]
+    peak_after = _peak_rss_mb()
+    return {
+        'requests': n,
+        'p50_ms': round(_percentile(ms, 50), 3),
+        'p95_ms': round(_percentile(ms, 95), 3),
+        'p99_ms': round(_percentile(ms, 99), 3),
+        'mean_ms': round(sum(ms) / n, 3),
+        'throughput_rps': round(n / elapsed, 1),
+        'peak_rss_mb': round(peak_after, 1),
+        'peak_rss_growth_mb': round(peak_after - peak_before, 1),
+        'rss_mb': round(_rss_mb(), 1) if _rss_mb() is not None else None,
+        'status_codes': {str(k): v for k, v in sorted(statuses.items())},
+    }
+
+
+def compare(results, baseline, tolerance, min_delta_ms=1.0):
+    """Endpoints whose p95 grew by more than ``tolerance`` (and at least min_delta_ms)."""
+    regressions = []
+    for name, now in results['endpoints'].items():
+        before = baseline.get('endpoints', {}).get(name)
+        if not before:
+            continue
+        delta = now['p95_ms'] - before['p95_ms']
+        if delta > min_delta_ms and now['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+            regressions.append((name, before['p95_ms'], now['p95_ms']))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--orders', type=int, default=200000)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--out', default='bench-results.json')
+    parser.add_argument('--baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed p95 growth, 0.25 = +25%%')
+    parser.add_argument('--only', help='substring filter on endpoint names')
+    parser.add_argument('--database-url')
+    parser.add_argument('--writes', action='store_true', help='also benchmark writes against --database-url')
+    args = parser.parse_args()
+
+    seeded = args.database_url is None
+    if seeded:
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench_endpoints.db')
+    else:
+        os.environ['DATABASE_URL'] = args.database_url
+
+    from backend.app import create_app
+    from backend.app.rollups import refresh
+    from scripts.init_db import ORDERS_PER_SCALE, generate
+
+    app = create_app()
+    dataset = None
+    if seeded:
+        dataset = generate(app, scale=args.orders / ORDERS_PER_SCALE, seed=args.seed, log=lambda msg: print(f'seeded: {msg}'))
+        with app.app_context():
+            # the bulk load bypasses the incremental sales rollups
+            dataset['rollups'] = refresh()
+    client = app.test_client()
+    admin = {'X-Admin-Secret': os.getenv('ADMIN_SECRET', 'dev-secret')}
+
+    results = {
+        'meta': {
+            'started_at': datetime.utcnow().isoformat(),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'database': app.config['SQLALCHEMY_DATABASE_URI'].split('@')[-1] if not seeded else 'sqlite (synthetic)',
+            'dataset': dataset,
+            'requests_per_endpoint': args.requests,
+        },
+        'endpoints': {},
+    }
+    print(f'{"endpoint":<44}{"p50":>8}{"p95":>8}{"p99":>8}{"req/s":>9}{"rss MB":>8}')
+    for name, call in endpoints(client, admin, writes=seeded or args.writes):
+        if args.only and args.only not in name:
+            continue
+        r = measure(call, args.requests)
+        results['endpoints'][name] = r
+        print(f'{name:<44}{r["p50_ms"]:>8.2f}{r["p95_ms"]:>8.2f}{r["p99_ms"]:>8.2f}{r["throughput_rps"]:>9.0f}{r["peak_rss_mb"]:>8.0f}'
+              + ('' if set(r['status_codes']) <= {'200', '201', '202'} else f'  statuses {r["status_codes"]}'))
+
+    with open(args.out, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f'results written to {args.out}')
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for name, before, now in regressions:
+            print(f'REGRESSION {name}: p95 {before:.2f}ms -> {now:.2f}ms')
+        if regressions:
+            sys.exit(1)
+        print(f'no p95 regressions beyond {args.tolerance:.0%} against {args.baseline}')
+
+
+if __name__ == '__main__':
+    main()
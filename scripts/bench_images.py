@@ -0,0 +1,77 @@
+"""
+scripts/bench_images.py
+
+Images served per second by one worker (single thread, Flask test client),
+comparing the original normpath/exists + send_from_directory handler with
+send_image(): in-memory LRU hits for small files, send_file for large ones,
+304 revalidations and X-Accel-Redirect offload.
+
+Usage:
+  python -m scripts.bench_images [--requests 3000]
+"""
+import argparse
+import os
+import time
+
+os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
+
+from flask import abort, send_from_directory
+from backend.app import create_app
+from backend.app.images import IMAGES_DIR, MEMORY_MAX_FILE_BYTES
+
+
+def legacy_serve_image(filename):
+    # the handler as it was before send_image()
+    images_dir = IMAGES_DIR
+    full_path = os.path.normpath(os.path.join(images_dir, filename))
+    if not full_path.startswith(os.path.abspath(images_dir)):
+        abort(404)
+    if not os.path.exists(full_path):
+        abort(404)
+    return send_from_directory(images_dir, filename)
+
+
+def run(client, url, n, headers=None):
+    client.get(url, headers=headers)  # warm up caches
+    start = time.perf_counter()
+    for _ in range(n):
+        resp = client.get(url, headers=headers)
+        resp.get_data()
+        resp.close()
+    return n / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=3000)
+    args = parser.parse_args()
+
+    files = sorted(
+        (os.path.getsize(os.path.join(IMAGES_DIR, f)), f)
+        for f in os.listdir(IMAGES_DIR)
+        if os.path.isfile(os.path.join(IMAGES_DIR, f))
+    )
+    small = next(f for size, f in files if size <= MEMORY_MAX_FILE_BYTES)
+    large = files[-1][1]
+
+    app = create_app()
+    app.add_url_rule('/bench/legacy_images/<path:filename>', 'legacy_serve_image', legacy_serve_image)
+    client = app.test_client()
+    etag = client.get(f'/api/images/{large}').headers['ETag']
+    cases = [
+        (f'before: small ({small})', f'/bench/legacy_images/{small}', None),
+        ('after:  small, memory LRU', f'/api/images/{small}', None),
+        (f'before: large ({large})', f'/bench/legacy_images/{large}', None),
+        ('after:  large, send_file', f'/api/images/{large}', None),
+        ('after:  large, 304', f'/api/images/{large}', {'If-None-Match': etag}),
+    ]
+    print(f'{args.requests} requests per case')
+    print(f'{"case":<48}{"images/s":>10}')
+    for label, url, headers in cases:
+        print(f'{label:<48}{run(client, url, args.requests, headers):>10.0f}')
+    app.config['IMAGES_ACCEL_REDIRECT'] = '/_images/'
+    print(f'{"after:  large, X-Accel-Redirect":<48}{run(client, f"/api/images/{large}", args.requests):>10.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""
+scripts/bench_intake.py
+
+Accepted orders per second with direct checkout (one commit per order) vs
+the group-commit intake queue (ORDER_INTAKE=1), using several client
+threads. Afterwards checks that every accepted order reached the main
+database exactly once, including after a simulated crash: a batch is
+committed but the process "dies" before removing it from the queue, and a
+new writer must replay it without inserting duplicates.
+
+Usage:
+  python -m scripts.bench_intake [--orders 2000] [--threads 16] [--lines 3]
+
+Uses throwaway SQLite files for the main database and the queue.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+_tmpdir = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_tmpdir, 'bench_intake.db')
+
+from sqlalchemy import event, func
+from backend.app import create_app, db
+from backend.app.intake import OrderIntake
+from backend.app.models import Category, MenuItem, Order, OrderItem
+from backend.app.pricing import quote
+
+
+def setup(app):
+    with app.app_context():
+        @event.listens_for(db.engine, 'connect')
+        def _sqlite_pragmas(dbapi_conn, _record):
+            dbapi_conn.execute('PRAGMA journal_mode=WAL')
+            dbapi_conn.execute('PRAGMA busy_timeout=30000')
+            # durable commits, like a real database server
+            dbapi_conn.execute('PRAGMA synchronous=FULL')
+        db.engine.dispose()
+        db.create_all()
+        if not db.session.query(MenuItem.id).first():
+            cat = Category(name='Lunch', position=1)
+            db.session.add(cat)
+            db.session.flush()
+            db.session.add_all([MenuItem(name=f'Item {n}', price_cents=500 + n, available=True, category_id=cat.id) for n in range(20)])
+            db.session.commit()
+        return [i for (i,) in db.session.query(MenuItem.id).order_by(MenuItem.id)]
+
+
+def fire(client, payload, n, threads, expected_status):
+    def one(_n):
+        return client.post('/api/cart/checkout', json=payload).status_code
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        statuses = list(pool.map(one, range(n)))
+    elapsed = time.perf_counter() - start
+    bad = [s for s in statuses if s != expected_status]
+    if bad:
+        print(f'FAIL: unexpected status codes {set(bad)}')
+        sys.exit(1)
+    return n / elapsed
+
+
+def counts(app):
+    with app.app_context():
+        return (
+            db.session.query(func.count(Order.id)).scalar(),
+            db.session.query(func.count(func.distinct(Order.reference))).scalar(),
+            db.session.query(func.count(OrderItem.id)).scalar(),
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--orders', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--lines', type=int, default=3)
+    args = parser.parse_args()
+
+    os.environ.pop('ORDER_INTAKE', None)
+    direct_app = create_app()
+    item_ids = setup(direct_app)
+    payload = {
+        'customer_name': 'Lunch rush',
+        'items': [{'menu_item_id': item_ids[n % len(item_ids)], 'qty': 1} for n in range(args.lines)],
+    }
+    direct_rate = fire(direct_app.test_client(), payload, args.orders, args.threads, 200)
+
+    os.environ['ORDER_INTAKE'] = '1'
+    os.environ['ORDER_INTAKE_PATH'] = os.path.join(_tmpdir, 'intake.db')
+    queued_app = create_app()
+    setup(queued_app)
+    intake = queued_app.extensions['order_intake']
+    before = counts(queued_app)[0]
+    intake_rate = fire(queued_app.test_client(), payload, args.orders, args.threads, 202)
+    start = time.perf_counter()
+    while intake.pending():
+        time.sleep(0.01)
+    drain = time.perf_counter() - start
+    intake.stop()
+
+    print(f'{args.orders} orders of {args.lines} lines on {args.threads} threads')
+    print(f'{"case":<10}{"accepted/s":>12}')
+    print(f'{"direct":<10}{direct_rate:>12.0f}')
+    print(f'{"intake":<10}{intake_rate:>12.0f}   (queue drained {drain:.2f}s after the last request)')
+
+    failures = []
+    n_orders, n_refs, n_items = counts(queued_app)
+    if n_orders - before != args.orders:
+        failures.append(f'expected {args.orders} queued orders in the database, found {n_orders - before}')
+    if n_refs != n_orders:
+        failures.append('duplicate order references')
+    if n_items != n_orders * args.lines:
+        failures.append('order lines missing')
+
+    # crash between the main commit and the queue delete: replay must skip it
+    crashed = OrderIntake(os.environ['ORDER_INTAKE_PATH'])
+    with queued_app.app_context():
+        priced = quote(payload['items'])
+        for _ in range(10):
+            crashed.submit('Crash test', None, None, priced)
+        crashed._store(crashed._next_batch())  # committed, queue untouched
+    restarted = OrderIntake(os.environ['ORDER_INTAKE_PATH'])
+    with queued_app.app_context():
+        restarted.drain_once()
+    if restarted.pending():
+        failures.append('replayed batch left in the queue')
+    if counts(queued_app)[0] != n_orders + 10:
+        failures.append('replay after a crash lost or duplicated orders')
+
+    for failure in failures:
+        print('FAIL:', failure)
+    if failures:
+        sys.exit(1)
+    print('OK: every accepted order stored exactly once')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+scripts/check_query_budgets.py
+
+Query-budget regression check. Seeds a large SQLite database (the same data
+as check_query_plans), runs the app with QUERY_BUDGET_MODE=raise and drives
+every read endpoint plus the main writes, cold and warm cache. Fails (exit 1)
+when a route issues more statements than its @query_budget allows or repeats
+one statement shape N_PLUS_ONE_THRESHOLD times (an N+1 loop).
+
+Usage:
+  python -m scripts.check_query_budgets [--orders 50000]
+"""
+import argparse
+import os
+import sys
+
+os.environ['QUERY_BUDGET_MODE'] = 'raise'
+
+# importing check_query_plans points DATABASE_URL at a throwaway SQLite file
+from scripts.check_query_plans import ADMIN, seed
+from backend.app import create_app, db
+from backend.app.query_budget import QueryBudgetExceeded, assert_budgets
+
+
+def calls():
+    admin = {'headers': ADMIN}
+    reads = [
+        ('GET', '/api/menu', {}),
+        ('GET', '/api/', {}),
+        ('GET', '/api/gallery', {}),
+        ('GET', '/api/gallery/index?limit=5', {}),
+        ('GET', '/api/admin/menu_items', admin),
+        ('GET', '/api/admin/categories', admin),
+        ('GET', '/api/admin/promotions', admin),
+        ('GET', '/api/admin/orders?limit=200', admin),
+        ('GET', '/api/admin/orders?status=paid&from=2025-03-01&to=2025-03-31', admin),
+        ('GET', '/api/admin/reservations?limit=500', admin),
+        ('GET', '/api/admin/changes?since=0', admin),
+        ('GET', '/api/reservations/availability?date=2025-01-03&days=7', {}),
+        ('GET', '/api/admin/analytics/revenue?from=2025-01-01&to=2025-03-31', admin),
+        ('GET', '/api/admin/analytics/revenue?from=2025-03-01&to=2025-03-31&interval=hour', admin),
+        ('GET', '/api/admin/analytics/items?from=2025-01-01&to=2025-03-31', admin),
+        ('GET', '/api/admin/analytics/items?from=2025-01-01&to=2025-03-31&menu_item_id=5', admin),
+        ('GET', '/api/admin/analytics/categories?from=2025-01-01&to=2025-03-31', admin),
+    ]
+    writes = [
+        ('POST', '/api/cart/quote', {'json': {'items': [{'menu_item_id': n, 'qty': 1} for n in range(1, 40)]}}),
+        ('POST', '/api/cart/checkout', {'json': {
+            'customer_name': 'Budget check', 'items': [{'menu_item_id': n, 'qty': 2} for n in range(1, 40)]}}),
+        ('POST', '/api/reservations', {'json': {
+            'name': 'Budget check', 'email': 'budget@example.com', 'time_slot': '2025-01-02T18:00'}}),
+        ('POST', '/api/admin/promotions', {'json': {'menu_item_id': 2, 'percent': 5}, **admin}),
+    ]
+    # reads twice: the first call after a write rebuilds the caches
+    return reads + reads + writes + reads
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--orders', type=int, default=50000)
+    args = parser.parse_args()
+
+    app = create_app()
+    app.testing = True
+    with app.app_context():
+        db.create_all()
+        seed(args.orders)
+    client = app.test_client()
+    try:
+        results = assert_budgets(client, calls())
+    except QueryBudgetExceeded as e:
+        print(f'FAIL {e}')
+        sys.exit(1)
+    seen = set()
+    for method, url, count, budget in results:
+        if (method, url) in seen:
+            continue
+        seen.add((method, url))
+        print(f'ok   {method} {url}: {count} statements (budget {budget if budget is not None else "-"})')
+
+
+if __name__ == '__main__':
+    main()
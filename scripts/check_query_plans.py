@@ -0,0 +1,181 @@
+"""
+scripts/check_query_plans.py
+
+Query-plan regression check. Seeds a large SQLite database, drives each API
+endpoint through the Flask test client, captures every SELECT it issues and
+runs EXPLAIN QUERY PLAN on it. Fails (exit 1) when a statement falls back to a
+full table scan on a table that is not expected to be read in full, or when
+a LIMITed (keyset page) query over a large table has to sort instead of
+walking an index.
+
+Usage:
+  python -m scripts.check_query_plans [--orders 50000] [-v]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+_tmpdir = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_tmpdir, 'query_plans.db')
+
+from sqlalchemy import event, insert, text
+from backend.app import create_app, db
+from backend.app.models import Category, Customer, MenuItem, Order, OrderItem, Promotion, Reservation
+from backend.app.rollups import refresh
+
+ADMIN = {'X-Admin-Secret': os.getenv('ADMIN_SECRET', 'dev-secret')}
+# catalog builds read these small tables in full by design
+ALWAYS_SCANNABLE = {'categories', 'menu_items', 'promotions'}
+# tables whose pages must come straight off an index
+LARGE_TABLES = ('orders', 'order_items', 'reservations', 'customers')
+
+
+def seed(n_orders, n_items=500, n_categories=20):
+    rnd = random.Random(42)
+    db.session.execute(insert(Category), [{'name': f'Category {n}', 'position': n} for n in range(n_categories)])
+    db.session.execute(insert(MenuItem), [
+        {'name': f'Item {n}', 'price_cents': 300 + n, 'available': True, 'category_id': 1 + n % n_categories}
+        for n in range(n_items)
+    ])
+    db.session.execute(insert(Promotion), [{'menu_item_id': 1 + n, 'percent': 10, 'active': True} for n in range(0, n_items, 10)])
+    start = datetime(2025, 1, 1)
+    statuses = ['pending', 'paid', 'served', 'cancelled']
+    db.session.execute(insert(Order), [
+        {'customer_name': f'Customer {n}', 'total_cents': 1000, 'status': rnd.choice(statuses),
+         'created_at': start + timedelta(seconds=n * 600)}
+        for n in range(n_orders)
+    ])
+    db.session.execute(insert(OrderItem), [
+        {'order_id': 1 + n // 3, 'menu_item_id': 1 + rnd.randrange(n_items), 'qty': 1, 'unit_price_cents': 500}
+        for n in range(n_orders * 3)
+    ])
+    n_customers = max(1, n_orders // 10)
+    db.session.execute(insert(Customer), [{'name': f'Guest {n}', 'email': f'guest{n}@example.com'} for n in range(n_customers)])
+    db.session.execute(insert(Reservation), [
+        {'customer_id': 1 + n % n_customers, 'time_slot': start + timedelta(minutes=30 * (n // 30)),
+         'table_number': 1 + n % 30, 'guests': 2, 'created_at': start}
+        for n in range(n_orders // 2)
+    ])
+    db.session.commit()
+    # bulk inserts bypass the incremental rollup updates
+    refresh()
+    db.session.execute(text('ANALYZE'))
+    db.session.commit()
+
+
+def cases(client):
+    """(label, callable issuing the request, extra tables that may be scanned)."""
+    first_orders = client.get('/api/admin/orders', headers=ADMIN)
+    first_resv = client.get('/api/admin/reservations', headers=ADMIN)
+    return [
+        ('GET /api/menu', lambda: client.get('/api/menu'), set()),
+        ('GET /api/', lambda: client.get('/api/'), set()),
+        ('GET /api/admin/menu_items', lambda: client.get('/api/admin/menu_items', headers=ADMIN), set()),
+        ('GET /api/admin/orders', lambda: client.get('/api/admin/orders', headers=ADMIN), set()),
+        ('GET /api/admin/orders (cursor)', lambda: client.get(
+            '/api/admin/orders', query_string={'cursor': first_orders.headers['X-Next-Cursor']}, headers=ADMIN), set()),
+        ('GET /api/admin/orders (status, range)', lambda: client.get(
+            '/api/admin/orders', query_string={'status': 'paid', 'from': '2025-03-01', 'to': '2025-03-31'}, headers=ADMIN), set()),
+        # a full export reads every order by design
+        ('GET /api/admin/orders/export', lambda: client.get('/api/admin/orders/export?to=2025-01-02', headers=ADMIN).get_data(), {'orders'}),
+        ('GET /api/admin/reservations', lambda: client.get('/api/admin/reservations', headers=ADMIN), set()),
+        ('GET /api/admin/reservations (cursor)', lambda: client.get(
+            '/api/admin/reservations', query_string={'cursor': first_resv.headers['X-Next-Cursor']}, headers=ADMIN), set()),
+        ('GET /api/admin/reservations (range)', lambda: client.get(
+            '/api/admin/reservations', query_string={'from': '2025-01-02', 'to': '2025-01-02'}, headers=ADMIN), set()),
+        ('GET /api/admin/analytics/revenue', lambda: client.get(
+            '/api/admin/analytics/revenue', query_string={'from': '2025-01-01', 'to': '2025-03-31'}, headers=ADMIN), set()),
+        ('GET /api/admin/analytics/revenue (hourly)', lambda: client.get(
+            '/api/admin/analytics/revenue', query_string={'from': '2025-03-01', 'to': '2025-03-31', 'interval': 'hour'}, headers=ADMIN), set()),
+        ('GET /api/admin/analytics/items', lambda: client.get(
+            '/api/admin/analytics/items', query_string={'from': '2025-01-01', 'to': '2025-03-31'}, headers=ADMIN), set()),
+        ('GET /api/admin/analytics/items (one item)', lambda: client.get(
+            '/api/admin/analytics/items', query_string={'from': '2025-01-01', 'to': '2025-03-31', 'menu_item_id': 5}, headers=ADMIN), set()),
+        ('GET /api/admin/analytics/categories', lambda: client.get(
+            '/api/admin/analytics/categories', query_string={'from': '2025-01-01', 'to': '2025-03-31'}, headers=ADMIN), set()),
+        ('GET /api/reservations/availability', lambda: client.get('/api/reservations/availability?date=2025-01-03&days=7'), set()),
+        ('POST /api/cart/quote', lambda: client.post('/api/cart/quote', json={'items': [{'menu_item_id': 1, 'qty': 2}]}), set()),
+        ('POST /api/cart/checkout', lambda: client.post('/api/cart/checkout', json={
+            'customer_name': 'Plan check', 'items': [{'menu_item_id': 1, 'qty': 2}, {'menu_item_id': 7}]}), set()),
+        ('POST /api/reservations', lambda: client.post('/api/reservations', json={
+            'name': 'Plan check', 'email': 'plan@example.com', 'time_slot': '2025-01-02T18:00'}), set()),
+        ('DELETE /api/admin/menu_items/<id>', lambda: client.delete('/api/admin/menu_items/3', headers=ADMIN), set()),
+        ('POST /api/admin/promotions', lambda: client.post(
+            '/api/admin/promotions', json={'menu_item_id': 2, 'percent': 5}, headers=ADMIN), set()),
+    ]
+
+
+def capture_plans(call):
+    """Run ``call()`` and return ``[(statement, plan lines)]`` for every SELECT it issued."""
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith('SELECT'):
+            captured.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', capture)
+    try:
+        call()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', capture)
+    with db.engine.connect() as conn:
+        return [
+            (statement, [row[-1] for row in conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters)])
+            for statement, parameters in captured
+        ]
+
+
+def problems(plan_lines, statement, allowed):
+    found = []
+    paged = re.search(r'\bLIMIT\b', statement, re.IGNORECASE) is not None
+    for line in plan_lines:
+        words = line.split()
+        if len(words) >= 2 and words[0] == 'SCAN' and 'USING' not in words:
+            table = words[1]
+            if table not in allowed:
+                found.append(f'full scan of {table}')
+        if 'USE TEMP B-TREE' in line and paged and any(
+                re.search(rf'\b(?:FROM|JOIN)\s+{t}\b', statement, re.IGNORECASE) for t in LARGE_TABLES):
+            found.append(f'unindexed sort ({line.strip()})')
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--orders', type=int, default=50000)
+    parser.add_argument('-v', '--verbose', action='store_true', help='print every plan')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        seed(args.orders)
+        client = app.test_client()
+
+        failures = 0
+        for label, call, extra in cases(client):
+            allowed = ALWAYS_SCANNABLE | extra
+            bad = []
+            plans = capture_plans(call)
+            for statement, plan in plans:
+                if args.verbose:
+                    print(f'  {" ".join(statement.split())[:110]}')
+                    for line in plan:
+                        print(f'      {line}')
+                bad.extend(f'{p}: {" ".join(statement.split())[:120]}' for p in problems(plan, statement, allowed))
+            print(f'{"FAIL" if bad else "ok  "} {label} ({len(plans)} selects)')
+            for b in bad:
+                print(f'       {b}')
+            failures += bool(bad)
+
+    if failures:
+        print(f'{failures} endpoint(s) regressed to full scans')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+scripts/dedupe_images.py
+
+Move images referenced by menu items to content-addressed names
+(``<sha256 prefix>.<ext>``, the same names new uploads get) and point
+``MenuItem.image_filename`` at them. Byte-identical copies collapse into one
+file. Files no menu item references (e.g. the site's gallery and header
+images) are left in place; their duplicates are only reported.
+
+Usage:
+  python -m scripts.dedupe_images           # dry run: print what would change
+  python -m scripts.dedupe_images --apply
+"""
+import argparse
+import hashlib
+import os
+from collections import defaultdict
+from backend.app import create_app, db
+from backend.app.images import CHUNK_SIZE, HASH_CHARS, IMAGES_DIR, _extension, is_content_addressed
+from backend.app.models import MenuItem
+
+
+def content_name(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    ext = _extension(path)
+    return digest.hexdigest()[:HASH_CHARS] + (f'.{ext}' if ext else '')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--apply', action='store_true', help='rename files and update menu items')
+    args = parser.parse_args()
+
+    files = sorted(f for f in os.listdir(IMAGES_DIR) if not f.startswith('.') and os.path.isfile(os.path.join(IMAGES_DIR, f)))
+    targets = {f: content_name(os.path.join(IMAGES_DIR, f)) for f in files}
+    copies = defaultdict(list)
+    for f, target in targets.items():
+        copies[target].append(f)
+
+    app = create_app()
+    with app.app_context():
+        referenced = {name for (name,) in db.session.query(MenuItem.image_filename).filter(MenuItem.image_filename.isnot(None)).distinct()}
+        moves = {f: targets[f] for f in files if f in referenced and not is_content_addressed(f)}
+        for old, new in sorted(moves.items()):
+            print(f'{old} -> {new}')
+        for target, names in sorted(copies.items()):
+            unreferenced = [n for n in names if n not in referenced]
+            if len(names) > 1 and unreferenced:
+                print(f'identical, left in place: {", ".join(unreferenced)} (same bytes as {target})')
+        if not args.apply:
+            print(f'{len(moves)} file(s) would move; re-run with --apply')
+            return
+
+        for old, new in moves.items():
+            old_path, new_path = os.path.join(IMAGES_DIR, old), os.path.join(IMAGES_DIR, new)
+            if os.path.exists(new_path):
+                os.remove(old_path)
+            else:
+                os.replace(old_path, new_path)
+            MenuItem.query.filter_by(image_filename=old).update({'image_filename': new}, synchronize_session=False)
+        db.session.commit()
+        print(f'moved {len(moves)} file(s)')
+
+
+if __name__ == '__main__':
+    main()
@@ -5,13 +5,27 @@ Create database tables and seed sample categories and menu items for local devel
 
 Usage:
   python scripts/init_db.py
+  python -m scripts.init_db --generate [--scale 10] [--seed 42]
 
 This imports the Flask app factory from the backend package and runs create_all().
+
+--generate fills an empty database with a synthetic dataset for capacity
+planning and staging instead: scale 1 is 100k orders (~300k order lines),
+10k customers, a few hundred menu items with promotions and a year of
+reservations; everything but the menu grows linearly with --scale. The same
+--seed always produces the same rows. Rows are streamed in batches through
+the DBAPI cursor, using COPY on PostgreSQL and executemany elsewhere, so
+--scale 10 (1M orders) loads in well under a minute on SQLite.
 """
+import argparse
+import io
+import random
 import sys
+import time
+from datetime import datetime, timedelta
 from sqlalchemy.exc import OperationalError
 from backend.app import create_app, db
-from backend.app.models import Category, MenuItem
+from backend.app.models import Category, MenuItem, Order
 
 
 def seed(app):
@@ -58,10 +72,172 @@ def seed(app):
         print('Seeding complete.')
 
 
+ORDERS_PER_SCALE = 100000
+CUSTOMERS_PER_SCALE = 10000
+GENERATE_BATCH = 50000
+ORDER_STATUSES = ('pending', 'paid', 'served', 'cancelled')
+
+
+def _timestamp(dt):
+    # the text layout SQLAlchemy uses for SQLite DATETIME; PostgreSQL parses it too
+    return '%04d-%02d-%02d %02d:%02d:%02d.%06d' % (dt.year, dt.month, dt.day, dt.hour, dt.minute, dt.second, dt.microsecond)
+
+
+class _BulkWriter:
+    """Write row tuples to one table per call, via COPY or batched executemany."""
+
+    def __init__(self, conn, dialect):
+        self.conn = conn
+        self.dialect = dialect
+        self.cursor = conn.cursor()
+
+    def write(self, table, columns, rows):
+        if self.dialect == 'postgresql':
+            self._copy(table, columns, rows)
+        else:
+            marks = ', '.join(['?' if self.dialect == 'sqlite' else '%s'] * len(columns))
+            self.cursor.executemany(f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({marks})', rows)
+
+    def _copy(self, table, columns, rows):
+        # generated values never contain tabs, newlines or backslashes
+        buf = io.StringIO()
+        for row in rows:
+            buf.write('\t'.join(
+                '\\N' if v is None else ('t' if v is True else 'f' if v is False else str(v)) for v in row
+            ))
+            buf.write('\n')
+        buf.seek(0)
+        self.cursor.copy_expert(f'COPY {table} ({", ".join(columns)}) FROM STDIN', buf)
+
+    def bool(self, value):
+        return value if self.dialect == 'postgresql' else int(value)
+
+
+def generate(app, scale=1.0, seed=42, batch=GENERATE_BATCH, log=print):
+    """Bulk-load a deterministic synthetic dataset into an empty database."""
+    rnd = random.Random(seed)
+    n_orders = int(ORDERS_PER_SCALE * scale)
+    n_customers = max(100, int(CUSTOMERS_PER_SCALE * scale))
+    n_items = max(40, int(300 * scale ** 0.5))
+    n_categories = max(4, n_items // 20)
+    counts = {}
+    with app.app_context():
+        db.create_all()
+        if db.session.query(Order.id).first() or db.session.query(Category.id).first():
+            raise RuntimeError('generate needs an empty database (orders or categories already present)')
+        db.session.remove()
+        engine = db.engine
+        dialect = engine.dialect.name
+        conn = engine.raw_connection()
+        try:
+            if dialect == 'sqlite':
+                # a throwaway bulk load: skip fsyncs, the file is rebuilt on failure anyway
+                conn.execute('PRAGMA synchronous=OFF')
+            out = _BulkWriter(conn, dialect)
+            started = time.perf_counter()
+            now = datetime.utcnow().replace(microsecond=0)
+
+            out.write('categories', ('id', 'name', 'position'),
+                      [(n + 1, f'Category {n + 1}', n + 1) for n in range(n_categories)])
+            prices = [250 + 25 * rnd.randrange(160) for _ in range(n_items)]
+            out.write('menu_items', ('id', 'name', 'description', 'price_cents', 'available', 'category_id', 'created_at'), [
+                (n + 1, f'Item {n + 1}', f'Synthetic dish number {n + 1}', prices[n], out.bool(rnd.random() > 0.05),
+                 1 + n % n_categories, _timestamp(now)) for n in range(n_items)
+            ])
+            promo_items = rnd.sample(range(n_items), max(1, n_items // 10))
+            promos = [
+                (k + 1, item + 1, None, rnd.choice((5, 10, 15, 20, 25)), out.bool(True), None, None, None, _timestamp(now))
+                for k, item in enumerate(promo_items)
+            ]
+            # plus a weekday 15:00-17:00 happy hour on every eighth category
+            promos += [
+                (len(promo_items) + k + 1, None, cat + 1, 20, out.bool(True), '15:00:00.000000', '17:00:00.000000',
+                 0b0011111, _timestamp(now))
+                for k, cat in enumerate(range(0, n_categories, 8))
+            ]
+            out.write('promotions', ('id', 'menu_item_id', 'category_id', 'percent', 'active', 'daily_start', 'daily_end',
+                                     'weekdays', 'created_at'), promos)
+            counts.update(categories=n_categories, menu_items=n_items, promotions=len(promos))
+
+            for lo in range(0, n_customers, batch):
+                out.write('customers', ('id', 'name', 'email', 'phone', 'newsletter', 'created_at'), [
+                    (n + 1, f'Guest {n + 1}', f'guest{n + 1}@example.com', f'555-{n + 1:07d}',
+                     out.bool(n % 7 == 0), _timestamp(now)) for n in range(lo, min(lo + batch, n_customers))
+                ])
+            counts['customers'] = n_customers
+
+            # a year of orders in id order == created_at order, like a real history
+            start = now - timedelta(days=365)
+            step = 365 * 86400 / max(1, n_orders)
+            randrange = rnd.randrange
+            random_ = rnd.random
+            line_id = 0
+            for lo in range(0, n_orders, batch):
+                orders = []
+                lines = []
+                for order_id in range(lo + 1, min(lo + batch, n_orders) + 1):
+                    total = 0
+                    for _ in range(1 + randrange(5)):
+                        item = randrange(n_items)
+                        qty = 1 + randrange(3)
+                        total += prices[item] * qty
+                        line_id += 1
+                        lines.append((line_id, order_id, item + 1, qty, prices[item], 1 + item % n_categories))
+                    created = start + timedelta(seconds=(order_id - 1 + random_()) * step)
+                    orders.append((order_id, f'Guest {1 + randrange(n_customers)}', total,
+                                   ORDER_STATUSES[randrange(4)], _timestamp(created), f'{order_id:032x}'))
+                out.write('orders', ('id', 'customer_name', 'total_cents', 'status', 'created_at', 'reference'), orders)
+                out.write('order_items', ('id', 'order_id', 'menu_item_id', 'qty', 'unit_price_cents', 'category_id'), lines)
+                conn.commit()
+            counts.update(orders=n_orders, order_items=line_id)
+
+            # a year of evening reservations ending today, about a third of the tables taken
+            from backend.app.reservations import SLOT_MINUTES, TOTAL_TABLES
+            tables = list(range(1, TOTAL_TABLES + 1))
+            res_id = 0
+            rows = []
+            day = start.date()
+            while day <= now.date():
+                slot = datetime.combine(day, datetime.min.time()).replace(hour=17)
+                while slot.hour < 22:
+                    for table in rnd.sample(tables, randrange(TOTAL_TABLES * 2 // 3)):
+                        res_id += 1
+                        rows.append((res_id, 1 + randrange(n_customers), _timestamp(slot), table,
+                                     1 + randrange(6), _timestamp(slot - timedelta(days=3))))
+                    slot += timedelta(minutes=SLOT_MINUTES)
+                if len(rows) >= batch:
+                    out.write('reservations', ('id', 'customer_id', 'time_slot', 'table_number', 'guests', 'created_at'), rows)
+                    rows = []
+                day += timedelta(days=1)
+            out.write('reservations', ('id', 'customer_id', 'time_slot', 'table_number', 'guests', 'created_at'), rows)
+            counts['reservations'] = res_id
+
+            if dialect == 'postgresql':
+                # explicit ids leave the serial sequences behind
+                for table in ('categories', 'menu_items', 'promotions', 'customers', 'orders', 'order_items', 'reservations'):
+                    out.cursor.execute(
+                        f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE((SELECT max(id) FROM {table}), 1))"
+                    )
+            conn.commit()
+        finally:
+            conn.close()
+        counts['seconds'] = round(time.perf_counter() - started, 1)
+        log(f'Generated {counts}')
+    return counts
+
+
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--generate', action='store_true', help='bulk-load a synthetic dataset instead of the sample menu')
+    parser.add_argument('--scale', type=float, default=1.0)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
     app = create_app()
     try:
-        seed(app)
+        if args.generate:
+            generate(app, scale=args.scale, seed=args.seed)
+        else:
+            seed(app)
     except Exception as e:
         print('Error during init/seed:', e)
         sys.exit(1)
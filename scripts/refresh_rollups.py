@@ -0,0 +1,82 @@
+"""
+scripts/refresh_rollups.py
+
+Recompute the sales rollup tables (sales_item_daily, sales_category_daily,
+sales_daily, sales_hourly) from orders and reservations for a range of restaurant-local
+days. With SALES_ROLLUPS=batch run it from cron, e.g. every few minutes with
+--today; with the default incremental mode it is only needed to backfill
+(--all) after the migration, a bulk load or a restore, or to redo the last
+days after a worker died before flushing its checkouts' deltas. Either way
+run it daily: it also deletes change_log rows older than
+CHANGE_LOG_RETENTION_DAYS (or --keep-changes days).
+
+Usage:
+  python -m scripts.refresh_rollups [--days 2] [--today] [--keep-changes 7]
+  python -m scripts.refresh_rollups --from 2025-01-01 --to 2025-03-31
+  python -m scripts.refresh_rollups --all
+
+--from/--to are inclusive local dates. Days are replaced as a whole in one
+transaction per run. By default the range ends yesterday: in incremental mode
+today's rows are still receiving deltas (checkouts are flushed in the
+background), and replacing them underneath would lose or double-count orders,
+so today is only refreshed with SALES_ROLLUPS=batch. The initial backfill
+also needs today and future reservations: run it as
+SALES_ROLLUPS=batch ... --all before the app starts writing to the tables.
+"""
+import argparse
+import sys
+import time
+from datetime import date, timedelta
+from backend.app import create_app, db
+from backend.app.localtime import local_now
+from backend.app.changes import RETENTION_DAYS, prune
+from backend.app.rollups import MODE, refresh
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--days', type=int, default=2, help='the last day and the days before it (default 2)')
+    parser.add_argument('--today', action='store_true', help='end today rather than yesterday (batch mode only)')
+    parser.add_argument('--from', dest='start', type=date.fromisoformat)
+    parser.add_argument('--to', dest='end', type=date.fromisoformat)
+    parser.add_argument('--all', action='store_true', help='every day with orders or reservations (up to yesterday)')
+    parser.add_argument('--keep-changes', type=float, default=RETENTION_DAYS, metavar='DAYS',
+                        help=f'days of change_log to keep (default {RETENTION_DAYS:g})')
+    args = parser.parse_args()
+
+    today = local_now().date()
+    if (args.today or (args.end and args.end >= today)) and MODE != 'batch':
+        parser.error('today is still being updated incrementally; refresh it only with SALES_ROLLUPS=batch')
+    last = today if args.today else today - timedelta(days=1)
+
+    if args.all:
+        # without an end, refresh() goes up to the newest order or reservation
+        start, end = None, (None if MODE == 'batch' else today)
+    else:
+        end = args.end or last
+        start = args.start or end - timedelta(days=max(1, args.days) - 1)
+        if start > end:
+            parser.error('--from must not be after --to')
+        end += timedelta(days=1)
+
+    app = create_app()
+    with app.app_context():
+        started = time.perf_counter()
+        try:
+            counts = refresh(start, end)
+        except Exception as e:
+            db.session.rollback()
+            print('Error refreshing rollups:', e)
+            sys.exit(1)
+        print(f'Refreshed {counts} in {time.perf_counter() - started:.1f}s')
+        try:
+            pruned = prune(args.keep_changes)
+        except Exception as e:
+            db.session.rollback()
+            print('Error pruning the change log:', e)
+            sys.exit(1)
+        print(f'Pruned {pruned} change_log rows older than {args.keep_changes:g} days')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+scripts/reservation_contention.py
+
+Fire many parallel bookings at a single reservation time slot and check that
+no table is handed out twice, that exactly TOTAL_TABLES bookings succeed and
+the rest get 409, and report throughput.
+
+Usage:
+  python -m scripts.reservation_contention [--bookings 300] [--threads 32]
+
+Uses a throwaway SQLite file (WAL mode) unless DATABASE_URL points elsewhere
+and --use-database-url is given. Exits non-zero if any check fails.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bookings', type=int, default=300)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--slot', default='2030-06-01T19:30')
+    parser.add_argument('--use-database-url', action='store_true')
+    args = parser.parse_args()
+
+    if not args.use_database_url:
+        path = os.path.join(tempfile.mkdtemp(), 'contention.db')
+        os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+
+    from sqlalchemy import event, func
+    from backend.app import create_app, db
+    from backend.app.models import Reservation
+    from backend.app.reservations import TOTAL_TABLES
+
+    app = create_app()
+    with app.app_context():
+        if db.engine.dialect.name == 'sqlite':
+            @event.listens_for(db.engine, 'connect')
+            def _sqlite_pragmas(dbapi_conn, _record):
+                dbapi_conn.execute('PRAGMA journal_mode=WAL')
+                dbapi_conn.execute('PRAGMA busy_timeout=30000')
+        db.create_all()
+
+    client = app.test_client()
+
+    def book(n):
+        resp = client.post('/api/reservations', json={
+            'name': f'Guest {n}',
+            'email': f'guest{n}@example.com',
+            'guests': 2,
+            'time_slot': args.slot,
+        })
+        return resp.status_code, (resp.get_json() or {}).get('table_number')
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        results = list(pool.map(book, range(args.bookings)))
+    elapsed = time.perf_counter() - start
+
+    statuses = Counter(status for status, _ in results)
+    tables = [table for status, table in results if status == 201]
+    with app.app_context():
+        dupes = (
+            db.session.query(Reservation.table_number, func.count())
+            .group_by(Reservation.time_slot, Reservation.table_number)
+            .having(func.count() > 1)
+            .all()
+        )
+        stored = db.session.query(func.count(Reservation.id)).scalar()
+
+    print(f'{args.bookings} bookings on {args.threads} threads in {elapsed:.2f}s ({args.bookings / elapsed:.0f} req/s)')
+    print(f'status codes: {dict(statuses)}; reservations stored: {stored}')
+    failures = []
+    if dupes:
+        failures.append(f'double-booked tables in the database: {dupes}')
+    if len(tables) != len(set(tables)):
+        failures.append('the same table was returned to two callers')
+    expected = min(args.bookings, TOTAL_TABLES)
+    if statuses.get(201, 0) != expected or stored != expected:
+        failures.append(f'expected {expected} successful bookings')
+    if set(statuses) - {201, 409}:
+        failures.append('unexpected status codes')
+    for failure in failures:
+        print('FAIL:', failure)
+    if failures:
+        sys.exit(1)
+    print('OK: no double bookings')
+
+
+if __name__ == '__main__':
+    main()